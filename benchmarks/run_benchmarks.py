@@ -0,0 +1,332 @@
+"""端口监控热路径基准测试
+
+使用合成负载分别计时各阶段：采集（collect）、补充进程信息（enrich）、
+快照差异（diff）、分组聚合（group）、排序键（sort_keys）、多列排序（sort）、
+名称缓存查询（names，使用本地的 StubLookup，不访问DNS）、写入录制文件（record）、建立索引（index）、
+过滤（filter）、表格模型更新（model）和表格绘制（render）。Qt 相关阶段在 offscreen 平台下运行，无需显示器。
+--capture 用录制文件（port_cli.py --record 在生产环境录制）代替合成负载，逐帧回放（replay 阶段），
+以真实的连接分布计时之后的各阶段。
+结果以 JSON 输出，可用 --compare 与之前某次提交的结果比较。
+
+--kernel-sockets 在 Linux 上另外建立真实的回环连接，比较 procfs 和 netlink 后端读取全部连接
+以及把过滤条件下推到内核（pushdown）时的采集耗时。
+
+用法示例:
+    python benchmarks/run_benchmarks.py --sizes 1000,10000 --output bench.json
+    python benchmarks/run_benchmarks.py --compare bench.json
+    python benchmarks/run_benchmarks.py --sizes 0 --capture night.cap --ticks 100
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from port_capture import CaptureReader, CaptureWriter, ReplayCollector  # noqa: E402
+from port_collector import PortCollector, ProcessCache, create_backend  # noqa: E402
+from port_diff import SnapshotDiffer  # noqa: E402
+from port_filter import FilterSpec, SnapshotIndex  # noqa: E402
+from port_groups import GroupTree  # noqa: E402
+from port_names import NameResolver, StubLookup, row_service  # noqa: E402
+from port_sort import FIELD_INDEX, SortKeyCache, sort_order  # noqa: E402
+from synthetic import WORKLOADS, SyntheticBackend, make_workload  # noqa: E402
+
+FILTERS = (
+    ("port_range", FilterSpec(port="8000-8100")),
+    ("process", FilterSpec(process="proc-1")),
+    ("cidr", FilterSpec(remote="10.1.0.0/16")),
+)
+
+
+def load_qt():
+    """加载 Qt 相关阶段所需的对象，PyQt5 不可用时返回 None"""
+    try:
+        from PyQt5.QtWidgets import QApplication, QTableView
+        import port_monitor
+    except ImportError:
+        return None
+    app = QApplication.instance() or QApplication([])
+    return app, QTableView, port_monitor.PortTableModel
+
+
+SORT_SPEC = [(FIELD_INDEX["status"], False), (FIELD_INDEX["local_address"], True), (FIELD_INDEX["pid"], False)]
+
+
+class PhaseTimer:
+    """收集每个阶段每个时刻的耗时"""
+    def __init__(self):
+        self.samples = {}
+
+    def measure(self, phase, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.samples.setdefault(phase, []).append(time.perf_counter() - started)
+        return result
+
+
+def bench_workload(name, sockets, ticks, qt):
+    backend = SyntheticBackend(make_workload(name, sockets))
+    collector = PortCollector(ProcessCache(backend.process_factory), backend=backend)
+
+    def collect(timer):
+        connections = timer.measure("collect", collector.connections)
+
+        def enrich():
+            rows = collector.enrich(connections)
+            collector.process_cache.prune(backend.pids())
+            return rows
+        return timer.measure("enrich", enrich)
+
+    results = bench_pipeline(name, sockets, ticks, qt, collect)
+    stats = collector.process_cache.stats()
+    results.append({"workload": name, "sockets": sockets, "phase": "process_cache",
+                    "hits": stats["hits"], "misses": stats["misses"]})
+    return results
+
+
+def bench_capture(path, ticks, qt):
+    """逐帧回放录制文件，最多 ticks 帧"""
+    reader = CaptureReader(path)
+    replay = ReplayCollector(reader, speed=0)
+    _, rows = reader.state_at(reader.first_time)
+    name = "capture_" + os.path.splitext(os.path.basename(path))[0]
+    try:
+        results = bench_pipeline(name, len(rows), min(ticks, reader.frames), qt,
+                                 lambda timer: timer.measure("replay", replay.collect))
+        # 跳转到录制范围内均匀分布的时刻
+        timer = PhaseTimer()
+        span = reader.last_time - reader.first_time
+        for i in range(10):
+            timer.measure("seek", reader.state_at, reader.first_time + span * i / 9)
+        return results + phase_results(name, len(rows), timer)
+    finally:
+        reader.close()
+
+
+def bench_pipeline(name, sockets, ticks, qt, collect):
+    """对 collect(timer) 每次返回的快照计时之后的各阶段"""
+    differ = SnapshotDiffer()
+    groups = GroupTree("process")
+    key_cache = SortKeyCache()
+    resolver = NameResolver(StubLookup({}, delay=0.001)).start()  # 模拟网络延迟
+    capture_dir = tempfile.TemporaryDirectory()
+    writer = CaptureWriter(os.path.join(capture_dir.name, "bench.cap"))
+    timer = PhaseTimer()
+    view = model = None
+    if qt is not None:
+        app, table_view_class, model_class = qt
+        model = model_class()
+        view = table_view_class()
+        view.setModel(model)
+        view.resize(900, 600)
+        view.show()
+
+    for _ in range(ticks):
+        rows = collect(timer)
+        delta = timer.measure("diff", differ.update, rows)
+        timer.measure("group", groups.apply_delta, delta)
+        timer.measure("sort_keys", key_cache.update, delta)
+        sort_keys = [key_cache.get(key, row) for key, row in differ.index.items()]
+        timer.measure("sort", sort_order, sort_keys, SORT_SPEC)
+
+        def names():
+            for row in rows:
+                row_service(row)
+                if row["raddr"]:
+                    resolver.get(row["raddr"][0])
+        timer.measure("names", names)
+        resolver.wait(5.0)
+        timer.measure("record", writer.record, rows, delta)
+        index = timer.measure("index", SnapshotIndex, rows)
+        for filter_name, spec in FILTERS:
+            timer.measure(f"filter_{filter_name}", index.query, spec)
+        if model is not None:
+            timer.measure("model", model.apply_delta, delta, None, False)
+            timer.measure("render", view.grab)
+            app.processEvents()
+
+    resolver.stop()
+    writer.close()
+    capture_dir.cleanup()
+    if view is not None:
+        view.close()
+    results = phase_results(name, sockets, timer)
+    results.append({"workload": name, "sockets": sockets, "phase": "capture_file",
+                    "frames": writer.frames, "keyframes": writer.keyframes, "bytes": writer.nbytes})
+    return results
+
+
+def phase_results(name, sockets, timer):
+    results = []
+    for phase, samples in timer.samples.items():
+        ms = [sample * 1000 for sample in samples]
+        steady = ms[1:] or ms
+        results.append({
+            "workload": name,
+            "sockets": sockets,
+            "phase": phase,
+            "ticks": len(ms),
+            "first_ms": round(ms[0], 3),
+            "median_ms": round(statistics.median(steady), 3),
+            "mean_ms": round(statistics.mean(steady), 3),
+            "min_ms": round(min(steady), 3),
+            "max_ms": round(max(steady), 3),
+        })
+    return results
+
+
+def open_loopback_sockets(count, listeners=20):
+    """在本机建立约 count 个回环 socket（监听、已建立和 TIME_WAIT），返回需要保持打开的 socket"""
+    import resource  # 仅 Unix，只在 --kernel-sockets 时需要
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < count + 100:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, count + 100), hard))
+        soft = min(hard, count + 100)
+    count = min(count, soft - 100)
+    servers = []
+    for _ in range(listeners):
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen(1024)
+        servers.append(server)
+    opened = list(servers)
+    i = 0
+    while len(opened) + 2 <= count:
+        server = servers[i % listeners]
+        client = socket.create_connection(server.getsockname())
+        accepted, _ = server.accept()
+        opened += [client, accepted]
+        i += 1
+        if i % 10 == 0:
+            # 主动关闭的一端进入 TIME_WAIT，占用 socket 表但不占用文件描述符
+            client.close()
+            accepted.close()
+            opened = opened[:-2]
+    return opened
+
+
+def bench_kernel(sockets, ticks):
+    """比较 procfs、netlink 和 netlink 下推过滤读取真实回环连接的耗时"""
+    import port_netlink
+    import port_procfs
+    if not (port_procfs.is_supported() and port_netlink.is_supported()):
+        print("当前系统不支持 procfs/netlink 后端，跳过 --kernel-sockets", file=sys.stderr)
+        return []
+    opened = open_loopback_sockets(sockets)
+    port = opened[0].getsockname()[1]
+    filters = (
+        ("all", None),
+        ("listen", FilterSpec(state="LISTEN")),
+        ("port", FilterSpec(port=str(port))),
+        ("cidr_established", FilterSpec(remote="127.0.0.0/8", state="ESTABLISHED")),
+    )
+    timer = PhaseTimer()
+    try:
+        for backend_name in ("procfs", "netlink"):
+            for filter_name, spec in filters:
+                if backend_name == "procfs" and spec is not None:
+                    continue  # procfs 只能读取全部连接后过滤，耗时与 all 相同
+                collector = PortCollector(backend=create_backend(backend_name))
+                pushed = collector.set_filter(spec) if spec is not None else ()
+                phase = f"{backend_name}_{filter_name}" + ("_pushdown" if pushed else "")
+                for _ in range(ticks):
+                    timer.measure(phase, collector.collect)
+    finally:
+        for sock in opened:
+            sock.close()
+    return phase_results("kernel_loopback", len(opened), timer)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """与基线结果比较，返回退化的条目"""
+    old = {(r["workload"], r["sockets"], r["phase"]): r for r in baseline["results"] if "median_ms" in r}
+    regressions = []
+    for r in results:
+        base = old.get((r["workload"], r["sockets"], r["phase"]))
+        if base is None or "median_ms" not in r or not base["median_ms"]:
+            continue
+        ratio = r["median_ms"] / base["median_ms"]
+        mark = "  <-- 退化" if ratio > threshold else ""
+        print(f'{r["workload"]:>22} {r["sockets"]:>7} {r["phase"]:>18} '
+              f'{base["median_ms"]:>10.3f} -> {r["median_ms"]:>10.3f} ms  x{ratio:.2f}{mark}',
+              file=sys.stderr)
+        if ratio > threshold:
+            regressions.append(r)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="端口监控热路径基准测试")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="每个快照的连接数，逗号分隔")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="负载名称，逗号分隔")
+    parser.add_argument("--ticks", type=int, default=5, help="每个负载采集的次数")
+    parser.add_argument("--no-qt", action="store_true", help="跳过表格模型和绘制阶段")
+    parser.add_argument("--output", help="结果 JSON 写入的文件，默认输出到标准输出")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 比较")
+    parser.add_argument("--kernel-sockets", type=int, default=0,
+                        help="在本机建立该数量的回环 socket，比较 procfs/netlink 后端和内核过滤（仅 Linux）")
+    parser.add_argument("--capture", action="append", default=[], metavar="PATH",
+                        help="另外逐帧回放该录制文件（可重复），ticks 为最多回放的帧数；--sizes 0 时只运行录制文件")
+    parser.add_argument("--threshold", type=float, default=1.2, help="中位数变慢超过该倍数视为退化")
+    args = parser.parse_args(argv)
+
+    qt = None if args.no_qt else load_qt()
+    results = []
+    sizes = [int(size) for size in args.sizes.split(",") if int(size) > 0]
+    for name in args.workloads.split(","):
+        for sockets in sizes:
+            print(f"运行 {name} ({sockets} 连接)...", file=sys.stderr)
+            results.extend(bench_workload(name, sockets, args.ticks, qt))
+    for path in args.capture:
+        print(f"回放 {path}...", file=sys.stderr)
+        results.extend(bench_capture(path, args.ticks, qt))
+    if args.kernel_sockets:
+        print(f"运行 kernel_loopback ({args.kernel_sockets} socket)...", file=sys.stderr)
+        results.extend(bench_kernel(args.kernel_sockets, args.ticks))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "ticks": args.ticks,
+            "qt": qt is not None,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""主窗口启动基准测试
+
+每次在新的子进程中启动 PortMonitor（offscreen 平台，采集使用合成负载），记录：
+- import: 导入 port_monitor 的耗时
+- first_paint: 从启动子进程到表格第一次绘制（此时可能还没有数据）
+- full_data: 从启动子进程到首个快照的全部行插入表格之后的第一次绘制
+
+结果格式与 run_benchmarks.py 相同，可用 --compare 与之前保存的结果比较。
+
+用法示例:
+    python benchmarks/startup.py --sockets 1000,50000 --output startup.json
+    python benchmarks/startup.py --compare startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_child(workload, sockets, timeout):
+    """在子进程中运行：启动窗口，等待数据全部显示后以 JSON 输出各时刻（相对子进程启动）"""
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, HERE)
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    launched = time.time()
+    started = time.perf_counter()
+    import port_monitor
+    imported = time.perf_counter()
+    from PyQt5.QtCore import QObject, QEvent, QTimer
+    from PyQt5.QtWidgets import QApplication
+    from port_collector import PortCollector, ProcessCache
+    from synthetic import SyntheticBackend, make_workload
+
+    app = QApplication([])
+    setup_started = time.perf_counter()
+    backend = SyntheticBackend(make_workload(workload, sockets))
+    collector = PortCollector(ProcessCache(backend.process_factory), backend=backend)
+    setup = time.perf_counter() - setup_started  # 生成合成负载的耗时不计入启动时间
+    marks = {"import": imported - started}
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint:
+                now = time.perf_counter() - started - setup
+                marks.setdefault("first_paint", now)
+                if window.port_data and not window.loading:
+                    marks.setdefault("full_data", now)
+                    QTimer.singleShot(0, app.quit)
+            return False
+
+    window = port_monitor.PortMonitor(collector=collector)
+    watcher = PaintWatcher()
+    window.table.viewport().installEventFilter(watcher)
+    window.show()
+    QTimer.singleShot(int(timeout * 1000), app.quit)
+    app.exec_()
+    window.timer.stop()
+    window.collector_thread.wait()
+    marks["rows"] = window.table_model.rowCount()
+    print(json.dumps({"launched": launched, "marks": marks}))
+
+
+def launch(workload, sockets, timeout):
+    """启动一个子进程，返回各阶段耗时（毫秒），first_paint 和 full_data 包含解释器启动时间"""
+    spawned = time.time()
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), "--child", "--workloads", workload,
+         "--sockets", str(sockets), "--timeout", str(timeout)], text=True)
+    report = json.loads(output.strip().splitlines()[-1])
+    offset = report["launched"] - spawned  # 子进程开始执行本文件之前的耗时
+    marks = report["marks"]
+    if "full_data" not in marks:
+        raise RuntimeError(f"{timeout} 秒内没有显示全部数据（已显示 {marks['rows']} 行）")
+    return {
+        "import": marks["import"] * 1000,
+        "first_paint": (offset + marks["first_paint"]) * 1000,
+        "full_data": (offset + marks["full_data"]) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="主窗口启动基准测试")
+    parser.add_argument("--sockets", default="1000,50000", help="首个快照的连接数，逗号分隔")
+    parser.add_argument("--workloads", default="many_sockets_per_pid", help="负载名称，逗号分隔")
+    parser.add_argument("--runs", type=int, default=5, help="每个负载启动的次数")
+    parser.add_argument("--timeout", type=float, default=60.0, help="每次启动等待数据的最长时间（秒）")
+    parser.add_argument("--output", help="结果 JSON 写入的文件，默认输出到标准输出")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 比较")
+    parser.add_argument("--threshold", type=float, default=1.2, help="中位数变慢超过该倍数视为退化")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.workloads, int(args.sockets), args.timeout)
+        return 0
+
+    sys.path.insert(0, HERE)
+    from run_benchmarks import compare, git_commit
+
+    results = []
+    for name in args.workloads.split(","):
+        for sockets in (int(size) for size in args.sockets.split(",")):
+            print(f"启动 {name} ({sockets} 连接) x{args.runs}...", file=sys.stderr)
+            samples = {}
+            for _ in range(args.runs):
+                for phase, ms in launch(name, sockets, args.timeout).items():
+                    samples.setdefault(phase, []).append(ms)
+            for phase, ms in samples.items():
+                results.append({
+                    "workload": f"startup_{name}",
+                    "sockets": sockets,
+                    "phase": phase,
+                    "runs": len(ms),
+                    "median_ms": round(statistics.median(ms), 3),
+                    "min_ms": round(min(ms), 3),
+                    "max_ms": round(max(ms), 3),
+                })
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "runs": args.runs,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""确定性的合成连接负载
+
+SyntheticBackend 实现与 PsutilBackend 相同的接口（connections / pids），
+SyntheticProcess 模拟 psutil.Process 的 name / create_time，二者配合可以在没有
+真实网络负载、没有 root 权限的情况下重复生成相同的快照序列。
+"""
+import random
+import socket
+
+import psutil
+
+STATES = ("ESTABLISHED", "TIME_WAIT", "CLOSE_WAIT", "SYN_SENT", "FIN_WAIT2")
+
+
+class Workload:
+    """负载参数
+
+    sockets:        每个快照的连接数
+    pids:           进程数
+    pid_turnover:   每次刷新被替换的进程比例（模拟大量短生命周期进程）
+    ipv6_ratio:     IPv6 连接比例
+    time_wait:      TIME_WAIT 连接比例
+    churn:          每次刷新被替换的连接比例
+    """
+    def __init__(self, name, sockets, pids, pid_turnover=0.0, ipv6_ratio=0.1,
+                 time_wait=0.05, churn=0.02, listen_ratio=0.02, udp_ratio=0.05):
+        self.name = name
+        self.sockets = sockets
+        self.pids = pids
+        self.pid_turnover = pid_turnover
+        self.ipv6_ratio = ipv6_ratio
+        self.time_wait = time_wait
+        self.churn = churn
+        self.listen_ratio = listen_ratio
+        self.udp_ratio = udp_ratio
+
+
+WORKLOADS = {
+    "many_sockets_per_pid": lambda n: Workload("many_sockets_per_pid", n, pids=max(4, n // 2000)),
+    "short_lived_pids": lambda n: Workload("short_lived_pids", n, pids=max(10, n // 4),
+                                           pid_turnover=0.3, churn=0.3),
+    "ipv6_heavy": lambda n: Workload("ipv6_heavy", n, pids=max(10, n // 50), ipv6_ratio=0.8),
+    "time_wait_churn": lambda n: Workload("time_wait_churn", n, pids=max(10, n // 100),
+                                          time_wait=0.6, churn=0.4),
+}
+
+
+def make_workload(name, sockets):
+    return WORKLOADS[name](sockets)
+
+
+class SyntheticBackend:
+    """按负载参数生成连接序列的采集后端，每次调用 connections() 前进一个时刻"""
+    name = "synthetic"
+
+    def __init__(self, workload, seed=0):
+        self.workload = workload
+        self.random = random.Random(seed)
+        self.next_pid = 1000
+        self.create_times = {}  # pid -> 创建时间
+        self.names = {}
+        self.clock = 1_700_000_000.0
+        self.live_pids = [self._spawn() for _ in range(workload.pids)]
+        self.rows = [self._make_connection() for _ in range(workload.sockets)]
+        self.ticks = 0
+
+    def _spawn(self):
+        # PID 在一个有限区间内循环分配（跳过仍存活的），以便覆盖 PID 复用
+        span = self.workload.pids * 4 + 1
+        pid = self.next_pid
+        while pid in self.create_times:
+            pid = 1000 + (pid - 999) % span
+        self.next_pid = 1000 + (pid - 999) % span
+        self.clock += 0.001
+        self.create_times[pid] = self.clock
+        self.names[pid] = f"proc-{self.random.randrange(self.workload.pids)}"
+        return pid
+
+    def _address(self, family, local):
+        r = self.random
+        if family == socket.AF_INET6:
+            if local:
+                return "::"
+            return f"2001:db8:{r.randrange(65536):x}::{r.randrange(65536):x}"
+        if local:
+            return r.choice(("0.0.0.0", "127.0.0.1", "10.0.0.5"))
+        return f"10.{r.randrange(256)}.{r.randrange(256)}.{r.randrange(1, 255)}"
+
+    def _make_connection(self):
+        w = self.workload
+        r = self.random
+        pid = r.choice(self.live_pids)
+        family = socket.AF_INET6 if r.random() < w.ipv6_ratio else socket.AF_INET
+        laddr = (self._address(family, True), r.randrange(1024, 65536))
+        if r.random() < w.udp_ratio:
+            return (pid, family, socket.SOCK_DGRAM, laddr, None, psutil.CONN_NONE)
+        if r.random() < w.listen_ratio:
+            return (pid, family, socket.SOCK_STREAM, laddr, None, psutil.CONN_LISTEN)
+        raddr = (self._address(family, False), r.randrange(1, 65536))
+        status = "TIME_WAIT" if r.random() < w.time_wait else r.choice(STATES)
+        return (pid, family, socket.SOCK_STREAM, laddr, raddr, status)
+
+    def advance(self):
+        """前进一个时刻：替换部分进程和连接"""
+        w = self.workload
+        r = self.random
+        if w.pid_turnover:
+            for i in range(len(self.live_pids)):
+                if r.random() < w.pid_turnover:
+                    old = self.live_pids[i]
+                    del self.create_times[old]
+                    self.live_pids[i] = self._spawn()
+        live = set(self.live_pids)
+        for i in range(len(self.rows)):
+            if self.rows[i][0] not in live or r.random() < w.churn:
+                self.rows[i] = self._make_connection()
+
+    def connections(self):
+        if self.ticks:
+            self.advance()
+        self.ticks += 1
+        return list(self.rows)
+
+    def pids(self):
+        return list(self.create_times)
+
+    def process_factory(self, pid):
+        return SyntheticProcess(self, pid)
+
+
+class SyntheticProcess:
+    """模拟 psutil.Process 中采集用到的部分"""
+    def __init__(self, backend, pid):
+        if pid not in backend.create_times:
+            raise psutil.NoSuchProcess(pid)
+        self.pid = pid
+        self._backend = backend
+        self._create_time = backend.create_times[pid]
+
+    def create_time(self):
+        return self._create_time
+
+    def name(self):
+        if self._backend.create_times.get(self.pid) != self._create_time:
+            raise psutil.NoSuchProcess(self.pid)
+        return self._backend.names[self.pid]
@@ -0,0 +1,67 @@
+"""批量关闭进程
+
+本模块不依赖Qt。先向所有目标进程并发发送终止信号，用 psutil.wait_procs
+统一等待；超时仍未退出的进程再强制结束。每个PID的结果单独记录。
+"""
+import psutil
+
+TERMINATED = "已关闭"
+KILLED = "已强制关闭"
+GONE = "进程不存在或已终止"
+DENIED = "权限不足"
+ALIVE = "仍在运行"
+
+
+def terminate_processes(pids, force=False, timeout=3.0, on_progress=None):
+    """关闭一组进程并返回 {pid: 结果}
+
+    force 为 False 时先 terminate，等待 timeout 秒后对仍在运行的进程 kill；
+    force 为 True 时直接 kill。on_progress(已完成数, 总数) 在每个进程结束时调用。
+    """
+    total = len(pids)
+    results = {}
+    procs = []
+
+    def report():
+        if on_progress is not None:
+            on_progress(len(results), total)
+
+    def signal(procs, method, gone=GONE):
+        alive = []
+        for proc in procs:
+            try:
+                getattr(proc, method)()
+                alive.append(proc)
+            except psutil.NoSuchProcess:
+                results[proc.pid] = gone
+                report()
+            except psutil.AccessDenied:
+                results[proc.pid] = DENIED
+                report()
+        return alive
+
+    for pid in pids:
+        try:
+            procs.append(psutil.Process(pid))
+        except psutil.NoSuchProcess:
+            results[pid] = GONE
+            report()
+
+    def wait(procs, outcome):
+        def on_terminate(proc):
+            results[proc.pid] = outcome
+            report()
+        _, alive = psutil.wait_procs(procs, timeout=timeout, callback=on_terminate)
+        return alive
+
+    if force:
+        alive = wait(signal(procs, "kill"), KILLED)
+    else:
+        alive = wait(signal(procs, "terminate"), TERMINATED)
+        if alive:
+            # 等待超时后才退出的进程是被 terminate 关闭的
+            alive = wait(signal(alive, "kill", TERMINATED), KILLED)
+    for proc in alive:
+        results[proc.pid] = ALIVE
+        report()
+    return results
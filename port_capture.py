@@ -0,0 +1,351 @@
+"""快照录制与回放
+
+本模块不依赖Qt。CaptureWriter 把每次采集的结果追加写入录制文件，CaptureReader 按时间
+定位并还原任意时刻的连接表，ReplayCollector 按录制时的节奏（或 N 倍速、或逐帧）回放，
+接口与 PortCollector.collect() 相同，图形界面、无界面模式和基准测试都可以直接使用，
+不需要 root 权限，也不需要在线系统。
+
+文件格式：8 字节文件头，之后是只追加的帧。每帧为未压缩的帧头
+（类型、序号、时间戳、数据长度）加 zlib 压缩的 JSON：
+- 关键帧（K）保存完整快照，每 keyframe_interval 帧写入一次，差异大于快照一半时也写入关键帧
+- 差异帧（D）保存与上一帧相比新增、关闭和变化的连接
+行的编码与 port_remote 相同，另外保存 host 字段（多主机汇总时）。
+
+关键帧的位置同时追加到 <文件名>.idx 索引，打开时读取索引，只需扫描最后一个关键帧之后的帧头；
+索引缺失或损坏时扫描全部帧头重建（只读帧头，不解压）。定位到某一时刻时从之前最近的关键帧
+开始应用差异，最多解压 keyframe_interval 帧。写入中断留下的不完整帧在读取时忽略，
+再次打开写入时截掉。还原的快照中连接的集合与采集时相同，行的顺序可能不同。
+"""
+import bisect
+import json
+import os
+import struct
+import time
+import zlib
+
+from port_collector import make_row
+from port_diff import connection_key, index_rows
+from port_remote import encode_row
+from port_store import RELATIVE_UNITS, parse_time
+
+MAGIC = b"PORTCAP1"
+FRAME = struct.Struct("!cIdI")  # 类型, 序号, 时间戳, 压缩后的数据长度
+INDEX_ENTRY = struct.Struct("!dIQ")  # 关键帧的时间戳, 序号, 偏移
+KEYFRAME = b"K"
+DELTA = b"D"
+MAX_FRAME = 256 * 1024 * 1024  # 单帧压缩后的上限（字节），超过时视为文件损坏
+COMPRESS_LEVEL = 1  # 与 port_remote 相同：快照高度重复，低压缩级别已足够，关键帧的CPU开销小得多
+
+
+class CaptureError(ValueError):
+    """录制文件格式错误"""
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+def encode_capture_row(row):
+    item = encode_row(row)
+    host = row.get("host")
+    if host is not None:
+        item.append(host)
+    return item
+
+
+def decode_capture_row(item):
+    pid, name, family, type_, lip, lport, rip, rport, status, *host = item
+    row = make_row(pid, name, family, type_, (lip, lport),
+                   (rip, rport) if rip is not None else None, status)
+    if host:
+        row["host"] = host[0]
+    return row
+
+
+def decode_items(items):
+    """把 [[序号, 编码行], ...] 还原为 [(键, 行), ...]"""
+    result = []
+    for n, item in items:
+        row = decode_capture_row(item)
+        result.append(((connection_key(row), n), row))
+    return result
+
+
+def parse_position(text, start):
+    """解析回放位置：+90s / +5m 等相对于录制开始的偏移，其余格式同 parse_time"""
+    text = text.strip()
+    if not text.startswith("+"):
+        return parse_time(text)
+    value, unit = (text[1:-1], text[-1]) if text[-1:] in RELATIVE_UNITS else (text[1:], "s")
+    try:
+        return start + float(value) * RELATIVE_UNITS[unit]
+    except ValueError:
+        raise ValueError(f"无效的时间: {text}") from None
+
+
+class CaptureWriter:
+    """追加写入录制文件；写入已有文件时从一个关键帧开始续写"""
+    def __init__(self, path, keyframe_interval=60, compress_level=COMPRESS_LEVEL):
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.compress_level = compress_level
+        self.frames = 0
+        self.keyframes = 0
+        self.next_seq = 0
+        self._since_keyframe = None  # 上一个关键帧之后的帧数，None 表示下一帧必须是关键帧
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, "r+b" if exists else "w+b")
+        try:
+            keyframes = []
+            if exists:
+                with CaptureReader(path, scan_only=True) as reader:
+                    keyframes = reader.keyframes
+                    self._file.truncate(reader.end)  # 截掉写入中断留下的不完整帧
+                    self._file.seek(reader.end)
+                    self.next_seq = reader.last_seq + 1 if reader.last_seq is not None else 0
+            else:
+                self._file.write(MAGIC)
+            # 按实际的关键帧重写索引，去掉被截掉的条目
+            self._index = open(index_path(path), "wb")
+            self._index.write(b"".join(INDEX_ENTRY.pack(*entry) for entry in keyframes))
+            self._index.flush()
+        except BaseException:
+            self._file.close()
+            raise
+        self.nbytes = self._file.tell()
+
+    def record(self, rows, delta, timestamp=None):
+        """写入一次采集结果，delta 为与上一次写入的快照的差异，返回写入的帧类型"""
+        timestamp = time.time() if timestamp is None else timestamp
+        if (self._since_keyframe is None or self._since_keyframe + 1 >= self.keyframe_interval
+                or len(delta) * 2 > len(rows)):
+            kind = KEYFRAME
+            payload = [encode_capture_row(row) for row in rows]
+        else:
+            kind = DELTA
+            payload = {
+                "add": [[key[1], encode_capture_row(row)] for key, row in delta.added],
+                "del": [[key[1], encode_capture_row(row)] for key, row in delta.removed],
+                "chg": [[key[1], encode_capture_row(new)] for key, _, new in delta.changed],
+            }
+        data = zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+                             .encode("utf-8"), self.compress_level)
+        offset = self._file.tell()
+        self._file.write(FRAME.pack(kind, self.next_seq, timestamp, len(data)) + data)
+        self._file.flush()
+        if kind == KEYFRAME:
+            self._index.write(INDEX_ENTRY.pack(timestamp, self.next_seq, offset))
+            self._index.flush()
+            self.keyframes += 1
+            self._since_keyframe = 0
+        else:
+            self._since_keyframe += 1
+        self.next_seq += 1
+        self.frames += 1
+        self.nbytes = self._file.tell()
+        return kind
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+
+
+class CaptureReader:
+    """读取录制文件，按时间定位和顺序还原快照"""
+    def __init__(self, path, scan_only=False):
+        self.path = path
+        self.keyframes = []  # [(时间戳, 序号, 偏移)]
+        self.first_time = self.last_time = None
+        self.first_seq = self.last_seq = None
+        self.frames = 0  # 文件中的帧数
+        self._file = open(path, "rb")
+        try:
+            if self._file.read(len(MAGIC)) != MAGIC:
+                raise CaptureError(f"不是录制文件: {path}")
+            self.size = os.fstat(self._file.fileno()).st_size
+            offset = self._load_index() if not scan_only else None
+            if offset is None:
+                self.keyframes = []
+                offset = len(MAGIC)
+                self.frames = 0
+            self.end = self._scan(offset)
+        except BaseException:
+            self._file.close()
+            raise
+        self._times = [entry[0] for entry in self.keyframes]
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _header(self, offset):
+        """读取 offset 处的帧头，帧不完整或格式错误时返回 None"""
+        if offset + FRAME.size > self.size:
+            return None
+        self._file.seek(offset)
+        kind, seq, ts, length = FRAME.unpack(self._file.read(FRAME.size))
+        if kind not in (KEYFRAME, DELTA) or length > MAX_FRAME or offset + FRAME.size + length > self.size:
+            return None
+        return kind, seq, ts, length
+
+    def _load_index(self):
+        """读取关键帧索引，返回需要继续扫描帧头的位置，索引不可用时返回 None"""
+        try:
+            with open(index_path(self.path), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        entries = [INDEX_ENTRY.unpack_from(data, i) for i in range(0, usable, INDEX_ENTRY.size)]
+        # 只保留帧头与索引一致的条目（续写前被截掉的关键帧不可用）
+        while entries:
+            ts, seq, offset = entries[-1]
+            header = self._header(offset)
+            if header is not None and header[:3] == (KEYFRAME, seq, ts):
+                break
+            entries.pop()
+        if not entries or entries[0][2] != len(MAGIC):
+            return None
+        self.keyframes = entries
+        first = self._header(len(MAGIC))
+        self.first_seq, self.first_time = first[1], first[2]
+        self.frames = entries[-1][1] - self.first_seq  # 最后一个关键帧之前的帧，由 _scan 补上其余的
+        return entries[-1][2]
+
+    def _scan(self, offset):
+        """从 offset 开始扫描帧头（不解压），补充关键帧索引，返回最后一个完整帧的结束位置"""
+        indexed = {entry[2] for entry in self.keyframes[-1:]}
+        while True:
+            header = self._header(offset)
+            if header is None:
+                return offset
+            kind, seq, ts, length = header
+            if kind == KEYFRAME and offset not in indexed:
+                self.keyframes.append((ts, seq, offset))
+            if self.first_seq is None:
+                self.first_seq, self.first_time = seq, ts
+            self.last_seq, self.last_time = seq, ts
+            self.frames += 1
+            offset += FRAME.size + length
+
+    def _frames(self, offset):
+        """从 offset 开始顺序读取帧，返回 (类型, 时间戳, 解码后的数据)"""
+        while offset < self.end:
+            kind, _, ts, length = self._header(offset)
+            data = self._file.read(length)
+            try:
+                payload = json.loads(zlib.decompress(data))
+            except (zlib.error, ValueError) as e:
+                raise CaptureError(f"录制文件在偏移 {offset} 处损坏: {e}") from None
+            yield kind, ts, payload
+            offset += FRAME.size + length
+
+    def snapshots(self, start=None):
+        """从 start 时刻（默认从头）开始依次还原快照，产生 (时间戳, 索引)
+
+        第一个快照为 start 时刻的连接表（此前最近的一帧）。索引为 {(连接标识, 序号): 行}，
+        在下一次迭代时会被原地修改，需要保留时自行复制。
+        """
+        if not self.keyframes:
+            return
+        i = max(bisect.bisect_right(self._times, start) - 1, 0) if start is not None else 0
+        index = {}
+        current = None
+        pending = start is not None  # 尚未到达 start
+        for kind, ts, payload in self._frames(self.keyframes[i][2]):
+            if pending and ts > start:
+                pending = False
+                if current is not None:
+                    yield current, index
+            if kind == KEYFRAME:
+                index.clear()
+                index.update(index_rows(decode_capture_row(item) for item in payload))
+            else:
+                for key, _ in decode_items(payload["del"]):
+                    index.pop(key, None)
+                index.update(decode_items(payload["chg"]))
+                index.update(decode_items(payload["add"]))
+            current = ts
+            if not pending:
+                yield ts, index
+        if pending and current is not None:
+            yield current, index  # start 晚于录制结束，停在最后一帧
+
+    def state_at(self, timestamp):
+        """还原 timestamp 时刻的连接表，返回 (快照时间戳, 行列表)，没有数据时返回 (None, [])"""
+        for ts, index in self.snapshots(timestamp):
+            return ts, list(index.values())
+        return None, []
+
+
+class ReplayCollector:
+    """按录制时间回放，接口与 PortCollector.collect() 相同
+
+    speed 为回放速度倍数：1 为按录制时的节奏，N 为 N 倍速，0 为不等待，每次 collect()
+    返回下一帧（用于基准测试和回归测试）。按速度回放时每次 collect() 返回当前回放时刻的
+    快照，间隔期间的帧被跳过；回放到末尾后停在最后一帧，finished 为 True。
+    """
+    name = "replay"
+    process_cache = None
+
+    def __init__(self, reader, speed=1.0, start=None, clock=time.monotonic):
+        self.reader = reader
+        self.speed = speed
+        self.clock = clock
+        self.last_duration = 0.0
+        self.timestamp = None  # 最近一次返回的快照的录制时间
+        self.finished = False
+        self._rows = []
+        self.seek(start)
+
+    def set_filter(self, spec):
+        """回放数据无法下推过滤条件"""
+        return ()
+
+    def seek(self, timestamp):
+        """跳转到 timestamp 时刻（None 为录制开始），下一次 collect() 返回该时刻的快照"""
+        self._snapshots = self.reader.snapshots(timestamp)
+        self._next = next(self._snapshots, None)
+        self._origin = None  # 下一次 collect() 时以返回的帧为起点计时
+        self.finished = self._next is None
+
+    def position(self):
+        """当前回放时刻（录制时间）"""
+        if self._origin is None:
+            return self._next[0] if self._next is not None else self.timestamp
+        origin_ts, origin_clock = self._origin
+        return origin_ts + (self.clock() - origin_clock) * self.speed
+
+    def collect(self):
+        started = time.perf_counter()
+        if self._next is not None:
+            if self._origin is None or not self.speed:
+                self._take()
+                if self._origin is None:
+                    self._origin = (self.timestamp, self.clock())
+            else:
+                position = self.position()
+                while self._next is not None and self._next[0] <= position:
+                    self._take()
+        self.last_duration = time.perf_counter() - started
+        return list(self._rows)
+
+    def _take(self):
+        # 先复制本帧的行：读取下一帧会原地修改同一个索引
+        self.timestamp, index = self._next
+        self._rows = list(index.values())
+        self._next = next(self._snapshots, None)
+        self.finished = self._next is None
+
+    def next_delay(self):
+        """距离下一帧的等待时间（秒），已回放到末尾时返回 None"""
+        if self._next is None:
+            return None
+        if not self.speed or self._origin is None:
+            return 0.0
+        return max(0.0, (self._next[0] - self.position()) / self.speed)
@@ -0,0 +1,360 @@
+"""端口占用监控的无界面模式
+
+与图形界面共用采集、差异和过滤逻辑，但不导入Qt，适合在没有显示器的服务器上运行。
+每条连接或连接变化以一行 JSON（NDJSON）输出到标准输出，便于接入日志采集。
+
+用法示例:
+    python port_cli.py --once --state LISTEN
+    python port_cli.py --interval 5 --deltas --port 8000-8100
+    python port_cli.py --quiet --metrics-port 9464
+    python port_cli.py --quiet --serve-port 9500 --serve-host 0.0.0.0   # 作为远程代理运行
+    python port_cli.py --deltas --connect web1:9500 --connect web2:9500  # 汇总多个代理
+    python port_cli.py --quiet --store events.db                     # 记录连接事件
+    python port_cli.py --store events.db --since 2h --port 5432     # 查询最近两小时的事件
+    python port_cli.py --store events.db --at "03:10" --port 5432    # 还原 03:10 的连接表
+    python port_cli.py --quiet --rules rules.json                    # 按规则告警，告警输出到标准错误
+    python port_cli.py --once --names --state ESTABLISHED            # 附带服务名和远程主机名
+    python port_cli.py --pushdown --deltas --state LISTEN            # 在内核中过滤（Linux netlink 后端）
+    python port_cli.py --quiet --record night.cap                     # 录制每次采集的结果
+    python port_cli.py --replay night.cap --speed 60 --deltas         # 以 60 倍速回放
+    python port_cli.py --replay night.cap --seek "2024-05-01 02:00" --once --port 5432  # 还原某一时刻
+"""
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+import time
+
+from port_capture import CaptureError, CaptureReader, CaptureWriter, ReplayCollector, parse_position
+from port_collector import BACKENDS, PortCollector, protocol_name
+from port_diff import SnapshotDiffer
+from port_filter import FilterError, FilterSpec
+from port_metrics import MetricsRegistry, MetricsServer
+from port_names import NameResolver, service_name
+from port_perf import Profiler
+from port_remote import AgentServer, RemoteAggregator
+from port_rules import RuleEngine, RuleError
+from port_store import EventStore, parse_time
+
+
+def row_to_record(row):
+    """把一行数据转换为可序列化为JSON的字典"""
+    raddr = row["raddr"]
+    record = {
+        "pid": row["pid"],
+        "name": row["name"],
+        "proto": protocol_name(row),
+        "laddr": row["laddr"][0],
+        "lport": row["laddr"][1],
+        "raddr": raddr[0] if raddr else None,
+        "rport": raddr[1] if raddr else None,
+        "status": row["status"],
+    }
+    host = row.get("host")
+    if host is not None:
+        record["host"] = host
+    return record
+
+
+def snapshot_records(rows, spec, timestamp):
+    """完整快照中满足条件的每条连接"""
+    for row in rows:
+        if spec.matches(row):
+            record = row_to_record(row)
+            record["ts"] = timestamp
+            record["event"] = "snapshot"
+            yield record
+
+
+def delta_records(delta, spec, timestamp):
+    """快照差异中满足条件的连接事件：open / close / change"""
+    for event, items in (("open", delta.added), ("close", delta.removed)):
+        for _, row in items:
+            if spec.matches(row):
+                record = row_to_record(row)
+                record["ts"] = timestamp
+                record["event"] = event
+                yield record
+    for _, old, new in delta.changed:
+        if spec.matches(new) or spec.matches(old):
+            record = row_to_record(new)
+            record["ts"] = timestamp
+            record["event"] = "change"
+            record["old_status"] = old["status"]
+            yield record
+
+
+def annotate_names(records, resolver):
+    """为记录加上本地端口的服务名（service）和远程主机名（rhost），主机名只取已解析的结果"""
+    for record in records:
+        record["service"] = service_name(record["lport"], "udp" if record["proto"].startswith("udp") else "tcp")
+        record["rhost"] = resolver.get(record["raddr"]) if record["raddr"] else None
+        yield record
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="端口占用监控（无界面模式，输出 NDJSON）")
+    parser.add_argument("--once", action="store_true", help="只采集一次后退出")
+    parser.add_argument("--interval", type=float, default=5.0, help="采集间隔（秒），默认 5")
+    parser.add_argument("--port", default="", help="按端口过滤，支持 80、8000-8100、22,443")
+    parser.add_argument("--process", default="", help="按进程名子串或PID过滤")
+    parser.add_argument("--remote", default="", help="按远程地址前缀或网段过滤，如 10.0.0.0/8")
+    parser.add_argument("--state", default="", help="按连接状态过滤，如 LISTEN,ESTABLISHED")
+    parser.add_argument("--deltas", action="store_true",
+                        help="只输出相邻两次采集之间的变化（open/close/change）")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto", help="采集后端")
+    parser.add_argument("--pushdown", action="store_true",
+                        help="把状态、端口和远程网段条件下推到内核（Linux netlink 后端），不满足的连接不会被读取；"
+                             "不能与需要完整快照的 --metrics-port、--serve-port、--store、--rules、--connect 同时使用")
+    parser.add_argument("--stats", action="store_true",
+                        help="每次采集后向标准错误输出耗时、CPU时间和各阶段耗时")
+    parser.add_argument("--quiet", action="store_true", help="不输出 NDJSON（配合 --metrics-port 使用）")
+    parser.add_argument("--metrics-port", type=int, help="在该端口提供 Prometheus /metrics 接口")
+    parser.add_argument("--metrics-host", default="127.0.0.1", help="指标接口监听地址，默认 127.0.0.1")
+    parser.add_argument("--serve-port", type=int, help="作为代理运行，在该端口向远程客户端推送快照差异")
+    parser.add_argument("--serve-host", default="127.0.0.1", help="代理监听地址，默认 127.0.0.1")
+    parser.add_argument("--connect", action="append", default=[], metavar="HOST:PORT",
+                        help="连接远程代理并汇总其数据（可重复），此时不采集本机")
+    parser.add_argument("--store", metavar="PATH", help="把连接事件和定期快照记录到该 SQLite 文件")
+    parser.add_argument("--store-snapshot-interval", type=float, default=300.0,
+                        help="写入完整快照的间隔（秒），默认 300")
+    parser.add_argument("--retention-days", type=float, default=7.0, help="事件保留天数，默认 7")
+    parser.add_argument("--retention-mb", type=float, default=512.0, help="事件文件大小上限（MB），默认 512")
+    parser.add_argument("--since", help="查询 --store 中从该时间开始的事件后退出，如 2h（两小时前）、03:00、2024-05-01 03:00")
+    parser.add_argument("--until", help="查询事件的结束时间，默认为现在")
+    parser.add_argument("--at", help="输出 --store 中还原的该时刻的连接表后退出")
+    parser.add_argument("--rules", metavar="PATH", help="监视规则文件（JSON），触发的告警以日志输出到标准错误")
+    parser.add_argument("--names", action="store_true",
+                        help="输出服务名和远程主机名；主机名在后台解析，解析完成前为 null")
+    parser.add_argument("--names-wait", type=float, default=3.0,
+                        help="配合 --once 时最多等待主机名解析的秒数，默认 3")
+    parser.add_argument("--record", metavar="PATH", help="把每次采集的结果追加录制到该文件，可用 --replay 回放")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="回放录制文件代替采集，按录制的间隔输出，回放到末尾后退出")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="回放速度倍数，默认 1（按录制时的节奏）；0 表示不等待，逐帧输出")
+    parser.add_argument("--seek", metavar="TIME",
+                        help="从该时刻开始回放，如 +10m（录制开始后10分钟）、03:00、2024-05-01 03:00")
+    return parser
+
+
+def run_query(args, spec, out, err):
+    """查询 --store 中保存的事件或某一时刻的连接表"""
+    if not args.store:
+        err.write("查询历史需要指定 --store\n")
+        return 2
+    try:
+        since = parse_time(args.since) if args.since else None
+        until = parse_time(args.until) if args.until else None
+        at = parse_time(args.at) if args.at else None
+    except ValueError as e:
+        err.write(f"{e}\n")
+        return 2
+    try:
+        store = EventStore(args.store)
+    except sqlite3.Error as e:
+        err.write(f"无法打开事件存储: {e}\n")
+        return 1
+    records = store.state_at(at, spec) if at is not None else store.query(since, until, spec)
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    for record in records:
+        out.write(encode(record))
+        out.write("\n")
+    out.flush()
+    return 0
+
+
+def run(args, out=sys.stdout, err=sys.stderr):
+    try:
+        spec = FilterSpec(args.port, args.process, args.remote, args.state)
+    except FilterError as e:
+        err.write(f"过滤条件无效: {e}\n")
+        return 2
+    if args.since or args.until or args.at:
+        return run_query(args, spec, out, err)
+    if args.replay and args.connect:
+        err.write("--replay 与 --connect 不能同时使用\n")
+        return 2
+    if args.speed < 0:
+        err.write("--speed 不能为负数\n")
+        return 2
+    if args.pushdown:
+        conflicts = [option for option, value in (
+            ("--metrics-port", args.metrics_port), ("--serve-port", args.serve_port), ("--store", args.store),
+            ("--rules", args.rules), ("--connect", args.connect)) if value]
+        if conflicts:
+            err.write(f"--pushdown 只采集满足条件的连接，不能与 {', '.join(conflicts)} 同时使用\n")
+            return 2
+
+    rules = None
+    if args.rules:
+        try:
+            rules = RuleEngine.from_file(args.rules)
+        except RuleError as e:
+            err.write(f"{e}\n")
+            return 2
+        logging.basicConfig(stream=err, format="%(asctime)s %(levelname)s %(message)s")
+
+    resolver = reader = remote = metrics_server = agent = store = recorder = None
+    try:
+        if args.names:
+            resolver = NameResolver().start()
+        profiler = Profiler(enabled=args.stats)
+        if args.replay:
+            try:
+                reader = CaptureReader(args.replay)
+            except (OSError, CaptureError) as e:
+                err.write(f"无法打开录制文件: {e}\n")
+                return 1
+            try:
+                start = parse_position(args.seek, reader.first_time or 0.0) if args.seek else None
+            except ValueError as e:
+                err.write(f"{e}\n")
+                return 2
+            collector = ReplayCollector(reader, args.speed, start)
+            backend_name = collector.name
+        elif args.connect:
+            try:
+                remote = RemoteAggregator(args.connect)
+            except ValueError as e:
+                err.write(f"{e}\n")
+                return 2
+            remote.start()
+            remote.wait_ready()
+            collector = remote
+            backend_name = collector.name
+        else:
+            collector = PortCollector(backend=args.backend, profiler=profiler)
+            backend_name = collector.backend.name
+        pushed = collector.set_filter(spec) if args.pushdown else ()
+        if args.pushdown and spec and not pushed:
+            err.write(f"过滤条件无法下推到 {backend_name} 采集后端，改为采集后过滤\n")
+        process_cache = collector.process_cache
+        differ = SnapshotDiffer()
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        metrics = None
+        if args.metrics_port is not None:
+            metrics = MetricsRegistry()
+            try:
+                metrics_server = MetricsServer(metrics, args.metrics_host, args.metrics_port).start()
+            except OSError as e:
+                err.write(f"无法启动指标接口: {e}\n")
+                return 1
+        if args.serve_port is not None:
+            try:
+                agent = AgentServer(args.serve_host, args.serve_port).start()
+            except OSError as e:
+                err.write(f"无法启动代理服务: {e}\n")
+                return 1
+        if args.store:
+            try:
+                store = EventStore(args.store, args.store_snapshot_interval, args.retention_days * 86400,
+                                   int(args.retention_mb * 1024 * 1024)).start()
+            except sqlite3.Error as e:
+                err.write(f"无法打开事件存储: {e}\n")
+                return 1
+        if args.record:
+            try:
+                recorder = CaptureWriter(args.record)
+            except (OSError, CaptureError) as e:
+                err.write(f"无法打开录制文件: {e}\n")
+                return 1
+
+        while True:
+            started = time.monotonic()
+            cpu_started = time.process_time()
+            profiler.begin_tick()
+            timestamp = time.time()
+            rows = collector.collect()
+            if pushed:
+                pushed = collector.pushed  # 后端回退到 /proc/net 后不再在内核中过滤
+            if args.replay:
+                timestamp = collector.timestamp  # 输出和记录使用录制时间
+            if metrics is not None:
+                metrics.update(rows, collector.last_duration,
+                               process_cache.stats() if process_cache is not None else None, timestamp)
+            if (args.deltas or agent is not None or store is not None or rules is not None
+                    or recorder is not None):
+                with profiler.phase("diff"):
+                    delta = differ.update(rows)
+                if agent is not None:
+                    agent.publish(rows, delta, timestamp)
+                if store is not None:
+                    store.record(rows, delta, timestamp)
+                if recorder is not None:
+                    with profiler.phase("record"):
+                        recorder.record(rows, delta, timestamp)
+                if rules is not None:
+                    with profiler.phase("rules"):
+                        rules.process(delta, timestamp)
+            if args.deltas:
+                records = delta_records(delta, spec, timestamp)
+            else:
+                records = snapshot_records(rows, spec, timestamp)
+            if resolver is not None:
+                if args.once and not args.quiet:
+                    # 只输出一次，先提交全部远程地址并等待解析
+                    for row in rows:
+                        if row["raddr"] and spec.matches(row):
+                            resolver.get(row["raddr"][0])
+                    resolver.wait(args.names_wait)
+                records = annotate_names(records, resolver)
+            count = 0
+            if not args.quiet:
+                for record in records:
+                    out.write(encode(record))
+                    out.write("\n")
+                    count += 1
+                out.flush()
+
+            elapsed = time.monotonic() - started
+            if args.stats:
+                stats = {"ts": timestamp, "rows": len(rows), "emitted": count,
+                         "wall_ms": round(elapsed * 1000, 3),
+                         "cpu_ms": round((time.process_time() - cpu_started) * 1000, 3),
+                         "backend": backend_name,
+                         "pushdown": list(pushed),
+                         "phases_ms": {name: round(ms, 3) for name, ms in profiler.last_tick().items()}}
+                err.write(encode(stats) + "\n")
+                err.flush()
+            if args.once:
+                return 0
+            if args.replay:
+                delay = collector.next_delay()
+                if delay is None:
+                    return 0  # 已回放到末尾
+                time.sleep(delay)
+            else:
+                time.sleep(max(0.0, args.interval - elapsed))
+    finally:
+        # 提前返回时也要停止已经启动的组件
+        if recorder is not None:
+            recorder.close()
+        if store is not None:
+            store.stop()  # 写入队列中剩余的事件
+        if agent is not None:
+            agent.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if remote is not None:
+            remote.stop()
+        if reader is not None:
+            reader.close()
+        if resolver is not None:
+            resolver.stop()
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return run(args)
+    except KeyboardInterrupt:
+        return 0
+    except BrokenPipeError:
+        # 下游管道已关闭（如 head），静默退出
+        sys.stderr.close()
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
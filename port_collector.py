@@ -0,0 +1,223 @@
+"""端口连接采集逻辑
+
+本模块不依赖Qt，可以在后台线程中运行。
+"""
+import socket
+import time
+
+import psutil
+
+from port_perf import DISABLED
+
+UNKNOWN_PROCESS = "未知进程"
+
+PROTOCOLS = {
+    (socket.AF_INET, socket.SOCK_STREAM): "tcp",
+    (socket.AF_INET6, socket.SOCK_STREAM): "tcp6",
+    (socket.AF_INET, socket.SOCK_DGRAM): "udp",
+    (socket.AF_INET6, socket.SOCK_DGRAM): "udp6",
+}
+
+
+class ProcessInfo:
+    """缓存的进程元数据"""
+    __slots__ = ("pid", "create_time", "name", "process")
+
+    def __init__(self, pid, create_time, name, process=None):
+        self.pid = pid
+        self.create_time = create_time
+        self.name = name
+        self.process = process
+
+
+class ProcessCache:
+    """进程元数据缓存
+
+    以 (pid, create_time) 标识一个进程：PID 消失或被复用（创建时间改变）时
+    对应的缓存项会被淘汰，因此每次刷新只需为新出现的进程查询名称。
+    process_factory 默认为 psutil.Process，基准测试中可替换为模拟实现。
+    """
+    def __init__(self, process_factory=psutil.Process):
+        self.process_factory = process_factory
+        self._entries = {}  # pid -> ProcessInfo
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, pid):
+        return pid in self._entries
+
+    def get(self, pid):
+        """获取进程元数据，缓存未命中或PID被复用时重新查询"""
+        entry = self._entries.get(pid)
+        process = None
+        try:
+            process = self.process_factory(pid)
+            create_time = process.create_time()
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            self._entries.pop(pid, None)
+            self.misses += 1
+            return ProcessInfo(pid, None, UNKNOWN_PROCESS)
+        except psutil.AccessDenied:
+            # 无法读取创建时间时只能按PID缓存
+            create_time = None
+            if entry is not None and entry.create_time is None:
+                self.hits += 1
+                return entry
+
+        if entry is not None and entry.create_time == create_time:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        try:
+            name = (process or self.process_factory(pid)).name()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            name = UNKNOWN_PROCESS
+        entry = ProcessInfo(pid, create_time, name, process)
+        self._entries[pid] = entry
+        return entry
+
+    def prune(self, live_pids):
+        """淘汰已经不存在的进程"""
+        live_pids = set(live_pids)
+        for pid in [pid for pid in self._entries if pid not in live_pids]:
+            del self._entries[pid]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        """返回缓存命中统计"""
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class PsutilBackend:
+    """基于 psutil.net_connections 的采集后端，适用于所有平台"""
+    name = "psutil"
+
+    def connections(self):
+        """返回 [(pid, family, type, laddr, raddr, status)]，地址为 (ip, port) 或 None"""
+        result = []
+        for conn in psutil.net_connections(kind='inet'):
+            if not conn.laddr:  # 确保有本地地址
+                continue
+            laddr = (conn.laddr.ip, conn.laddr.port)
+            raddr = (conn.raddr.ip, conn.raddr.port) if conn.raddr else None
+            result.append((conn.pid, int(conn.family), int(conn.type), laddr, raddr, conn.status))
+        return result
+
+    def pids(self):
+        return psutil.pids()
+
+
+BACKENDS = ("auto", "psutil", "procfs", "netlink")
+
+
+def create_backend(name="auto"):
+    """按名称创建采集后端，auto 在 Linux 上优先使用 netlink 后端，其次 /proc/net 后端"""
+    if name not in BACKENDS:
+        raise ValueError(f"未知的采集后端: {name}")
+    if name in ("auto", "netlink"):
+        import port_netlink
+        if port_netlink.is_supported():
+            return port_netlink.SockDiagBackend()
+        if name == "netlink":
+            raise ValueError("当前系统不支持 netlink 采集后端")
+    if name in ("auto", "procfs"):
+        import port_procfs
+        if port_procfs.is_supported():
+            return port_procfs.ProcNetBackend()
+        if name == "procfs":
+            raise ValueError("当前系统不支持 procfs 采集后端")
+    return PsutilBackend()
+
+
+class PortCollector:
+    """采集网络连接并补充进程信息"""
+    def __init__(self, process_cache=None, backend="auto", profiler=DISABLED):
+        self.process_cache = process_cache if process_cache is not None else ProcessCache()
+        self.backend = create_backend(backend) if isinstance(backend, str) else backend
+        self.profiler = profiler
+        self.last_duration = 0.0  # 最近一次采集耗时（秒）
+
+    def connections(self):
+        """从后端读取原始连接，后端读取失败时回退到 psutil"""
+        try:
+            return self.backend.connections()
+        except OSError:
+            if isinstance(self.backend, PsutilBackend):
+                raise
+            self.backend = PsutilBackend()
+            return self.backend.connections()
+
+    def set_filter(self, spec):
+        """把过滤条件下推到采集后端（只有 netlink 后端支持），返回下推的条件名称，无法下推时返回空元组
+
+        下推后采集结果只包含（至少）满足条件的连接，调用方仍需按 spec 过滤。
+        """
+        set_filter = getattr(self.backend, "set_filter", None)
+        if set_filter is None:
+            return ()
+        set_filter(spec)
+        return self.pushed
+
+    @property
+    def pushed(self):
+        """当前实际下推的条件名称；后端查询失败回退后为空元组"""
+        return getattr(self.backend, "pushed", ())
+
+    def collect(self):
+        """采集当前系统的网络连接，返回用于表格显示的行列表"""
+        started = time.perf_counter()
+        with self.profiler.phase("collect"):
+            connections = self.connections()
+        with self.profiler.phase("enrich"):
+            port_data = self.enrich(connections)
+            self.process_cache.prune(self.backend.pids())
+        self.last_duration = time.perf_counter() - started
+        return port_data
+
+    def enrich(self, connections):
+        """为原始连接补充进程名，生成表格行"""
+        port_data = []
+        names = {}  # 本次采集内同一PID只查询一次缓存
+
+        for pid, family, type_, laddr, raddr, status in connections:
+            if pid is None:
+                continue
+
+            process_name = names.get(pid)
+            if process_name is None:
+                process_name = names[pid] = self.process_cache.get(pid).name
+
+            port_data.append(make_row(pid, process_name, family, type_, laddr, raddr, status))
+
+        return port_data
+
+
+def make_row(pid, name, family, type_, laddr, raddr, status):
+    """构造一行表格数据"""
+    return {
+        "pid": pid,
+        "name": name,
+        "local_address": f"{laddr[0]}:{laddr[1]}",
+        "remote_address": f"{raddr[0]}:{raddr[1]}" if raddr else "N/A",
+        "status": status if status else "未知",
+        "family": family,
+        "type": type_,
+        "laddr": laddr,
+        "raddr": raddr
+    }
+
+
+def protocol_name(row):
+    """连接的协议名，如 tcp、udp6"""
+    return PROTOCOLS.get((row["family"], row["type"]), f'{row["family"]}/{row["type"]}')
+
+
+def collect_port_data():
+    """采集当前系统的网络连接（不使用跨次缓存）"""
+    return PortCollector().collect()
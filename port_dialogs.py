@@ -0,0 +1,632 @@
+"""端口占用监控的对话框
+
+打开时才由 port_monitor 导入，不参与主窗口的启动。
+"""
+import time
+import psutil
+from PyQt5.QtWidgets import (QTableView, QAbstractItemView, QPushButton, QVBoxLayout, QHBoxLayout,
+                             QWidget, QHeaderView, QMessageBox, QLabel, QDialog, QTextEdit, QCheckBox,
+                             QGridLayout, QComboBox, QLineEdit, QDoubleSpinBox, QFormLayout,
+                             QDialogButtonBox, QTableWidget, QTableWidgetItem, QFileDialog, QSpinBox,
+                             QTabWidget, QDateTimeEdit)
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal, QAbstractTableModel, QModelIndex, QDateTime
+from PyQt5.QtGui import QFont
+from port_filter import FilterSpec, FilterError
+
+
+class AboutDialog(QDialog):
+    """关于对话框"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("关于 Windows端口占用监控工具")
+        self.resize(500, 300)
+        self.init_ui()
+        
+    def init_ui(self):
+        layout = QVBoxLayout()
+        
+        # 标题
+        title_label = QLabel("Windows端口占用监控工具")
+        title_font = QFont()
+        title_font.setPointSize(16)
+        title_font.setBold(True)
+        title_label.setFont(title_font)
+        title_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(title_label)
+        
+        # 版本信息
+        version_label = QLabel("版本: 1.0.0")
+        version_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(version_label)
+        
+        # 描述
+        desc_text = QTextEdit()
+        desc_text.setReadOnly(True)
+        desc_text.setHtml("""
+        <p>这是一个用于监控Windows系统端口占用情况的工具，主要功能包括：</p>
+        <ul>
+            <li>实时监控系统端口占用情况</li>
+            <li>查看占用端口的进程详细信息</li>
+            <li>支持按端口号和进程名过滤</li>
+            <li>支持关闭占用端口的进程</li>
+            <li>支持深色/浅色主题切换</li>
+        </ul>
+        <p>项目地址: <a href='https://github.com/leonda123/port-monitor'>https://github.com/leonda123/port-monitor</a></p>
+        <p>作者: leonda</p>
+        <p>联系方式: dadajiu45@gmail.com</p>
+        """)
+        layout.addWidget(desc_text)
+        
+        # 关闭按钮
+        close_btn = QPushButton("关闭")
+        close_btn.clicked.connect(self.accept)
+        layout.addWidget(close_btn)
+        
+        self.setLayout(layout)
+
+class RefreshIntervalDialog(QDialog):
+    """刷新间隔设置对话框"""
+    def __init__(self, floor, ceiling, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("刷新间隔设置")
+        layout = QFormLayout()
+        
+        self.floor_spin = QDoubleSpinBox()
+        self.floor_spin.setRange(0.5, 3600)
+        self.floor_spin.setSuffix(" 秒")
+        self.floor_spin.setValue(floor)
+        layout.addRow("最短间隔:", self.floor_spin)
+        
+        self.ceiling_spin = QDoubleSpinBox()
+        self.ceiling_spin.setRange(0.5, 3600)
+        self.ceiling_spin.setSuffix(" 秒")
+        self.ceiling_spin.setValue(ceiling)
+        layout.addRow("最长间隔:", self.ceiling_spin)
+        
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+        
+        self.setLayout(layout)
+    
+    def values(self):
+        return self.floor_spin.value(), self.ceiling_spin.value()
+
+class PerfDialog(QDialog):
+    """性能统计对话框"""
+    COLUMNS = ["阶段", "次数", "最近(ms)", "平均(ms)", "P50(ms)", "P95(ms)", "最大(ms)"]
+    KEYS = ["count", "last_ms", "mean_ms", "p50_ms", "p95_ms", "max_ms"]
+
+    def __init__(self, monitor, parent=None):
+        super().__init__(parent)
+        self.monitor = monitor
+        self.profiler = monitor.profiler
+        self.setWindowTitle("性能")
+        self.resize(700, 400)
+        self.init_ui()
+        self.update_stats()
+        # 对话框打开期间每秒刷新一次统计
+        self.update_timer = QTimer(self)
+        self.update_timer.timeout.connect(self.update_stats)
+        self.update_timer.start(1000)
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        
+        options_layout = QHBoxLayout()
+        self.enabled_check = QCheckBox("启用性能统计")
+        self.enabled_check.setChecked(self.profiler.enabled)
+        self.enabled_check.toggled.connect(self.set_enabled)
+        options_layout.addWidget(self.enabled_check)
+        
+        self.log_check = QCheckBox("刷新超过阈值时记录日志")
+        self.log_check.setChecked(self.profiler.slow_tick_ms is not None)
+        self.log_check.toggled.connect(self.update_threshold)
+        options_layout.addWidget(self.log_check)
+        
+        self.threshold_spin = QSpinBox()
+        self.threshold_spin.setRange(1, 600000)
+        self.threshold_spin.setSuffix(" ms")
+        self.threshold_spin.setValue(int(self.profiler.slow_tick_ms or 1000))
+        self.threshold_spin.valueChanged.connect(self.update_threshold)
+        options_layout.addWidget(self.threshold_spin)
+        options_layout.addStretch()
+        layout.addLayout(options_layout)
+        
+        self.stats_table = QTableWidget(0, len(self.COLUMNS))
+        self.stats_table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.stats_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.stats_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.stats_table)
+        
+        self.info_label = QLabel()
+        layout.addWidget(self.info_label)
+        
+        button_layout = QHBoxLayout()
+        export_btn = QPushButton("导出JSON")
+        export_btn.clicked.connect(self.export_json)
+        button_layout.addWidget(export_btn)
+        reset_btn = QPushButton("清空")
+        reset_btn.clicked.connect(self.reset_stats)
+        button_layout.addWidget(reset_btn)
+        close_btn = QPushButton("关闭")
+        close_btn.clicked.connect(self.accept)
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+        
+        self.setLayout(layout)
+
+    def set_enabled(self, enabled):
+        self.profiler.enabled = enabled
+
+    def update_threshold(self):
+        self.profiler.slow_tick_ms = self.threshold_spin.value() if self.log_check.isChecked() else None
+
+    def extra_info(self):
+        """统计之外的运行信息"""
+        collector = self.monitor.collector_thread.collector
+        # 本机采集时为后端名称；RemoteAggregator、ReplayCollector 自身带有 name，且没有进程缓存
+        backend = getattr(collector, "backend", collector)
+        cache = getattr(collector, "process_cache", None)
+        return {
+            "backend": getattr(backend, "name", type(collector).__name__),
+            "process_cache": cache.stats() if cache is not None else None,
+            "history_bytes": self.monitor.history.memory_usage(),
+            "rows": len(self.monitor.port_data),
+        }
+
+    def update_stats(self):
+        summary = self.profiler.summary()
+        self.stats_table.setRowCount(len(summary))
+        for row, name in enumerate(sorted(summary)):
+            stats = summary[name]
+            self.stats_table.setItem(row, 0, QTableWidgetItem(name))
+            for column, key in enumerate(self.KEYS, 1):
+                value = stats.get(key)
+                text = "" if value is None else (str(value) if key == "count" else f"{value:.2f}")
+                self.stats_table.setItem(row, column, QTableWidgetItem(text))
+        info = self.extra_info()
+        cache = info["process_cache"]
+        cache_text = (f"进程缓存: {cache['size']} 项，命中 {cache['hits']} / 未命中 {cache['misses']}    "
+                      if cache is not None else "")
+        self.info_label.setText(
+            f"采集后端: {info['backend']}    记录数: {info['rows']}    {cache_text}"
+            f"历史占用: {info['history_bytes'] / 1024 / 1024:.1f} MB")
+
+    def export_json(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出性能统计", "port_monitor_perf.json", "JSON (*.json)")
+        if path:
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(self.profiler.to_json(self.extra_info()))
+            except OSError as e:
+                QMessageBox.warning(self, "警告", f"导出失败: {e}")
+
+    def reset_stats(self):
+        self.profiler.reset()
+        self.update_stats()
+
+class RecordTableModel(QAbstractTableModel):
+    """只读的记录列表模型，用于进程详情中的长列表"""
+    def __init__(self, headers, parent=None):
+        super().__init__(parent)
+        self.headers = headers
+        self.records = []
+
+    def set_records(self, records):
+        self.beginResetModel()
+        self.records = records
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role == Qt.DisplayRole:
+            return str(self.records[index.row()][index.column()])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+class ProcessInfoLoader(QThread):
+    """在后台分段加载进程信息，每完成一段发出一次 section_ready"""
+    section_ready = pyqtSignal(str, object)
+    process_gone = pyqtSignal(str)
+    CPU_SAMPLE_SECONDS = 0.5  # CPU使用率的最短采样时间
+
+    def __init__(self, process, sections, parent=None):
+        super().__init__(parent)
+        self.process = process
+        self.sections = sections
+
+    def run(self):
+        process = self.process
+        try:
+            # 以本次加载的开始作为CPU采样起点，其余各段加载完成后再计算
+            sample_started = time.monotonic()
+            cpu_allowed = "cpu" in self.sections and self.load(lambda: process.cpu_percent(None)) is not None
+            for section in self.sections:
+                if self.isInterruptionRequested():
+                    return
+                if section != "cpu":
+                    self.section_ready.emit(section, self.load(getattr(self, f"load_{section}")))
+            if "cpu" in self.sections:
+                while cpu_allowed and time.monotonic() - sample_started < self.CPU_SAMPLE_SECONDS:
+                    if self.isInterruptionRequested():
+                        return
+                    self.msleep(50)
+                self.section_ready.emit("cpu", self.load(lambda: process.cpu_percent(None)) if cpu_allowed else None)
+        except psutil.NoSuchProcess:
+            self.process_gone.emit("进程不存在或已终止")
+        except Exception as e:
+            self.process_gone.emit(f"获取进程信息时出错: {str(e)}")
+
+    @staticmethod
+    def load(loader):
+        """加载一段信息，没有权限时该段返回 None，不影响其余各段"""
+        try:
+            return loader()
+        except psutil.AccessDenied:
+            return None
+
+    def load_basic(self):
+        process = self.process
+        with process.oneshot():
+            info = {
+                "name": process.name(),
+                "status": process.status(),
+                "create_time": process.create_time(),
+            }
+            try:
+                info["memory"] = process.memory_info()
+            except psutil.AccessDenied:
+                info["memory"] = None
+        try:
+            info["username"] = process.username()
+        except (psutil.AccessDenied, KeyError):
+            info["username"] = "未知"
+        try:
+            info["cmdline"] = " ".join(process.cmdline())
+        except psutil.AccessDenied:
+            info["cmdline"] = "无法获取"
+        return info
+
+    def load_files(self):
+        return [(file.path,) for file in self.process.open_files()]
+
+    def load_connections(self):
+        get_connections = getattr(self.process, "net_connections", None) or self.process.connections
+        records = []
+        for conn in get_connections():
+            local_addr = f"{conn.laddr.ip}:{conn.laddr.port}" if conn.laddr else "N/A"
+            remote_addr = f"{conn.raddr.ip}:{conn.raddr.port}" if conn.raddr else "N/A"
+            records.append((conn.type.name, local_addr, remote_addr, conn.status))
+        return records
+
+class ProcessDetailDialog(QDialog):
+    """进程详细信息对话框
+
+    对话框立即显示，各部分信息由后台线程分段加载；
+    打开的文件和网络连接以可滚动的表格显示。
+    """
+    ALL_SECTIONS = ("basic", "cpu", "files", "connections")
+    LIVE_SECTIONS = ("basic", "cpu")
+    LIVE_INTERVAL_MS = 2000
+    ACCESS_DENIED = "无法获取（权限不足）"
+
+    def __init__(self, pid, parent=None):
+        super().__init__(parent)
+        self.pid = pid
+        self.loader = None
+        self.setWindowTitle(f"进程详细信息 (PID: {pid})")
+        self.resize(700, 500)
+        self.init_ui()
+        self.live_timer = QTimer(self)
+        self.live_timer.timeout.connect(lambda: self.load_sections(self.LIVE_SECTIONS))
+        try:
+            self.process = psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            self.process = None
+            self.show_error("进程不存在或已终止")
+            return
+        self.load_sections(self.ALL_SECTIONS)
+        
+    def init_ui(self):
+        layout = QVBoxLayout()
+        
+        self.tabs = QTabWidget()
+        
+        # 概要
+        summary_widget = QWidget()
+        summary_layout = QFormLayout(summary_widget)
+        self.fields = {}
+        for key, label in (("name", "进程名称"), ("pid", "PID"), ("status", "状态"),
+                           ("rss", "内存使用"), ("vms", "虚拟内存"), ("cpu", "CPU使用率"),
+                           ("create_time", "创建时间"), ("username", "用户"), ("cmdline", "命令行")):
+            value_label = QLabel("正在加载...")
+            value_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+            value_label.setWordWrap(True)
+            summary_layout.addRow(f"{label}:", value_label)
+            self.fields[key] = value_label
+        self.fields["pid"].setText(str(self.pid))
+        self.tabs.addTab(summary_widget, "概要")
+        
+        # 打开的文件
+        self.files_model = RecordTableModel(["路径"], self)
+        self.files_view = self.create_record_view(self.files_model)
+        self.tabs.addTab(self.files_view, "打开的文件 (加载中)")
+        
+        # 网络连接
+        self.connections_model = RecordTableModel(["类型", "本地地址", "远程地址", "状态"], self)
+        self.connections_view = self.create_record_view(self.connections_model)
+        self.tabs.addTab(self.connections_view, "网络连接 (加载中)")
+        
+        layout.addWidget(self.tabs)
+        
+        bottom_layout = QHBoxLayout()
+        self.live_check = QCheckBox("实时更新")
+        self.live_check.toggled.connect(self.set_live_update)
+        bottom_layout.addWidget(self.live_check)
+        bottom_layout.addStretch()
+        
+        # 关闭按钮
+        close_btn = QPushButton("关闭")
+        close_btn.clicked.connect(self.accept)
+        bottom_layout.addWidget(close_btn)
+        layout.addLayout(bottom_layout)
+        
+        self.setLayout(layout)
+    
+    def create_record_view(self, model):
+        view = QTableView()
+        view.setModel(model)
+        view.horizontalHeader().setStretchLastSection(True)
+        view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        return view
+    
+    def load_sections(self, sections):
+        """启动后台加载，上一次加载尚未完成时跳过
+
+        每次加载使用一个新线程，结束后自行删除，关闭对话框时不等待。
+        """
+        if self.process is None or self.loader is not None:
+            return
+        self.loader = ProcessInfoLoader(self.process, sections, self)
+        self.loader.section_ready.connect(self.on_section_ready)
+        self.loader.process_gone.connect(self.show_error)
+        self.loader.finished.connect(self.on_loader_finished)
+        self.loader.finished.connect(self.loader.deleteLater)
+        self.loader.start()
+    
+    def on_loader_finished(self):
+        self.loader = None
+    
+    def on_section_ready(self, section, data):
+        if section == "basic":
+            if data is None:
+                for key in ("name", "status", "rss", "vms", "create_time", "username", "cmdline"):
+                    self.fields[key].setText(self.ACCESS_DENIED)
+                return
+            memory = data["memory"]
+            self.fields["name"].setText(data["name"])
+            self.fields["status"].setText(data["status"])
+            self.fields["rss"].setText(self.format_bytes(memory.rss) if memory else self.ACCESS_DENIED)
+            self.fields["vms"].setText(self.format_bytes(memory.vms) if memory else self.ACCESS_DENIED)
+            self.fields["create_time"].setText(self.format_time(data["create_time"]))
+            self.fields["username"].setText(data["username"])
+            self.fields["cmdline"].setText(data["cmdline"])
+        elif section == "cpu":
+            self.fields["cpu"].setText(f"{data:.1f}%" if data is not None else self.ACCESS_DENIED)
+        elif section == "files":
+            self.set_records(self.files_model, self.files_view, "打开的文件", data)
+        elif section == "connections":
+            self.set_records(self.connections_model, self.connections_view, "网络连接", data)
+    
+    def set_records(self, model, view, title, records):
+        index = self.tabs.indexOf(view)
+        if records is None:
+            self.tabs.setTabText(index, f"{title} (无法获取)")
+            return
+        model.set_records(records)
+        self.tabs.setTabText(index, f"{title} ({len(records)})")
+    
+    def show_error(self, message):
+        """进程已退出或无法访问"""
+        self.live_check.setChecked(False)
+        for label in self.fields.values():
+            if label.text() == "正在加载...":
+                label.setText("")
+        self.fields["status"].setText(message)
+    
+    def set_live_update(self, enabled):
+        if enabled:
+            self.live_timer.start(self.LIVE_INTERVAL_MS)
+        else:
+            self.live_timer.stop()
+    
+    def done(self, result):
+        """关闭前停止实时更新，通知后台加载停止但不等待
+
+        open_files() 等调用无法中断，可能要很久才返回；断开信号后线程结束时自行删除。
+        """
+        self.live_timer.stop()
+        if self.loader is not None:
+            self.loader.section_ready.disconnect(self.on_section_ready)
+            self.loader.process_gone.disconnect(self.show_error)
+            self.loader.finished.disconnect(self.on_loader_finished)
+            self.loader.requestInterruption()
+            self.loader = None
+        super().done(result)
+    
+    def format_bytes(self, bytes):
+        """格式化字节大小为人类可读格式"""
+        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+            if bytes < 1024:
+                return f"{bytes:.2f} {unit}"
+            bytes /= 1024
+        return f"{bytes:.2f} PB"
+    
+    def format_time(self, timestamp):
+        """格式化时间戳"""
+        import datetime
+        return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+class StoreQueryThread(QThread):
+    """在后台查询事件存储，最多读取 limit 条"""
+    results_ready = pyqtSignal(list, bool)  # 记录, 是否因超过上限被截断
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, store, spec, start, end, at=None, limit=10000, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.spec = spec
+        self.start_time = start
+        self.end_time = end
+        self.at = at
+        self.limit = limit
+
+    def run(self):
+        try:
+            if self.at is not None:
+                records = self.store.state_at(self.at, self.spec)
+            else:
+                records = list(self.store.query(self.start_time, self.end_time, self.spec,
+                                                limit=self.limit + 1))
+            truncated = len(records) > self.limit
+            self.results_ready.emit(records[:self.limit], truncated)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+
+class EventQueryDialog(QDialog):
+    """按时间范围查询保存的连接事件，或还原某一时刻的连接表"""
+    HEADERS = ["时间", "事件", "主机", "进程ID", "进程名", "协议", "本地地址", "远程地址", "状态", "原状态"]
+    EVENT_NAMES = {"open": "新建", "close": "关闭", "change": "状态变化", "state": "存在"}
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.query_thread = None
+        self.setWindowTitle("连接事件查询")
+        self.resize(1000, 600)
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        form = QGridLayout()
+
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems(["时间范围内的事件", "某一时刻的连接"])
+        self.mode_combo.currentIndexChanged.connect(self.update_mode)
+        form.addWidget(QLabel("查询:"), 0, 0)
+        form.addWidget(self.mode_combo, 0, 1)
+
+        now = QDateTime.currentDateTime()
+        self.start_edit = QDateTimeEdit(now.addSecs(-3600))
+        self.start_edit.setDisplayFormat("yyyy-MM-dd HH:mm:ss")
+        self.start_edit.setCalendarPopup(True)
+        self.start_label = QLabel("开始:")
+        form.addWidget(self.start_label, 0, 2)
+        form.addWidget(self.start_edit, 0, 3)
+        self.end_edit = QDateTimeEdit(now)
+        self.end_edit.setDisplayFormat("yyyy-MM-dd HH:mm:ss")
+        self.end_edit.setCalendarPopup(True)
+        self.end_label = QLabel("结束:")
+        form.addWidget(self.end_label, 0, 4)
+        form.addWidget(self.end_edit, 0, 5)
+
+        self.port_edit = QLineEdit()
+        self.port_edit.setPlaceholderText("如 5432、8000-8100")
+        form.addWidget(QLabel("端口:"), 1, 0)
+        form.addWidget(self.port_edit, 1, 1)
+        self.process_edit = QLineEdit()
+        self.process_edit.setPlaceholderText("进程名或PID")
+        form.addWidget(QLabel("进程:"), 1, 2)
+        form.addWidget(self.process_edit, 1, 3)
+        self.state_edit = QLineEdit()
+        self.state_edit.setPlaceholderText("如 LISTEN,ESTABLISHED")
+        form.addWidget(QLabel("状态:"), 1, 4)
+        form.addWidget(self.state_edit, 1, 5)
+        layout.addLayout(form)
+
+        self.query_btn = QPushButton("查询")
+        self.query_btn.clicked.connect(self.run_query)
+        layout.addWidget(self.query_btn)
+
+        self.model = RecordTableModel(self.HEADERS, self)
+        view = QTableView()
+        view.setModel(self.model)
+        view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(view)
+
+        self.info_label = QLabel()
+        layout.addWidget(self.info_label)
+        self.setLayout(layout)
+
+        # 默认时间范围覆盖已保存的全部数据
+        oldest, newest = self.store.time_range()
+        if oldest is not None:
+            self.start_edit.setDateTime(QDateTime.fromMSecsSinceEpoch(int(oldest * 1000)))
+            self.info_label.setText("已保存 " + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(oldest)) +
+                                    " 至 " + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(newest)) +
+                                    " 的数据")
+
+    def update_mode(self, mode):
+        """「某一时刻」模式只使用开始时间"""
+        self.start_label.setText("时刻:" if mode == 1 else "开始:")
+        self.end_label.setVisible(mode == 0)
+        self.end_edit.setVisible(mode == 0)
+
+    def run_query(self):
+        if self.query_thread is not None and self.query_thread.isRunning():
+            return
+        try:
+            spec = FilterSpec(self.port_edit.text(), self.process_edit.text(), "", self.state_edit.text())
+        except FilterError as e:
+            self.info_label.setText(f"过滤条件无效: {e}")
+            return
+        start = self.start_edit.dateTime().toMSecsSinceEpoch() / 1000
+        end = self.end_edit.dateTime().toMSecsSinceEpoch() / 1000
+        at = start if self.mode_combo.currentIndex() == 1 else None
+        self.query_thread = StoreQueryThread(self.store, spec, start, end, at, parent=self)
+        self.query_thread.results_ready.connect(self.show_results)
+        self.query_thread.error_occurred.connect(lambda message: self.info_label.setText(f"查询失败: {message}"))
+        self.query_btn.setEnabled(False)
+        self.query_thread.finished.connect(lambda: self.query_btn.setEnabled(True))
+        self.info_label.setText("正在查询...")
+        self.query_thread.start()
+
+    def show_results(self, records, truncated):
+        rows = []
+        for record in records:
+            raddr = record["raddr"]
+            rows.append((
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["ts"])),
+                self.EVENT_NAMES.get(record["event"], record["event"]),
+                record.get("host", ""),
+                record["pid"],
+                record["name"],
+                record["proto"],
+                f'{record["laddr"]}:{record["lport"]}',
+                f'{raddr}:{record["rport"]}' if raddr is not None else "N/A",
+                record["status"],
+                record.get("old_status", ""),
+            ))
+        self.model.set_records(rows)
+        self.info_label.setText(f"共 {len(rows)} 条记录" + ("（结果过多，只显示前面部分）" if truncated else ""))
+
+    def done(self, result):
+        if self.query_thread is not None:
+            self.query_thread.wait()
+        super().done(result)
@@ -0,0 +1,84 @@
+"""连接快照差异计算
+
+本模块不依赖Qt。相邻两次快照以连接标识 (host, pid, family, type, laddr, raddr)
+匹配，得到新增、关闭和状态变化的连接。本机采集的行没有 host 字段，视为 None。
+"""
+
+
+def connection_key(row):
+    """连接的标识"""
+    return (row.get("host"), row["pid"], row["family"], row["type"], row["laddr"], row["raddr"])
+
+
+def index_rows(rows):
+    """为快照建立索引 {(连接标识, 序号): 行}
+
+    同一标识出现多次时（例如同一进程以 SO_REUSEPORT 监听同一端口）按出现次序区分。
+    """
+    index = {}
+    seen = {}
+    for row in rows:
+        key = connection_key(row)
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        index[(key, n)] = row
+    return index
+
+
+class SnapshotDelta:
+    """两次快照之间的差异
+
+    added / removed 为 (键, 行) 列表，changed 为 (键, 旧行, 新行) 列表。
+    """
+    __slots__ = ("added", "removed", "changed")
+
+    def __init__(self, added=None, removed=None, changed=None):
+        self.added = added if added is not None else []
+        self.removed = removed if removed is not None else []
+        self.changed = changed if changed is not None else []
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def __len__(self):
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    def transitions(self):
+        """返回状态变化列表 [(旧状态, 新状态, 新行)]，例如 SYN_SENT → ESTABLISHED"""
+        return [(old["status"], new["status"], new) for _, old, new in self.changed
+                if old["status"] != new["status"]]
+
+    def summary(self):
+        """差异概要，用于状态栏显示"""
+        return f"新增 {len(self.added)}，关闭 {len(self.removed)}，变化 {len(self.changed)}"
+
+
+def diff_snapshots(old_index, new_index):
+    """比较两个由 index_rows 生成的索引"""
+    delta = SnapshotDelta()
+    for key, row in new_index.items():
+        old = old_index.get(key)
+        if old is None:
+            delta.added.append((key, row))
+        elif old != row:
+            delta.changed.append((key, old, row))
+    for key, row in old_index.items():
+        if key not in new_index:
+            delta.removed.append((key, row))
+    return delta
+
+
+class SnapshotDiffer:
+    """保存上一次快照的索引，逐次计算差异"""
+    def __init__(self):
+        self.index = {}
+
+    def update(self, rows):
+        """以新快照替换上一次快照并返回差异"""
+        new_index = index_rows(rows)
+        delta = diff_snapshots(self.index, new_index)
+        self.index = new_index
+        return delta
+
+    def reset(self):
+        self.index = {}
@@ -0,0 +1,225 @@
+"""连接过滤与快照索引
+
+本模块不依赖Qt。每个快照建立一次索引（端口、PID、进程名、远程地址、状态），
+过滤条件改变时只做索引查找，不再逐行扫描。
+"""
+import bisect
+import ipaddress
+import socket
+
+
+class FilterError(ValueError):
+    """过滤条件格式错误"""
+
+
+_V4_MAPPED_PREFIX = bytes(10) + b"\xff\xff"
+
+
+def ip_key(ip):
+    """把IP字符串转换为 (版本, 整数)，IPv4 映射的 IPv6 地址按 IPv4 处理"""
+    ip = ip.split("%", 1)[0]
+    # inet_pton 比 ipaddress 快一个数量级，排序时每个地址都要转换
+    try:
+        if ":" not in ip:
+            return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+        packed = socket.inet_pton(socket.AF_INET6, ip)
+    except (OSError, ValueError):
+        addr = ipaddress.ip_address(ip)  # 格式无效时抛出 ValueError
+        if addr.version == 6 and addr.ipv4_mapped is not None:
+            addr = addr.ipv4_mapped
+        return addr.version, int(addr)
+    if packed[:12] == _V4_MAPPED_PREFIX:
+        return 4, int.from_bytes(packed[12:], "big")
+    return 6, int.from_bytes(packed, "big")
+
+
+class PortFilter:
+    """端口过滤条件
+
+    支持单个端口的子串匹配（如 "80" 匹配 80 和 8080）、范围（如 "8000-8100"）
+    以及逗号分隔的组合（如 "22,8000-8100"）。
+    """
+    def __init__(self, text):
+        self.text = text
+        self.substrings = []
+        self.ranges = []
+        for part in text.replace("，", ",").split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if "-" in part:
+                low, _, high = part.partition("-")
+                try:
+                    low, high = int(low), int(high)
+                except ValueError:
+                    raise FilterError(f"无效的端口范围: {part}") from None
+                if low > high:
+                    low, high = high, low
+                self.ranges.append((low, high))
+            elif part.isdigit():
+                self.substrings.append(part)
+            else:
+                raise FilterError(f"无效的端口: {part}")
+
+    def __bool__(self):
+        return bool(self.substrings or self.ranges)
+
+    def matches_port(self, port):
+        if any(low <= port <= high for low, high in self.ranges):
+            return True
+        text = str(port)
+        return any(sub in text for sub in self.substrings)
+
+
+class AddressFilter:
+    """远程地址过滤条件，支持 CIDR（如 "10.0.0.0/8"、"fe80::/10"）和地址前缀（如 "192.168."）"""
+    def __init__(self, text):
+        self.text = text
+        self.network = None
+        self.prefix = None
+        if not text:
+            return
+        if "/" in text:
+            try:
+                network = ipaddress.ip_network(text, strict=False)
+            except ValueError:
+                raise FilterError(f"无效的网段: {text}") from None
+            self.network = (network.version, int(network.network_address),
+                            int(network.broadcast_address))
+        else:
+            self.prefix = text.lower()
+
+    def __bool__(self):
+        return bool(self.text)
+
+    def matches_ip(self, ip):
+        if self.prefix is not None:
+            return ip.lower().startswith(self.prefix)
+        try:
+            version, value = ip_key(ip)
+        except ValueError:
+            return False
+        return version == self.network[0] and self.network[1] <= value <= self.network[2]
+
+
+class FilterSpec:
+    """一组过滤条件：端口、进程（名称子串或PID）、远程地址、连接状态（逗号分隔）"""
+    def __init__(self, port="", process="", remote="", state=""):
+        self.port = PortFilter(port.strip())
+        self.process = process.strip().lower()
+        self.pid = int(self.process) if self.process.isdigit() else None
+        self.remote = AddressFilter(remote.strip())
+        self.states = {part.strip().upper() for part in state.replace("，", ",").split(",") if part.strip()}
+
+    def __bool__(self):
+        return bool(self.port or self.process or self.remote or self.states)
+
+    def matches_process(self, name, pid):
+        return self.process in name.lower() or pid == self.pid
+
+    def matches(self, row):
+        """判断单行是否满足条件，用于增量更新"""
+        if self.port and not self.port.matches_port(row["laddr"][1]):
+            return False
+        if self.process and not self.matches_process(row["name"], row["pid"]):
+            return False
+        if self.remote and not (row["raddr"] and self.remote.matches_ip(row["raddr"][0])):
+            return False
+        if self.states and row["status"].upper() not in self.states:
+            return False
+        return True
+
+
+class SnapshotIndex:
+    """快照的查询索引"""
+    def __init__(self, rows):
+        self.rows = rows
+        self.by_port = {}
+        self.by_pid = {}
+        self.by_name = {}
+        self.by_remote_ip = {}
+        self.by_status = {}
+        for i, row in enumerate(rows):
+            self.by_port.setdefault(row["laddr"][1], []).append(i)
+            self.by_pid.setdefault(row["pid"], []).append(i)
+            self.by_name.setdefault(row["name"], []).append(i)
+            self.by_status.setdefault(row["status"], []).append(i)
+            if row["raddr"]:
+                self.by_remote_ip.setdefault(row["raddr"][0], []).append(i)
+        self.ports = sorted(self.by_port)
+        self._remote_sorted = None
+
+    def _remote_ranges(self):
+        """按 (版本, 整数) 排序的远程IP，首次做网段查询时建立"""
+        if self._remote_sorted is None:
+            keyed = []
+            for ip in self.by_remote_ip:
+                try:
+                    keyed.append((ip_key(ip), ip))
+                except ValueError:
+                    continue
+            keyed.sort()
+            self._remote_sorted = ([key for key, _ in keyed], [ip for _, ip in keyed])
+        return self._remote_sorted
+
+    def port_positions(self, port_filter):
+        positions = []
+        for low, high in port_filter.ranges:
+            start = bisect.bisect_left(self.ports, low)
+            end = bisect.bisect_right(self.ports, high)
+            for port in self.ports[start:end]:
+                positions.extend(self.by_port[port])
+        if port_filter.substrings:
+            for port, rows in self.by_port.items():
+                text = str(port)
+                if any(sub in text for sub in port_filter.substrings):
+                    positions.extend(rows)
+        return set(positions)
+
+    def process_positions(self, spec):
+        positions = set()
+        for name, rows in self.by_name.items():
+            if spec.process in name.lower():
+                positions.update(rows)
+        if spec.pid is not None:
+            positions.update(self.by_pid.get(spec.pid, ()))
+        return positions
+
+    def remote_positions(self, address_filter):
+        positions = set()
+        if address_filter.prefix is not None:
+            for ip, rows in self.by_remote_ip.items():
+                if ip.lower().startswith(address_filter.prefix):
+                    positions.update(rows)
+            return positions
+        keys, ips = self._remote_ranges()
+        version, low, high = address_filter.network
+        start = bisect.bisect_left(keys, (version, low))
+        end = bisect.bisect_right(keys, (version, high))
+        for ip in ips[start:end]:
+            positions.update(self.by_remote_ip[ip])
+        return positions
+
+    def status_positions(self, states):
+        positions = set()
+        for status, rows in self.by_status.items():
+            if status.upper() in states:
+                positions.update(rows)
+        return positions
+
+    def query(self, spec):
+        """返回满足条件的行，保持快照中的原有顺序"""
+        if not spec:
+            return self.rows
+        candidates = []
+        if spec.port:
+            candidates.append(self.port_positions(spec.port))
+        if spec.process:
+            candidates.append(self.process_positions(spec))
+        if spec.remote:
+            candidates.append(self.remote_positions(spec.remote))
+        if spec.states:
+            candidates.append(self.status_positions(spec.states))
+        candidates.sort(key=len)
+        positions = candidates[0].intersection(*candidates[1:])
+        return [self.rows[i] for i in sorted(positions)]
@@ -0,0 +1,193 @@
+"""连接分组聚合
+
+本模块不依赖Qt。把连接按「进程 → 本地端口」「本地端口 → 进程」或「远程主机 → 进程」
+组织成树，每个分组节点保存各状态的连接数。计数随每次刷新的快照差异增减，
+只更新变化连接所在的路径，不会每次遍历全部连接。
+
+节点的 view 和 pos 由界面使用：view 为已经显示的子节点列表（None 表示尚未展开加载），
+pos 为节点在父节点 view 中的位置（None 表示尚未显示）。
+"""
+from port_collector import protocol_name
+from port_diff import index_rows
+
+
+def _host_prefix(row):
+    host = row.get("host")
+    return f"[{host}] " if host is not None else ""
+
+
+# 每一级分组为 (分组键函数, 分组名称函数)，名称只在创建分组节点时生成
+PROCESS_LEVEL = (lambda row: (row.get("host"), "process", row["pid"], row["name"]),
+                 lambda row: f"{_host_prefix(row)}{row['name']} (PID {row['pid']})")
+PORT_LEVEL = (lambda row: (row.get("host"), "port", row["laddr"][1]),
+              lambda row: f"{_host_prefix(row)}本地端口 {row['laddr'][1]}")
+REMOTE_LEVEL = (lambda row: (row.get("host"), "remote", row["raddr"][0] if row["raddr"] else None),
+                lambda row: _host_prefix(row) + (row["raddr"][0] if row["raddr"] else "无远程地址"))
+
+GROUP_MODES = {
+    "process": ("按进程（进程 → 本地端口）", (PROCESS_LEVEL, PORT_LEVEL)),
+    "port": ("按本地端口（端口 → 进程）", (PORT_LEVEL, PROCESS_LEVEL)),
+    "remote": ("按远程主机（远程主机 → 进程）", (REMOTE_LEVEL, PROCESS_LEVEL)),
+}
+
+
+def connection_label(row):
+    """连接节点的显示文本"""
+    return f"{protocol_name(row)}  {row['local_address']} → {row['remote_address']}"
+
+
+class GroupNode:
+    """分组树中的一个节点：分组（children 不为 None）或连接（row 不为 None，名称由界面按需生成）"""
+    __slots__ = ("parent", "key", "label", "row", "counts", "total", "children", "view", "pos")
+
+    def __init__(self, parent, key, label, row=None):
+        self.parent = parent
+        self.key = key
+        self.label = label
+        self.row = row
+        self.view = None
+        self.pos = None
+        if row is None:
+            self.counts = {}  # 状态 -> 连接数
+            self.total = 0
+            self.children = {}  # 键 -> 子节点，保持插入顺序
+        else:
+            # 连接节点的计数由 row 的状态得出，不单独保存
+            self.counts = None
+            self.total = 1
+            self.children = None
+
+    @property
+    def is_group(self):
+        return self.children is not None
+
+    def rows(self):
+        """节点下的所有连接"""
+        if self.row is not None:
+            yield self.row
+            return
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            for child in node.children.values():
+                if child.row is not None:
+                    yield child.row
+                else:
+                    stack.append(child)
+
+
+class GroupTree:
+    """按分组方式维护连接树，由快照差异增量更新"""
+    def __init__(self, mode="process"):
+        self.mode = mode
+        self.levels = GROUP_MODES[mode][1]
+        self.root = GroupNode(None, None, "")
+        self.root.view = []
+        self.leaves = {}  # 连接的差异键 -> 连接节点
+
+    def rebuild(self, rows):
+        """按完整快照重建整棵树（切换分组方式、过滤条件或历史快照时）"""
+        self.root = GroupNode(None, None, "")
+        self.root.view = []
+        self.leaves = {}
+        # 与快照差异使用相同的键，之后的差异可以直接对应到节点
+        for key, row in index_rows(rows).items():
+            self._add(key, row)
+
+    def apply_delta(self, delta, accept=None):
+        """应用快照差异，accept 为过滤条件（不满足的连接不进入树），返回 GroupChanges"""
+        changes = GroupChanges()
+        leaves = self.leaves
+        for key, _ in delta.removed:
+            if key in leaves:
+                self._remove(key, changes)
+        for key, old, new in delta.changed:
+            present = key in leaves
+            wanted = accept is None or accept(new)
+            if present and wanted:
+                self._update(key, old, new, changes)
+            elif present:
+                self._remove(key, changes)
+            elif wanted:
+                self._add(key, new, changes)
+        for key, row in delta.added:
+            if accept is None or accept(row):
+                self._add(key, row, changes)
+        return changes
+
+    def _path(self, row):
+        return [key(row) for key, _ in self.levels]
+
+    def _add(self, key, row, changes=None):
+        """加入一条连接；changes 为 None 时（重建）不记录变化"""
+        status = row["status"]
+        node = self.root
+        path = [node]
+        for group_key, label in self.levels:
+            value = group_key(row)
+            child = node.children.get(value)
+            if child is None:
+                child = node.children[value] = GroupNode(node, value, label(row))
+                if changes is not None:
+                    changes.added.append(child)
+            node = child
+            path.append(node)
+        for group in path:
+            counts = group.counts
+            counts[status] = counts.get(status, 0) + 1
+            group.total += 1
+        leaf = node.children[key] = GroupNode(node, key, None, row)
+        self.leaves[key] = leaf
+        if changes is not None:
+            changes.touched.extend(path)
+            changes.added.append(leaf)
+
+    def _remove(self, key, changes):
+        leaf = self.leaves.pop(key)
+        node = leaf.parent
+        del node.children[key]
+        changes.removed.append(leaf)
+        status = leaf.row["status"]
+        while node is not None:
+            self._count(node, status, -1, changes)
+            parent = node.parent
+            if node.total == 0 and parent is not None:
+                del parent.children[node.key]
+                changes.removed.append(node)
+            node = parent
+
+    def _update(self, key, old, new, changes):
+        leaf = self.leaves[key]
+        if self._path(old) != self._path(new):
+            # 所属分组变化（例如同一连接标识下进程名变化），按删除后新增处理
+            self._remove(key, changes)
+            self._add(key, new, changes)
+            return
+        leaf.row = new
+        changes.touched.append(leaf)
+        if old["status"] != new["status"]:
+            node = leaf.parent
+            while node is not None:
+                self._count(node, old["status"], -1, changes)
+                self._count(node, new["status"], 1, changes)
+                node = node.parent
+
+    @staticmethod
+    def _count(node, status, step, changes):
+        count = node.counts.get(status, 0) + step
+        if count:
+            node.counts[status] = count
+        else:
+            del node.counts[status]
+        node.total += step
+        changes.touched.append(node)
+
+
+class GroupChanges:
+    """一次更新中新增、删除和计数变化的节点（可能包含重复，删除的节点在其父节点之前）"""
+    __slots__ = ("added", "removed", "touched")
+
+    def __init__(self):
+        self.added = []
+        self.removed = []
+        self.touched = []
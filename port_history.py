@@ -0,0 +1,205 @@
+"""连接快照历史
+
+本模块不依赖Qt。快照以列式数组保存：进程名、IP、状态、主机等字符串统一驻留到
+字符串表中，每行只保存整数编号，单行约占 27 字节。历史以环形缓冲区组织，
+超过内存上限或保留时长时以 O(1) 代价淘汰最旧的快照。
+
+字符串表按代划分：新快照使用当前一代的字符串表，当前一代的字符串表增长到上限后
+开始新的一代。某一代的快照全部被淘汰时整代字符串表一起释放，淘汰时不需要重建
+字符串表或改写保留的快照。
+"""
+import threading
+import time
+from array import array
+from collections import deque
+
+from port_collector import make_row
+
+
+class StringTable:
+    """字符串驻留表，编号 0 保留给空值"""
+    def __init__(self):
+        self.ids = {None: 0}
+        self.values = [None]
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def intern(self, value):
+        i = self.ids.get(value)
+        if i is None:
+            i = self.ids[value] = len(self.values)
+            self.values.append(value)
+            self.nbytes += len(value) + 64  # 字符串本身及字典/列表开销的估算
+        return i
+
+
+class StringTables:
+    """一代快照共用的字符串表"""
+    def __init__(self):
+        self.names = StringTable()
+        self.addresses = StringTable()
+        self.statuses = StringTable()
+        self.protos = StringTable()
+        self.hosts = StringTable()
+        self.snapshots = 0  # 仍在历史中的、使用这些字符串表的快照数
+
+    @property
+    def nbytes(self):
+        return (self.names.nbytes + self.addresses.nbytes + self.statuses.nbytes
+                + self.protos.nbytes + self.hosts.nbytes)
+
+
+class ColumnarSnapshot:
+    """单个快照的列式存储"""
+    __slots__ = ("seq", "timestamp", "tables", "pid", "name", "proto", "status",
+                 "lip", "lport", "rip", "rport", "host", "nbytes")
+
+    def __init__(self, seq, timestamp, tables):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.tables = tables
+        self.pid = array("i")
+        self.name = array("I")
+        self.proto = array("I")  # family/type 组合的编号
+        self.status = array("I")
+        self.lip = array("I")
+        self.lport = array("H")
+        self.rip = array("I")
+        self.rport = array("H")
+        self.host = array("I")  # 汇总多主机时的主机名编号，本机采集为 0
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self.pid)
+
+    def columns(self):
+        return (self.pid, self.name, self.proto, self.status,
+                self.lip, self.lport, self.rip, self.rport, self.host)
+
+
+class ConnectionHistory:
+    """有容量上限的快照环形缓冲区，可在多线程间共享"""
+    GENERATIONS = 16  # 每一代字符串表的上限为 max_bytes 的 1/GENERATIONS
+    MIN_GENERATION_BYTES = 1024 * 1024
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_age=3600):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.generation_bytes = max(max_bytes // self.GENERATIONS, self.MIN_GENERATION_BYTES)
+        self._snapshots = deque()
+        self._lock = threading.Lock()
+        self._next_seq = 0
+        self._nbytes = 0
+        self._generations = deque([StringTables()])  # 最后一代为当前使用的字符串表
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    @property
+    def first_seq(self):
+        """最旧快照的序号，没有快照时为 None"""
+        with self._lock:
+            return self._snapshots[0].seq if self._snapshots else None
+
+    @property
+    def last_seq(self):
+        """最新快照的序号，没有快照时为 None"""
+        with self._lock:
+            return self._snapshots[-1].seq if self._snapshots else None
+
+    def memory_usage(self):
+        """估算的内存占用（字节）"""
+        with self._lock:
+            return self._nbytes + self._table_bytes()
+
+    def _table_bytes(self):
+        return sum(tables.nbytes for tables in self._generations)
+
+    def append(self, rows, timestamp=None):
+        """追加一个快照并返回其序号"""
+        with self._lock:
+            tables = self._generations[-1]
+            if tables.nbytes > self.generation_bytes:
+                tables = StringTables()
+                self._generations.append(tables)
+            snapshot = ColumnarSnapshot(self._next_seq, time.time() if timestamp is None else timestamp,
+                                        tables)
+            self._next_seq += 1
+            self._encode(snapshot, rows)
+            tables.snapshots += 1
+            self._snapshots.append(snapshot)
+            self._nbytes += snapshot.nbytes
+            self._evict(snapshot.timestamp)
+            return snapshot.seq
+
+    def _encode(self, snapshot, rows):
+        tables = snapshot.tables
+        name_id = tables.names.intern
+        addr_id = tables.addresses.intern
+        status_id = tables.statuses.intern
+        proto_id = tables.protos.intern
+        host_id = tables.hosts.intern
+        for row in rows:
+            raddr = row["raddr"]
+            snapshot.pid.append(row["pid"])
+            snapshot.name.append(name_id(row["name"]))
+            snapshot.proto.append(proto_id(f'{row["family"]}/{row["type"]}'))
+            snapshot.status.append(status_id(row["status"]))
+            snapshot.lip.append(addr_id(row["laddr"][0]))
+            snapshot.lport.append(row["laddr"][1])
+            snapshot.rip.append(addr_id(raddr[0]) if raddr else 0)
+            snapshot.rport.append(raddr[1] if raddr else 0)
+            snapshot.host.append(host_id(row.get("host")))
+        snapshot.nbytes = sum(col.itemsize * len(col) for col in snapshot.columns()) + 128
+
+    def _evict(self, now):
+        """淘汰超出容量或保留时长的最旧快照（至少保留最新一个）"""
+        while len(self._snapshots) > 1 and (
+                self._nbytes + self._table_bytes() > self.max_bytes
+                or now - self._snapshots[0].timestamp > self.max_age):
+            snapshot = self._snapshots.popleft()
+            self._nbytes -= snapshot.nbytes
+            snapshot.tables.snapshots -= 1
+            # 最旧一代的快照全部淘汰后释放其字符串表
+            while self._generations[0].snapshots == 0 and len(self._generations) > 1:
+                self._generations.popleft()
+
+    def _find(self, seq):
+        if not self._snapshots:
+            return None
+        i = seq - self._snapshots[0].seq
+        if 0 <= i < len(self._snapshots):
+            return self._snapshots[i]
+        return None
+
+    def timestamp(self, seq):
+        """快照的时间戳，快照已被淘汰时返回 None"""
+        with self._lock:
+            snapshot = self._find(seq)
+            return snapshot.timestamp if snapshot else None
+
+    def rows(self, seq):
+        """把快照还原为行列表，快照已被淘汰时返回 None"""
+        with self._lock:
+            snapshot = self._find(seq)
+            if snapshot is None:
+                return None
+            tables = snapshot.tables
+            names = tables.names.values
+            addresses = tables.addresses.values
+            statuses = tables.statuses.values
+            hosts = tables.hosts.values
+            protos = [tuple(int(part) for part in proto.split("/")) if proto else None
+                      for proto in tables.protos.values]
+            rows = []
+            for pid, name, proto, status, lip, lport, rip, rport, host in zip(*snapshot.columns()):
+                family, type_ = protos[proto]
+                raddr = (addresses[rip], rport) if rip else None
+                row = make_row(pid, names[name], family, type_,
+                               (addresses[lip], lport), raddr, statuses[status])
+                if host:
+                    row["host"] = hosts[host]
+                rows.append(row)
+            return rows
@@ -0,0 +1,195 @@
+"""Prometheus/OpenMetrics 指标导出
+
+本模块不依赖Qt。采集线程每次刷新后把最新快照交给 MetricsRegistry，
+抓取请求只读取缓存：每个快照最多渲染一次，之后的抓取直接返回缓存的字节，
+不会触发新的扫描。HTTP 服务运行在独立线程的 asyncio 事件循环中。
+"""
+import asyncio
+import threading
+import time
+
+from port_collector import protocol_name
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels) + "}"
+
+
+class MetricsRegistry:
+    """保存最新快照并按需渲染指标文本，可在多线程间共享"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = []
+        self._scan_seconds = 0.0
+        self._timestamp = None
+        self._scans = 0
+        self._scan_seconds_total = 0.0
+        self._cache_stats = None
+        self._rendered = {}  # openmetrics(bool) -> 已渲染的字节
+
+    def update(self, rows, scan_seconds, cache_stats=None, timestamp=None):
+        """发布一次采集结果，只保存引用，渲染推迟到下一次抓取"""
+        with self._lock:
+            self._rows = rows
+            self._scan_seconds = scan_seconds
+            self._timestamp = time.time() if timestamp is None else timestamp
+            self._scans += 1
+            self._scan_seconds_total += scan_seconds
+            self._cache_stats = cache_stats
+            self._rendered = {}
+
+    def render(self, openmetrics=False):
+        """返回指标文本（字节），同一快照只渲染一次"""
+        with self._lock:
+            data = self._rendered.get(openmetrics)
+            if data is None:
+                data = self._rendered[openmetrics] = self._render(openmetrics).encode("utf-8")
+            return data
+
+    def _render(self, openmetrics):
+        by_state = {}
+        by_process = {}
+        listening = set()
+        for row in self._rows:
+            host = row.get("host") or ""  # 汇总远程代理时按主机区分
+            proto = protocol_name(row)
+            key = (host, row["status"], proto)
+            by_state[key] = by_state.get(key, 0) + 1
+            process = (host, row["name"], row["pid"])
+            by_process[process] = by_process.get(process, 0) + 1
+            if row["status"] == "LISTEN" or (row["raddr"] is None and proto.startswith("udp")):
+                listening.add((host, row["name"], row["pid"], proto, row["laddr"][0], row["laddr"][1]))
+
+        lines = []
+
+        def host_label(host):
+            return (("host", host),) if host else ()
+
+        def family(name, metric_type, help_text, samples, suffix=""):
+            # OpenMetrics 的计数器族名不带 _total 后缀，Prometheus 文本格式则带
+            family_name = name if openmetrics else name + suffix
+            lines.append(f"# HELP {family_name} {help_text}")
+            lines.append(f"# TYPE {family_name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{suffix}{format_labels(labels)} {value}")
+
+        family("port_monitor_connections", "gauge", "Connections by state and protocol.",
+               [(host_label(host) + (("state", state), ("proto", proto)), count)
+                for (host, state, proto), count in sorted(by_state.items())])
+        family("port_monitor_listening_port", "gauge", "Listening ports per process (always 1).",
+               [(host_label(host) + (("process", name), ("pid", pid), ("proto", proto),
+                                     ("address", address), ("port", port)), 1)
+                for host, name, pid, proto, address, port in sorted(listening)])
+        family("port_monitor_process_sockets", "gauge", "Sockets held by each process.",
+               [(host_label(host) + (("process", name), ("pid", pid)), count)
+                for (host, name, pid), count in sorted(by_process.items())])
+        family("port_monitor_scan_duration_seconds", "gauge", "Duration of the latest collector scan.",
+               [((), f"{self._scan_seconds:.6f}")])
+        family("port_monitor_scans", "counter", "Collector scans since start.",
+               [((), self._scans)], suffix="_total")
+        family("port_monitor_scan_seconds", "counter", "Total time spent in collector scans.",
+               [((), f"{self._scan_seconds_total:.6f}")], suffix="_total")
+        if self._timestamp is not None:
+            family("port_monitor_last_scan_timestamp_seconds", "gauge",
+                   "Unix time of the latest collector scan.", [((), f"{self._timestamp:.3f}")])
+        if self._cache_stats:
+            family("port_monitor_process_cache_hits", "counter", "Process metadata cache hits.",
+                   [((), self._cache_stats["hits"])], suffix="_total")
+            family("port_monitor_process_cache_misses", "counter", "Process metadata cache misses.",
+                   [((), self._cache_stats["misses"])], suffix="_total")
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """在后台线程中运行的 /metrics HTTP 服务"""
+    def __init__(self, registry, host="127.0.0.1", port=9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._started = threading.Event()
+        self._error = None
+
+    def start(self):
+        """启动服务，端口被占用等错误会在此抛出"""
+        self._thread = threading.Thread(target=self._run, name="metrics-server", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            self._server = loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self._error = e
+            self._started.set()
+            loop.close()
+            return
+        self._loop = loop
+        self._started.set()
+        try:
+            loop.run_forever()
+        finally:
+            self._server.close()
+            loop.run_until_complete(self._server.wait_closed())
+            loop.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 10)
+            accept = ""
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 10)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.strip().lower() == "accept":
+                    accept = value
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] in ("GET", "HEAD") and parts[1].split("?")[0] == "/metrics":
+                openmetrics = "application/openmetrics-text" in accept
+                body = self.registry.render(openmetrics)
+                content_type = OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE
+                status = "200 OK"
+            else:
+                body = b"Not Found\n"
+                content_type = "text/plain; charset=utf-8"
+                status = "404 Not Found"
+            writer.write(self._headers(status, content_type, len(body)))
+            if parts and parts[0] != "HEAD":
+                writer.write(body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _headers(status, content_type, length):
+        return (f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {length}\r\nConnection: close\r\n\r\n").encode("latin-1")
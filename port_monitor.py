@@ -1,181 +1,765 @@
 import sys
-import psutil
-import subprocess
-import os
-from PyQt5.QtWidgets import (QApplication, QMainWindow, QTableWidget, QTableWidgetItem, 
+import time
+import argparse
+from collections import deque
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QTableView, QAbstractItemView,
                              QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QHeaderView, 
-                             QMessageBox, QLabel, QDialog, QTextEdit, QCheckBox, QGroupBox,
-                             QGridLayout, QComboBox, QLineEdit, QAction, QMenu, QMenuBar)
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QIcon, QFont, QPalette, QColor
-
-class AboutDialog(QDialog):
-    """关于对话框"""
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("关于 Windows端口占用监控工具")
-        self.resize(500, 300)
-        self.init_ui()
-        
-    def init_ui(self):
-        layout = QVBoxLayout()
-        
-        # 标题
-        title_label = QLabel("Windows端口占用监控工具")
-        title_font = QFont()
-        title_font.setPointSize(16)
-        title_font.setBold(True)
-        title_label.setFont(title_font)
-        title_label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(title_label)
-        
-        # 版本信息
-        version_label = QLabel("版本: 1.0.0")
-        version_label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(version_label)
-        
-        # 描述
-        desc_text = QTextEdit()
-        desc_text.setReadOnly(True)
-        desc_text.setHtml("""
-        <p>这是一个用于监控Windows系统端口占用情况的工具，主要功能包括：</p>
-        <ul>
-            <li>实时监控系统端口占用情况</li>
-            <li>查看占用端口的进程详细信息</li>
-            <li>支持按端口号和进程名过滤</li>
-            <li>支持关闭占用端口的进程</li>
-            <li>支持深色/浅色主题切换</li>
-        </ul>
-        <p>项目地址: <a href='https://github.com/leonda123/port-monitor'>https://github.com/leonda123/port-monitor</a></p>
-        <p>作者: leonda</p>
-        <p>联系方式: dadajiu45@gmail.com</p>
-        """)
-        layout.addWidget(desc_text)
-        
-        # 关闭按钮
-        close_btn = QPushButton("关闭")
-        close_btn.clicked.connect(self.accept)
-        layout.addWidget(close_btn)
-        
-        self.setLayout(layout)
-
-class ProcessDetailDialog(QDialog):
-    """进程详细信息对话框"""
-    def __init__(self, pid, parent=None):
+                             QMessageBox, QLabel, QGroupBox, QGridLayout, QLineEdit, QAction,
+                             QMenu, QSlider, QProgressBar, QSystemTrayIcon, QStyle, QTreeView,
+                             QActionGroup, QInputDialog)
+from PyQt5.QtCore import (Qt, QTimer, QThread, pyqtSignal, QAbstractTableModel, QAbstractItemModel,
+                          QModelIndex, QEvent, QItemSelectionModel)
+from PyQt5.QtGui import QPalette, QColor
+# 对话框（port_dialogs）、资源采样、结束进程以及只由命令行选项启用的模块（指标、远程汇总、
+# 事件存储、监视规则）在用到时才导入，缩短窗口首次绘制前的启动时间
+from port_collector import PortCollector
+from port_diff import SnapshotDelta, SnapshotDiffer, index_rows
+from port_filter import FilterSpec, FilterError, SnapshotIndex
+from port_history import ConnectionHistory
+from port_scheduler import RefreshScheduler
+from port_perf import Profiler
+from port_groups import GroupTree, GROUP_MODES, connection_label
+from port_sort import (SORT_FIELDS, FIELD_INDEX, SortKeyCache, sort_order, insert_position)
+from port_names import NameResolver, row_service
+
+PUSHDOWN_NAMES = {"state": "状态", "port": "端口", "remote": "远程地址"}
+
+
+class CollectorThread(QThread):
+    """后台采集线程，采集完成后通过信号把快照交回界面线程"""
+    data_ready = pyqtSignal(object, object, object)  # 完整快照（按引用传递，不复制行）, 与上一次快照的差异, 快照索引
+    resources_ready = pyqtSignal(object)  # {pid: ResourceSample}
+    alerts_ready = pyqtSignal(list)  # [Alert]
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, history=None, metrics=None, profiler=None, collector=None, store=None,
+                 rules=None, recorder=None, parent=None):
         super().__init__(parent)
-        self.pid = pid
-        self.setWindowTitle(f"进程详细信息 (PID: {pid})")
-        self.resize(600, 400)
-        self.init_ui()
-        self.load_process_info()
-        
-    def init_ui(self):
-        layout = QVBoxLayout()
-        
-        # 创建信息显示区域
-        self.info_text = QTextEdit()
-        self.info_text.setReadOnly(True)
-        layout.addWidget(self.info_text)
-        
-        # 关闭按钮
-        close_btn = QPushButton("关闭")
-        close_btn.clicked.connect(self.accept)
-        layout.addWidget(close_btn)
-        
-        self.setLayout(layout)
-    
-    def load_process_info(self):
+        self.store = store
+        self.recorder = recorder  # CaptureWriter，设置时把每次采集的结果写入录制文件
+        self.rules = rules  # RuleEngine，对每次的快照差异求值监视规则
+        self.profiler = profiler if profiler is not None else Profiler()
+        # 默认采集本机，跨次刷新复用进程信息缓存；也可传入 RemoteAggregator 汇总远程主机，
+        # 或传入 ReplayCollector 回放录制文件
+        self.collector = collector if collector is not None else PortCollector(profiler=self.profiler)
+        self.differ = SnapshotDiffer()
+        self.history = history
+        self.metrics = metrics
+        self.sampler = None  # 显示资源列时设置为 ResourceSampler
+        self.sort_keys = None  # 表格排序时设置为 SortKeyCache，为新增和变化的行预先计算排序键
+        self.visible_pids = frozenset()  # 表格中可见行的PID，由界面线程在每次刷新前设置
+        self.pushdown = None  # 下推到内核的过滤条件（FilterSpec），由界面线程在每次刷新前设置
+        self.pushed = ()  # 实际下推的条件名称
+        self._pushdown_spec = None
+
+    def run(self):
         try:
-            process = psutil.Process(self.pid)
-            info = []
-            
-            # 基本信息
-            info.append(f"进程名称: {process.name()}")
-            info.append(f"PID: {process.pid}")
-            info.append(f"状态: {process.status()}")
-            
-            # 内存信息
-            mem_info = process.memory_info()
-            info.append(f"内存使用: {self.format_bytes(mem_info.rss)}")
-            info.append(f"虚拟内存: {self.format_bytes(mem_info.vms)}")
-            
-            # CPU信息
-            info.append(f"CPU使用率: {process.cpu_percent()}%")
-            
-            # 创建时间
-            info.append(f"创建时间: {self.format_time(process.create_time())}")
-            
-            # 用户信息
-            try:
-                info.append(f"用户: {process.username()}")
-            except:
-                info.append("用户: 未知")
-            
-            # 命令行
-            try:
-                cmdline = process.cmdline()
-                info.append(f"命令行: {' '.join(cmdline)}")
-            except:
-                info.append("命令行: 无法获取")
-            
-            # 打开的文件
-            try:
-                files = process.open_files()
-                if files:
-                    info.append("\n打开的文件:")
-                    for file in files[:20]:  # 限制显示数量
-                        info.append(f"  {file.path}")
-                    if len(files) > 20:
-                        info.append(f"  ... 还有 {len(files) - 20} 个文件未显示")
-            except:
-                info.append("打开的文件: 无法获取")
-            
-            # 网络连接
-            try:
-                connections = process.connections()
-                if connections:
-                    info.append("\n网络连接:")
-                    for conn in connections:
-                        local_addr = f"{conn.laddr.ip}:{conn.laddr.port}" if conn.laddr else "N/A"
-                        remote_addr = f"{conn.raddr.ip}:{conn.raddr.port}" if conn.raddr else "N/A"
-                        info.append(f"  {conn.type} - 本地: {local_addr}, 远程: {remote_addr}, 状态: {conn.status}")
-            except:
-                info.append("网络连接: 无法获取")
-            
-            self.info_text.setText("\n".join(info))
-            
-        except psutil.NoSuchProcess:
-            self.info_text.setText("进程不存在或已终止")
+            profiler = self.profiler
+            if self.pushdown is not self._pushdown_spec:
+                self._pushdown_spec = self.pushdown
+                self.pushed = self.collector.set_filter(self.pushdown)
+            port_data = self.collector.collect()
+            if self.pushed:
+                self.pushed = self.collector.pushed  # 后端回退到 /proc/net 后不再在内核中过滤
+            # 回放时历史、事件和告警使用录制时间，否则为当前时间
+            timestamp = getattr(self.collector, "timestamp", None)
+            with profiler.phase("diff"):
+                delta = self.differ.update(port_data)
+            if self.history is not None:
+                with profiler.phase("history"):
+                    self.history.append(port_data, timestamp)
+            sort_keys = self.sort_keys
+            if sort_keys is not None:
+                with profiler.phase("sort_keys"):
+                    sort_keys.update(delta)
+            if self.store is not None:
+                with profiler.phase("store"):
+                    self.store.record(port_data, delta, timestamp)
+            if self.recorder is not None:
+                with profiler.phase("record"):
+                    self.recorder.record(port_data, delta, timestamp)
+            alerts = None
+            if self.rules is not None:
+                with profiler.phase("rules"):
+                    alerts = self.rules.process(delta, timestamp)
+            if self.metrics is not None:
+                cache = self.collector.process_cache
+                self.metrics.update(port_data, self.collector.last_duration,
+                                    cache.stats() if cache is not None else None)
+            with profiler.phase("index"):
+                port_index = SnapshotIndex(port_data)
+            self.data_ready.emit(port_data, delta, port_index)
+            if alerts:
+                self.alerts_ready.emit(alerts)
+            sampler = self.sampler
+            if sampler is not None:
+                with profiler.phase("resources"):
+                    resources = sampler.update({row["pid"] for row in port_data}, self.visible_pids)
+                self.resources_ready.emit(resources)
         except Exception as e:
-            self.info_text.setText(f"获取进程信息时出错: {str(e)}")
-    
-    def format_bytes(self, bytes):
-        """格式化字节大小为人类可读格式"""
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if bytes < 1024:
-                return f"{bytes:.2f} {unit}"
-            bytes /= 1024
-        return f"{bytes:.2f} PB"
-    
-    def format_time(self, timestamp):
-        """格式化时间戳"""
-        import datetime
-        return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+            self.error_occurred.emit(str(e))
+
+class SortThread(QThread):
+    """在后台计算大表格的排序顺序"""
+    sort_ready = pyqtSignal(int, object, object, object)  # 模型版本, 排序条件, 排序键, 顺序
+
+    def __init__(self, generation, spec, keys, rows, sort_keys, cache, parent=None):
+        super().__init__(parent)
+        self.generation = generation
+        self.spec = spec
+        self.keys = keys
+        self.rows = rows
+        self.sort_keys = sort_keys
+        self.cache = cache
+
+    def run(self):
+        sort_keys = self.sort_keys
+        if sort_keys is None:
+            sort_keys = [self.cache.get(key, row) for key, row in zip(self.keys, self.rows)]
+        self.sort_ready.emit(self.generation, self.spec, sort_keys, sort_order(sort_keys, self.spec))
+
+class PortTableModel(QAbstractTableModel):
+    """端口数据表格模型
+
+    单元格文本在 data() 中按需生成，只有可见行才会被计算；
+    数据更新以增删行和 dataChanged 区间的方式提交，刷新后选中状态得以保留。
+    排序时新增和排序键变化的行按二分查找插入，其余行保持原位。
+    """
+    HEADERS = ["进程ID", "进程名", "本地地址", "远程地址", "状态"]
+    FIELDS = ["pid", "name", "local_address", "remote_address", "status"]
+    HOST_HEADER = "主机"
+    RESOURCE_HEADERS = ["CPU%", "内存", "线程数", "句柄数"]
+    NAME_HEADERS = ["服务", "远程主机名"]
+    HIGHLIGHT_MS = 2000  # 变化行的高亮持续时间
+    MAX_SORT_COLUMNS = 3
+    ASYNC_SORT_ROWS = 20000  # 行数达到该值时在后台线程中排序
+    BULK_INSERT_ROWS = 2000  # 一次新增的行数超过该值时追加后整体重新排序，而不是逐段插入
+    ADDED_COLOR = QColor(76, 175, 80, 90)
+    CHANGED_COLOR = QColor(255, 193, 7, 90)
+
+    def __init__(self, parent=None, show_host=False):
+        super().__init__(parent)
+        self.headers = ([self.HOST_HEADER] if show_host else []) + self.HEADERS
+        self.fields = (["host"] if show_host else []) + self.FIELDS
+        self.base_columns = len(self.headers)
+        self.extra_columns = []  # 基本列之后的附加列: ("names", 序号) 或 ("resource", 序号)
+        self._resources = None  # 显示资源列时为 {pid: ResourceSample}
+        self.resolver = None  # 显示名称列时为 NameResolver
+        self._rows = []
+        self._keys = []
+        self._highlight = {}  # 键 -> 背景色
+        self._highlight_timer = QTimer(self)
+        self._highlight_timer.setSingleShot(True)
+        self._highlight_timer.timeout.connect(self.clear_highlight)
+        self.key_cache = SortKeyCache()
+        self.sort_spec = []  # [(排序字段序号, 是否降序)]，主要列在前，为空表示不排序
+        self._sort_keys = None  # 排序时与 _rows 一一对应的排序键
+        self._generation = 0  # 每次修改行数据时递增，用于丢弃过期的后台排序结果
+        self._sort_thread = None
+        self._sort_again = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            column = index.column()
+            if column < self.base_columns:
+                return str(self._rows[index.row()][self.fields[column]])
+            kind, item = self.extra_columns[column - self.base_columns]
+            if kind == "resource":
+                return self.resource_text(self._rows[index.row()]["pid"], item)
+            return self.name_text(self._rows[index.row()], item)
+        if role == Qt.BackgroundRole and self._highlight:
+            return self._highlight.get(self._keys[index.row()])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def row_data(self, row):
+        """获取指定行的原始数据"""
+        return self._rows[row]
+
+    def resource_text(self, pid, item):
+        sample = self._resources.get(pid)
+        if sample is None:
+            return ""
+        if item == 0:
+            return "" if sample.cpu_percent is None else f"{sample.cpu_percent:.1f}"
+        if item == 1:
+            return "" if sample.rss is None else f"{sample.rss / 1048576:.1f} MB"
+        value = sample.threads if item == 2 else sample.fds
+        return "" if value is None else str(value)
+
+    def name_text(self, row, item):
+        """名称列只读取缓存，未解析的主机名在解析完成后由 refresh_names() 补上"""
+        if item == 0:
+            return row_service(row) or ""
+        raddr = row["raddr"]
+        if not raddr:
+            return ""
+        return self.resolver.get(raddr[0]) or ""
+
+    def _extra_range(self, kind):
+        """某类附加列的列号范围 (first, last)，未显示时返回 None"""
+        columns = [i for i, (k, _) in enumerate(self.extra_columns) if k == kind]
+        if not columns:
+            return None
+        return self.base_columns + columns[0], self.base_columns + columns[-1]
+
+    def _set_extra_columns(self, kind, headers, enabled, position):
+        """在附加列的 position 处插入，或移除某类附加列"""
+        span = self._extra_range(kind)
+        if enabled == (span is not None):
+            return
+        if enabled:
+            first = self.base_columns + position
+            self.beginInsertColumns(QModelIndex(), first, first + len(headers) - 1)
+            self.headers[first:first] = headers
+            self.extra_columns[position:position] = [(kind, i) for i in range(len(headers))]
+            self.endInsertColumns()
+        else:
+            first, last = span
+            self.beginRemoveColumns(QModelIndex(), first, last)
+            del self.headers[first:last + 1]
+            del self.extra_columns[first - self.base_columns:last - self.base_columns + 1]
+            self.endRemoveColumns()
+
+    def set_resource_columns(self, enabled):
+        """显示或隐藏资源列（位于最后）"""
+        if enabled:
+            self._resources = {}
+        self._set_extra_columns("resource", self.RESOURCE_HEADERS, enabled, len(self.extra_columns))
+        if not enabled:
+            self._resources = None
+
+    def set_name_columns(self, resolver):
+        """显示（resolver 为 NameResolver）或隐藏服务名和远程主机名列（紧接基本列）"""
+        if resolver is not None:
+            self.resolver = resolver
+        self._set_extra_columns("names", self.NAME_HEADERS, resolver is not None, 0)
+        self.resolver = resolver
+
+    def set_resources(self, resources):
+        """更新资源采样结果，只通知资源列变化"""
+        span = self._extra_range("resource")
+        if span is None:
+            return
+        self._resources = resources
+        if self._rows:
+            self.dataChanged.emit(self.index(0, span[0]), self.index(len(self._rows) - 1, span[1]),
+                                  [Qt.DisplayRole])
+
+    def refresh_names(self):
+        """有新解析完成的主机名时通知主机名列变化，只有可见行会重新读取"""
+        if self.resolver is None or not self.resolver.take_resolved() or not self._rows:
+            return
+        column = self._extra_range("names")[1]
+        self.dataChanged.emit(self.index(0, column), self.index(len(self._rows) - 1, column),
+                              [Qt.DisplayRole])
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """按表头点击的列排序，之前的排序列依次作为次要排序列；column 为 -1 时取消排序"""
+        if column < 0:
+            self.set_sort_spec([])
+            return
+        if column >= self.base_columns:
+            return  # 资源列每次刷新都会变化，不参与排序
+        index = FIELD_INDEX[self.fields[column]]
+        spec = [(index, order == Qt.DescendingOrder)]
+        spec.extend(item for item in self.sort_spec if item[0] != index)
+        self.set_sort_spec(spec[:self.MAX_SORT_COLUMNS])
+
+    def set_sort_spec(self, spec):
+        self.sort_spec = spec
+        if not spec:
+            # 取消排序时保持当前顺序
+            self._sort_keys = None
+            self.key_cache.clear()
+            return
+        self._resort()
+
+    def sort_description(self):
+        """当前排序条件的说明，如「状态 ↑，本地地址 ↓」"""
+        return "，".join(self.headers[self.fields.index(SORT_FIELDS[index])] + (" ↓" if descending else " ↑")
+                        for index, descending in self.sort_spec)
+
+    def primary_sort_column(self):
+        if not self.sort_spec:
+            return -1
+        return self.fields.index(SORT_FIELDS[self.sort_spec[0][0]])
+
+    def wait_sort(self):
+        if self._sort_thread is not None:
+            self._sort_thread.wait()
+
+    def _resort(self):
+        """按 sort_spec 重新排序全部行，行数较多时在后台线程中计算"""
+        if len(self._rows) < self.ASYNC_SORT_ROWS:
+            sort_keys = self._sort_keys
+            if sort_keys is None:
+                sort_keys = [self.key_cache.get(key, row) for key, row in zip(self._keys, self._rows)]
+            self._apply_order(sort_keys, sort_order(sort_keys, self.sort_spec))
+            return
+        if self._sort_thread is not None:
+            self._sort_again = True
+            return
+        self._sort_thread = SortThread(self._generation, list(self.sort_spec), list(self._keys),
+                                       list(self._rows), None if self._sort_keys is None else list(self._sort_keys),
+                                       self.key_cache, self)
+        self._sort_thread.sort_ready.connect(self._on_sort_ready)
+        self._sort_thread.start()
+
+    def _on_sort_ready(self, generation, spec, sort_keys, order):
+        self._sort_thread.wait()
+        self._sort_thread = None
+        if generation == self._generation and spec == self.sort_spec and not self._sort_again:
+            self._apply_order(sort_keys, order)
+        elif self.sort_spec:
+            # 排序期间数据或排序条件已变化，按最新数据重新排序
+            self._sort_again = False
+            self._resort()
+
+    def _apply_order(self, sort_keys, order):
+        """按 order 重排全部行，选中状态等持久索引随行移动"""
+        self.layoutAboutToBeChanged.emit([], QAbstractItemModel.VerticalSortHint)
+        persistent = self.persistentIndexList()
+        moved = [self._keys[index.row()] for index in persistent]
+        self._keys = [self._keys[i] for i in order]
+        self._rows = [self._rows[i] for i in order]
+        self._sort_keys = [sort_keys[i] for i in order]
+        self._generation += 1
+        if persistent:
+            wanted = set(moved)
+            position = {key: i for i, key in enumerate(self._keys) if key in wanted}
+            self.changePersistentIndexList(
+                persistent, [self.index(position[key], index.column()) for key, index in zip(moved, persistent)])
+        self.layoutChanged.emit([], QAbstractItemModel.VerticalSortHint)
+
+    def update_rows(self, rows):
+        """以最小变更把模型数据更新为 rows（用于过滤条件改变）"""
+        new_index = index_rows(rows)
+        if not any(key in new_index for key in self._keys):
+            self.beginResetModel()
+            self._keys = list(new_index)
+            self._rows = list(new_index.values())
+            self._sort_keys = None
+            self._generation += 1
+            self._highlight = {}
+            self.endResetModel()
+            if self.sort_spec:
+                self._resort()
+            return
+
+        self._remove_keys(set(self._keys).difference(new_index))
+        self._update_in_place(new_index)
+        existing = set(self._keys)
+        self._insert([(key, row) for key, row in new_index.items() if key not in existing])
+
+    def apply_delta(self, delta, accept=None, highlight=True):
+        """把快照差异应用到模型
+
+        accept 为当前过滤条件，只有满足条件的行才会显示。
+        """
+        accept = accept or (lambda row: True)
+        removed = {key for key, _ in delta.removed}
+        changed = {}
+        added = [(key, row) for key, row in delta.added if accept(row)]
+        for key, _, row in delta.changed:
+            if accept(row):
+                changed[key] = row
+            else:
+                removed.add(key)
+        self._remove_keys(removed)
+        # 变化后才满足过滤条件的行按新增处理；只有新增时（如首次分块加载）不必建立集合
+        existing = set(self._keys) if changed else ()
+        added.extend((key, row) for key, row in changed.items() if key not in existing)
+        self._update_in_place(changed)
+        self._insert(added)
+
+        if highlight:
+            self._highlight = {key: self.ADDED_COLOR for key, _ in added}
+            self._highlight.update((key, self.CHANGED_COLOR) for key in changed if key in existing)
+            if self._highlight:
+                self._emit_background_changed()
+                self._highlight_timer.start(self.HIGHLIGHT_MS)
+
+    def clear_highlight(self):
+        """清除变化行的高亮"""
+        if self._highlight:
+            self._highlight = {}
+            self._emit_background_changed()
+
+    def _emit_background_changed(self):
+        if self._rows:
+            self.dataChanged.emit(self.index(0, 0),
+                                  self.index(len(self._rows) - 1, len(self.headers) - 1),
+                                  [Qt.BackgroundRole])
+
+    def _remove_keys(self, keys):
+        """从后往前删除键在 keys 中的连续行段"""
+        if not keys:
+            return
+        i = len(self._keys) - 1
+        while i >= 0:
+            if self._keys[i] not in keys:
+                i -= 1
+                continue
+            end = i
+            while i >= 0 and self._keys[i] in keys:
+                i -= 1
+            self.beginRemoveRows(QModelIndex(), i + 1, end)
+            del self._rows[i + 1:end + 1]
+            del self._keys[i + 1:end + 1]
+            if self._sort_keys is not None:
+                del self._sort_keys[i + 1:end + 1]
+            self._generation += 1
+            self.endRemoveRows()
+
+    def _update_in_place(self, rows_by_key):
+        """原地更新内容变化的行，排序时排序键变化的行移动到新位置"""
+        if not rows_by_key:
+            return
+        first = last = None
+        sort_keys = self._sort_keys
+        moved = []
+        for i, key in enumerate(self._keys):
+            row = rows_by_key.get(key)
+            if row is None:
+                continue
+            if row != self._rows[i]:
+                if sort_keys is not None and self.key_cache.get(key, row) != sort_keys[i]:
+                    moved.append((key, row))
+                    continue
+                if first is None:
+                    first = i
+                last = i
+            self._rows[i] = row
+        if first is not None:
+            self._generation += 1
+            self.dataChanged.emit(self.index(first, 0), self.index(last, len(self.headers) - 1))
+        if moved:
+            self._remove_keys({key for key, _ in moved})
+            self._insert(moved)
+
+    def _insert(self, items):
+        """加入 (键, 行) 列表：不排序时追加到末尾，排序时插入到各自的位置"""
+        if not items:
+            return
+        spec = self.sort_spec
+        if self._sort_keys is None or not spec:
+            self._append(items)
+            return
+        if len(items) > self.BULK_INSERT_ROWS:
+            self._append(items)
+            self._resort()
+            return
+        new_keys = [self.key_cache.get(key, row) for key, row in items]
+        order = sort_order(new_keys, spec)
+        positions = [insert_position(self._sort_keys, new_keys[i], spec) for i in order]
+        # 从后往前插入，前面的插入位置不受影响；插入位置相同的行一次插入
+        end = len(order)
+        while end > 0:
+            position = positions[end - 1]
+            start = end - 1
+            while start > 0 and positions[start - 1] == position:
+                start -= 1
+            run = order[start:end]
+            self.beginInsertRows(QModelIndex(), position, position + len(run) - 1)
+            self._keys[position:position] = [items[i][0] for i in run]
+            self._rows[position:position] = [items[i][1] for i in run]
+            self._sort_keys[position:position] = [new_keys[i] for i in run]
+            self._generation += 1
+            self.endInsertRows()
+            end = start
+
+    def _append(self, items):
+        """在末尾追加 (键, 行) 列表"""
+        if not items:
+            return
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(items) - 1)
+        self._keys.extend(key for key, _ in items)
+        self._rows.extend(row for _, row in items)
+        if self._sort_keys is not None:
+            self._sort_keys.extend(self.key_cache.get(key, row) for key, row in items)
+        self._generation += 1
+        self.endInsertRows()
+
+class PortGroupModel(QAbstractItemModel):
+    """分组树模型
+
+    子节点在展开时才加载，节点很多时分批加载；每次刷新只通知变化的行，
+    各状态的连接数由 GroupTree 按差异增量维护。
+    """
+    HEADERS = ["分组 / 连接", "连接数", "LISTEN", "ESTABLISHED", "TIME_WAIT", "CLOSE_WAIT", "其他"]
+    STATES = ["LISTEN", "ESTABLISHED", "TIME_WAIT", "CLOSE_WAIT"]
+    FETCH_BATCH = 500  # 每次加载的子节点数
+
+    def __init__(self, mode="process", parent=None):
+        super().__init__(parent)
+        self.tree = GroupTree(mode)
+        self._updating = False  # 修改结构期间不响应 fetchMore，避免在多段删除之间或重入时插入行
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.tree.root
+
+    def _row_of(self, node):
+        """节点在父节点 view 中的位置；pos 过期时重新查找并修正"""
+        view = node.parent.view
+        pos = node.pos
+        if pos is None or pos >= len(view) or view[pos] is not node:
+            pos = node.pos = view.index(node)
+        return pos
+
+    def node_index(self, node):
+        if node.parent is None:
+            return QModelIndex()
+        return self.createIndex(self._row_of(node), 0, node)
+
+    def index(self, row, column, parent=QModelIndex()):
+        view = self.node(parent).view
+        if view is None or not 0 <= row < len(view) or not 0 <= column < len(self.HEADERS):
+            return QModelIndex()
+        return self.createIndex(row, column, view[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        return self.node_index(index.internalPointer().parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        view = self.node(parent).view
+        return len(view) if view is not None else 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.HEADERS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node(parent)
+        # 删除过程中已显示的子节点可能还未从 view 中移除，以 view 为准
+        return node.is_group and bool(node.view or node.children)
+
+    def canFetchMore(self, parent):
+        if self._updating:
+            return False
+        node = self.node(parent)
+        return node.is_group and (node.view is None or len(node.view) < len(node.children))
+
+    def fetchMore(self, parent):
+        """加载尚未显示的子节点，分组按连接数从多到少排列"""
+        if self._updating:
+            return
+        node = self.node(parent)
+        if node.view is None:
+            node.view = []
+        pending = [child for child in node.children.values() if child.pos is None]
+        if pending and pending[0].is_group:
+            pending.sort(key=lambda child: child.total, reverse=True)
+        batch = pending[:self.FETCH_BATCH]
+        if not batch:
+            return
+        start = len(node.view)
+        self._updating = True
+        try:
+            self.beginInsertRows(parent, start, start + len(batch) - 1)
+            for i, child in enumerate(batch, start):
+                child.pos = i
+            node.view.extend(batch)
+            self.endInsertRows()
+        finally:
+            self._updating = False
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return node.label if node.row is None else f"{connection_label(node.row)}  {node.row['status']}"
+            if column == 1:
+                return str(node.total)
+            counts = node.counts if node.row is None else {node.row["status"]: 1}
+            if column < len(self.HEADERS) - 1:
+                count = counts.get(self.STATES[column - 2])
+            else:
+                count = node.total - sum(counts.get(state, 0) for state in self.STATES)
+            return str(count) if count else ""
+        if role == Qt.ToolTipRole and column == 0 and node.is_group:
+            return "\n".join(f"{state}: {count}" for state, count in
+                             sorted(node.counts.items(), key=lambda item: -item[1]))
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def rebuild(self, rows, mode=None):
+        """按完整快照重建（切换分组方式、过滤条件或历史快照时）"""
+        self.beginResetModel()
+        if mode is not None and mode != self.tree.mode:
+            self.tree = GroupTree(mode)
+        self.tree.rebuild(rows)
+        self.endResetModel()
+        if self.canFetchMore(QModelIndex()):
+            self.fetchMore(QModelIndex())
+
+    def apply_delta(self, delta, accept=None):
+        """把快照差异应用到分组树，只通知已显示部分的变化"""
+        changes = self.tree.apply_delta(delta, accept)
+        self._updating = True
+        try:
+            self._remove_nodes(changes.removed)
+            self._add_nodes(changes.added)
+        finally:
+            self._updating = False
+        parents = {}
+        for node in changes.touched:
+            parent = node.parent
+            if parent is not None and node.pos is not None and parent.view:
+                parents[id(parent)] = parent
+        last = len(self.HEADERS) - 1
+        for parent in parents.values():
+            parent_index = self.node_index(parent)
+            self.dataChanged.emit(self.index(0, 0, parent_index),
+                                  self.index(len(parent.view) - 1, last, parent_index),
+                                  [Qt.DisplayRole, Qt.ToolTipRole])
+
+    def _remove_nodes(self, nodes):
+        """删除已显示的节点；祖先也被删除的节点随祖先一起移除"""
+        removed = {id(node) for node in nodes}
+        by_parent = {}
+        for node in nodes:
+            if node.pos is None:
+                continue
+            ancestor = node.parent
+            while ancestor is not None and id(ancestor) not in removed:
+                ancestor = ancestor.parent
+            if ancestor is None:
+                by_parent.setdefault(id(node.parent), node.parent)
+        for parent in by_parent.values():
+            view = parent.view
+            parent_index = self.node_index(parent)
+            i = len(view) - 1
+            while i >= 0:
+                if id(view[i]) not in removed:
+                    i -= 1
+                    continue
+                end = i
+                while i >= 0 and id(view[i]) in removed:
+                    i -= 1
+                self.beginRemoveRows(parent_index, i + 1, end)
+                del view[i + 1:end + 1]
+                self.endRemoveRows()
+            for i, child in enumerate(view):
+                child.pos = i
+        # 通知期间 parent() 可能经 _row_of 重新写入 pos，全部通知完成后再清除
+        for node in nodes:
+            node.pos = None
+
+    def _add_nodes(self, nodes):
+        """追加新节点；父节点尚未展开或尚未全部加载时留待 fetchMore"""
+        by_parent = {}
+        for node in nodes:
+            parent = node.parent
+            if parent.view is None or parent.children.get(node.key) is not node:
+                continue
+            by_parent.setdefault(id(parent), (parent, []))[1].append(node)
+        for parent, new in by_parent.values():
+            view = parent.view
+            if len(view) + len(new) != len(parent.children):
+                continue
+            start = len(view)
+            self.beginInsertRows(self.node_index(parent), start, start + len(new) - 1)
+            for i, child in enumerate(new, start):
+                child.pos = i
+            view.extend(new)
+            self.endInsertRows()
+
+class ProcessKillThread(QThread):
+    """在后台批量关闭进程，避免等待进程退出时阻塞界面"""
+    progress = pyqtSignal(int, int)  # 已完成数, 总数
+    results_ready = pyqtSignal(object)  # {pid: 结果}
+
+    def __init__(self, pids, force=False, parent=None):
+        super().__init__(parent)
+        self.pids = pids
+        self.force = force
+
+    def run(self):
+        from port_actions import terminate_processes
+        self.results_ready.emit(terminate_processes(self.pids, self.force,
+                                                    on_progress=self.progress.emit))
 
 class PortMonitor(QMainWindow):
     """端口监控主窗口"""
-    def __init__(self):
+    FIRST_LOAD_CHUNK = 2000  # 首次加载时每次事件循环插入的行数
+    REMOTE_WAIT_MS = 200  # 等待首个远程快照时的刷新间隔（毫秒）
+
+    def __init__(self, metrics=None, remote=None, store=None, rules=None, pushdown=False,
+                 collector=None, recorder=None, replay=None):
         super().__init__()
-        self.setWindowTitle("Windows端口占用监控工具")
+        self.remote = remote  # RemoteAggregator，设置时汇总远程主机而不采集本机
+        self.replay = replay  # ReplayCollector，设置时回放录制文件而不采集本机
+        self.recorder = recorder  # CaptureWriter，设置时录制每次采集的结果
+        self.pushdown = pushdown  # 是否把过滤条件下推到内核，此时只采集满足条件的连接
+        self.store = store  # EventStore，设置时记录连接事件并可查询
+        self.rules = rules  # RuleEngine，设置时按规则告警
+        self.alerts = deque(maxlen=100)  # 最近的告警
+        self.alert_count = 0
+        self.setWindowTitle("Windows端口占用监控工具" + ("（多主机）" if remote is not None else "")
+                            + (f"（回放 {replay.reader.path}）" if replay is not None else ""))
         self.resize(900, 600)
         self.dark_mode = False  # 默认使用浅色主题
+        self.styled = False  # 是否设置过深色主题的样式表
         self.init_ui()
         self.create_menu()
         self.port_data = []
+        self.last_delta = None  # 最近一次刷新的快照差异
+        self.port_index = SnapshotIndex([])
+        self.view_index = self.port_index  # 表格当前显示的快照（实时或历史）的索引
+        self.active_filter = FilterSpec()  # 当前生效的过滤条件
+        self.refresh_pending = False  # 采集进行中又收到刷新请求时置位，合并为一次
+        self.history = ConnectionHistory()
+        self.history_seq = None  # 正在查看的历史快照序号，None 表示实时数据
+        self.profiler = Profiler()  # 默认不启用，可在「视图 → 性能」中开启
+        # collector 默认为 replay 或 remote（或本机采集），基准测试可传入使用合成数据的 PortCollector
+        if collector is None:
+            collector = replay if replay is not None else remote
+        self.collector_thread = CollectorThread(self.history, metrics, self.profiler, collector,
+                                                store, rules, recorder, self)
+        self.collector_thread.data_ready.connect(self.on_data_ready)
+        self.collector_thread.alerts_ready.connect(self.on_alerts)
+        self.collector_thread.resources_ready.connect(self.table_model.set_resources)
+        self.collector_thread.error_occurred.connect(self.on_refresh_error)
+        self.collector_thread.finished.connect(self.on_refresh_finished)
+        self.kill_thread = None  # 正在进行的批量关闭进程
+        self.kill_names = {}
+        self.scheduler = RefreshScheduler()  # 默认每5秒刷新一次，按窗口状态和数据变化自动调整
         self.timer = QTimer()
+        self.timer.setSingleShot(True)  # 每次采集结束后再安排下一次
         self.timer.timeout.connect(self.refresh_data)
-        self.timer.start(5000)  # 每5秒刷新一次
-        self.refresh_data()  # 初始加载数据
+        self.resolver = None  # 显示名称列时为 NameResolver
+        self.names_timer = QTimer(self)  # 合并解析结果，每次最多通知一次主机名列变化
+        self.names_timer.setInterval(300)
+        self.names_timer.timeout.connect(self.table_model.refresh_names)
+        self.loading = deque()  # 首次加载尚未插入的行，每块 FIRST_LOAD_CHUNK 行
+        # 窗口先以空表格显示，进入事件循环后再开始首次采集
+        self.load_progress.setRange(0, 0)
+        self.load_progress.show()
+        QTimer.singleShot(0, self.refresh_data)
         
     def create_menu(self):
         """创建菜单栏"""
@@ -184,6 +768,20 @@ class PortMonitor(QMainWindow):
         # 文件菜单
         file_menu = menubar.addMenu("文件")
         
+        query_action = QAction("连接事件查询...", self)
+        query_action.triggered.connect(self.show_event_query_dialog)
+        query_action.setEnabled(self.store is not None)
+        if self.store is None:
+            query_action.setToolTip("启动时使用 --store 指定事件文件后可用")
+        file_menu.addAction(query_action)
+        
+        seek_action = QAction("跳转回放时刻...", self)
+        seek_action.triggered.connect(self.show_seek_dialog)
+        seek_action.setEnabled(self.replay is not None)
+        if self.replay is None:
+            seek_action.setToolTip("启动时使用 --replay 指定录制文件后可用")
+        file_menu.addAction(seek_action)
+        
         exit_action = QAction("退出", self)
         exit_action.triggered.connect(self.close)
         file_menu.addAction(exit_action)
@@ -195,6 +793,39 @@ class PortMonitor(QMainWindow):
         theme_action.triggered.connect(self.toggle_theme)
         view_menu.addAction(theme_action)
         
+        interval_action = QAction("刷新间隔设置...", self)
+        interval_action.triggered.connect(self.show_interval_dialog)
+        view_menu.addAction(interval_action)
+        
+        resources_action = QAction("显示资源列（CPU、内存、线程、句柄）", self)
+        resources_action.setCheckable(True)
+        resources_action.toggled.connect(self.set_resource_columns)
+        resources_action.setEnabled(self.remote is None)  # 无法采样远程主机上的进程
+        view_menu.addAction(resources_action)
+        
+        names_action = QAction("显示服务名和远程主机名", self)
+        names_action.setCheckable(True)
+        names_action.toggled.connect(self.set_name_columns)
+        view_menu.addAction(names_action)
+        
+        group_menu = view_menu.addMenu("分组显示")
+        group_actions = QActionGroup(self)
+        for mode, label in [(None, "不分组")] + [(mode, label) for mode, (label, _) in GROUP_MODES.items()]:
+            action = QAction(label, self)
+            action.setCheckable(True)
+            action.setChecked(mode is None)
+            action.triggered.connect(lambda checked, mode=mode: self.set_group_mode(mode))
+            group_actions.addAction(action)
+            group_menu.addAction(action)
+        
+        clear_sort_action = QAction("取消排序", self)
+        clear_sort_action.triggered.connect(self.clear_sort)
+        view_menu.addAction(clear_sort_action)
+        
+        perf_action = QAction("性能", self)
+        perf_action.triggered.connect(self.show_perf_dialog)
+        view_menu.addAction(perf_action)
+        
         # 帮助菜单
         help_menu = menubar.addMenu("帮助")
         
@@ -228,160 +859,40 @@ class PortMonitor(QMainWindow):
             palette.setColor(QPalette.Highlight, QColor(42, 130, 218))
             palette.setColor(QPalette.HighlightedText, Qt.black)
             
-            # 为表格添加特定的深色主题样式
-            self.table.setStyleSheet("""
-                QTableWidget {
-                    background-color: #2D2D2D;
-                    color: white;
-                    gridline-color: #3A3A3A;
-                    border: 1px solid #3A3A3A;
-                }
-                QTableWidget::item {
-                    background-color: #2D2D2D;
-                    color: white;
-                }
-                QTableWidget::item:selected {
-                    background-color: #3A6EA5;
-                    color: white;
-                }
-                QHeaderView::section {
-                    background-color: #3A3A3A;
-                    color: white;
-                    padding: 4px;
-                    border: 1px solid #505050;
-                }
-                QTableCornerButton::section {
-                    background-color: #3A3A3A;
-                    border: 1px solid #505050;
-                }
-            """)
-            
-            # 为按钮添加特定的深色主题样式
-            button_style = """
-                QPushButton {
-                    background-color: #3A3A3A;
-                    color: white;
-                    border: 1px solid #505050;
-                    border-radius: 3px;
-                    padding: 5px 10px;
-                }
-                QPushButton:hover {
-                    background-color: #505050;
-                }
-                QPushButton:pressed {
-                    background-color: #3A6EA5;
-                }
-                QPushButton:disabled {
-                    background-color: #2D2D2D;
-                    color: #808080;
-                    border: 1px solid #404040;
-                }
-            """
-            self.refresh_btn.setStyleSheet(button_style)
-            self.view_details_btn.setStyleSheet(button_style)
-            self.kill_process_btn.setStyleSheet(button_style)
-            self.force_kill_btn.setStyleSheet(button_style)
-            self.filter_btn.setStyleSheet(button_style)
-            
-            # 为输入框添加特定的深色主题样式
-            lineedit_style = """
-                QLineEdit {
-                    background-color: #2D2D2D;
-                    color: white;
-                    border: 1px solid #505050;
-                    border-radius: 3px;
-                    padding: 3px;
-                }
-                QLineEdit:focus {
-                    border: 1px solid #3A6EA5;
-                }
-                QLineEdit::placeholder {
-                    color: #A0A0A0;
-                }
-            """
-            self.filter_port.setStyleSheet(lineedit_style)
-            self.filter_process.setStyleSheet(lineedit_style)
-            
-            # 为分组框添加特定的深色主题样式
-            groupbox_style = """
-                QGroupBox {
-                    border: 1px solid #505050;
-                    border-radius: 5px;
-                    margin-top: 10px;
-                    font-weight: bold;
-                    color: white;
-                }
-                QGroupBox::title {
-                    subcontrol-origin: margin;
-                    subcontrol-position: top center;
-                    padding: 0 5px;
-                    background-color: #3A3A3A;
-                }
-                QLabel {
-                    color: white;
-                }
-            """
-            filter_group = self.findChild(QGroupBox, "")
-            action_group = self.findChild(QGroupBox, "")
-            
-            # 应用样式到所有QGroupBox
+            # 深色样式表在第一次使用时才导入，默认的浅色主题不需要
+            import port_theme
+            self.table.setStyleSheet(port_theme.TABLE)
+            self.tree.setStyleSheet(port_theme.TREE)
+            for button in (self.refresh_btn, self.view_details_btn, self.kill_process_btn,
+                           self.force_kill_btn, self.filter_btn, self.live_btn):
+                button.setStyleSheet(port_theme.BUTTON)
+            for line_edit in (self.filter_port, self.filter_process, self.filter_remote):
+                line_edit.setStyleSheet(port_theme.LINEEDIT)
             for group_box in self.findChildren(QGroupBox):
-                group_box.setStyleSheet(groupbox_style)
-            
-            # 为菜单栏添加特定的深色主题样式
-            self.menuBar().setStyleSheet("""
-                QMenuBar {
-                    background-color: #3A3A3A;
-                    color: white;
-                    border-bottom: 1px solid #505050;
-                }
-                QMenuBar::item {
-                    background-color: transparent;
-                    padding: 4px 10px;
-                }
-                QMenuBar::item:selected {
-                    background-color: #505050;
-                    color: white;
-                }
-                QMenuBar::item:pressed {
-                    background-color: #3A6EA5;
-                    color: white;
-                }
-                QMenu {
-                    background-color: #3A3A3A;
-                    color: white;
-                    border: 1px solid #505050;
-                }
-                QMenu::item {
-                    padding: 5px 30px 5px 20px;
-                }
-                QMenu::item:selected {
-                    background-color: #3A6EA5;
-                    color: white;
-                }
-            """)
+                group_box.setStyleSheet(port_theme.GROUPBOX)
+            self.menuBar().setStyleSheet(port_theme.MENU_BAR)
+            self.styled = True
         else:
             # 浅色主题（默认）
             palette = app.style().standardPalette()
-            # 清除所有组件的样式表
-            self.table.setStyleSheet("")
-            self.menuBar().setStyleSheet("")
-            self.refresh_btn.setStyleSheet("")
-            self.view_details_btn.setStyleSheet("")
-            self.kill_process_btn.setStyleSheet("")
-            self.force_kill_btn.setStyleSheet("")
-            self.filter_btn.setStyleSheet("")
-            self.filter_port.setStyleSheet("")
-            self.filter_process.setStyleSheet("")
-            
-            # 清除所有QGroupBox的样式
-            for group_box in self.findChildren(QGroupBox):
-                group_box.setStyleSheet("")
+            if self.styled:
+                # 清除深色主题设置的样式表；启动时没有样式表，不必逐个清除
+                self.table.setStyleSheet("")
+                self.tree.setStyleSheet("")
+                self.menuBar().setStyleSheet("")
+                for widget in (self.refresh_btn, self.view_details_btn, self.kill_process_btn,
+                               self.force_kill_btn, self.filter_btn, self.live_btn,
+                               self.filter_port, self.filter_process, self.filter_remote):
+                    widget.setStyleSheet("")
+                for group_box in self.findChildren(QGroupBox):
+                    group_box.setStyleSheet("")
+                self.styled = False
         
         app.setPalette(palette)
     
     def show_about_dialog(self):
         """显示关于对话框"""
+        from port_dialogs import AboutDialog
         dialog = AboutDialog(self)
         dialog.exec_()
     
@@ -408,9 +919,22 @@ class PortMonitor(QMainWindow):
         filter_layout.addWidget(QLabel("进程:"), 1, 0)
         filter_layout.addWidget(self.filter_process, 1, 1)
         
+        self.filter_remote = QLineEdit()
+        self.filter_remote.setPlaceholderText("按远程地址或网段过滤，如 10.0.0.0/8")
+        filter_layout.addWidget(QLabel("远程:"), 2, 0)
+        filter_layout.addWidget(self.filter_remote, 2, 1)
+        
         self.filter_btn = QPushButton("应用过滤")
         self.filter_btn.clicked.connect(self.apply_filter)
-        filter_layout.addWidget(self.filter_btn, 2, 0, 1, 2)
+        filter_layout.addWidget(self.filter_btn, 3, 0, 1, 2)
+        
+        # 输入时延迟应用过滤，连续输入只触发一次
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(200)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        for line_edit in (self.filter_port, self.filter_process, self.filter_remote):
+            line_edit.textChanged.connect(self.filter_timer.start)
         
         filter_group.setLayout(filter_layout)
         control_layout.addWidget(filter_group)
@@ -441,150 +965,589 @@ class PortMonitor(QMainWindow):
         main_layout.addLayout(control_layout)
         
         # 创建表格
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["进程ID", "进程名", "本地地址", "远程地址", "状态"])
+        self.table_model = PortTableModel(self, show_host=self.remote is not None)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)  # 固定行高，避免逐行测量
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)  # 可按 Ctrl/Shift 多选
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)  # 设置自定义上下文菜单
         self.table.customContextMenuRequested.connect(self.show_context_menu)  # 连接右键菜单信号
+        # 点击表头排序，之前点击的列依次作为次要排序列；启动时不排序
+        header = self.table.horizontalHeader()
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+        header.setToolTip("点击表头排序，之前点击的列作为次要排序列")
+        self.table.setSortingEnabled(True)
+        header.sortIndicatorChanged.connect(self.on_sort_changed)
         main_layout.addWidget(self.table)
         
+        # 分组视图，在「视图 → 分组显示」中切换，与表格共用过滤条件和操作按钮
+        self.group_model = None
+        self.tree = QTreeView()
+        self.tree.setUniformRowHeights(True)  # 行高一致，滚动时不逐行测量
+        self.tree.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.tree.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.tree.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.tree.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.tree.customContextMenuRequested.connect(self.show_context_menu)
+        self.tree.hide()
+        main_layout.addWidget(self.tree)
+        
+        # 历史时间轴
+        timeline_layout = QHBoxLayout()
+        timeline_layout.addWidget(QLabel("历史:"))
+        self.timeline_slider = QSlider(Qt.Horizontal)
+        self.timeline_slider.setRange(0, 0)
+        self.timeline_slider.setTracking(False)  # 拖动结束后再加载快照
+        self.timeline_slider.sliderMoved.connect(self.update_timeline_label)
+        self.timeline_slider.valueChanged.connect(self.show_history)
+        timeline_layout.addWidget(self.timeline_slider)
+        self.timeline_label = QLabel("实时")
+        timeline_layout.addWidget(self.timeline_label)
+        self.live_btn = QPushButton("回到实时")
+        self.live_btn.clicked.connect(self.show_live)
+        timeline_layout.addWidget(self.live_btn)
+        main_layout.addLayout(timeline_layout)
+        
         # 状态栏
+        self.load_progress = QProgressBar()  # 首次加载的进度，采集期间为忙碌状态
+        self.load_progress.setMaximumWidth(160)
+        self.load_progress.setFormat("加载 %v/%m")
+        self.load_progress.hide()
+        self.statusBar().addPermanentWidget(self.load_progress)
+        self.kill_progress = QProgressBar()
+        self.kill_progress.setMaximumWidth(160)
+        self.kill_progress.hide()
+        self.statusBar().addPermanentWidget(self.kill_progress)
+        self.hosts_label = QLabel()
+        self.hosts_label.setVisible(self.remote is not None)
+        self.statusBar().addPermanentWidget(self.hosts_label)
+        self.alerts_label = QLabel("告警: 0")
+        self.alerts_label.setToolTip("暂无告警")
+        self.alerts_label.setVisible(self.rules is not None)
+        self.statusBar().addPermanentWidget(self.alerts_label)
+        self.tray = None  # 有系统托盘时用托盘通知显示告警
+        if self.rules is not None and QSystemTrayIcon.isSystemTrayAvailable():
+            self.tray = QSystemTrayIcon(self.style().standardIcon(QStyle.SP_MessageBoxWarning), self)
+            self.tray.setToolTip(self.windowTitle())
+            self.tray.show()
+        self.interval_label = QLabel()
+        self.statusBar().addPermanentWidget(self.interval_label)
         self.statusBar().showMessage("就绪")
         
     def refresh_data(self):
-        """刷新端口占用数据"""
+        """刷新端口占用数据（在后台线程中采集）"""
+        if self.collector_thread.isRunning():
+            # 上一次采集尚未完成，合并为完成后的一次刷新，避免请求堆积
+            self.refresh_pending = True
+            return
+        self.refresh_pending = False
+        self.timer.stop()  # 采集结束后会重新安排
+        self.profiler.begin_tick()
+        self.statusBar().showMessage("正在刷新数据...")
+        self.collector_thread.visible_pids = self.visible_pids()
+        self.collector_thread.sort_keys = self.table_model.key_cache if self.table_model.sort_spec else None
+        if self.pushdown:
+            self.collector_thread.pushdown = self.active_filter
+        self.collector_thread.start()
+    
+    def visible_pids(self):
+        """表格中当前可见行的PID，资源列优先采样这些进程"""
+        if self.collector_thread.sampler is None or self.group_model is not None:
+            return frozenset()
+        first = self.table.rowAt(0)
+        if first < 0:
+            return frozenset()
+        last = self.table.rowAt(self.table.viewport().height() - 1)
+        if last < 0:
+            last = self.table_model.rowCount() - 1
+        return frozenset(self.table_model.row_data(row)["pid"] for row in range(first, last + 1))
+    
+    def on_sort_changed(self, column, order):
+        """表头排序改变后更新排序说明；资源列不参与排序，恢复之前的排序指示"""
+        header = self.table.horizontalHeader()
+        if column >= self.table_model.base_columns:
+            primary = self.table_model.primary_sort_column()
+            header.blockSignals(True)
+            header.setSortIndicator(primary, Qt.DescendingOrder if self.table_model.sort_spec
+                                    and self.table_model.sort_spec[0][1] else Qt.AscendingOrder)
+            header.blockSignals(False)
+            return
+        description = self.table_model.sort_description()
+        header.setToolTip(f"排序: {description}" if description else "点击表头排序，之前点击的列作为次要排序列")
+    
+    def clear_sort(self):
+        """取消排序，表格保持当前顺序，之后新增的行追加到末尾"""
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+    
+    def set_resource_columns(self, enabled):
+        """显示或隐藏资源列，隐藏时不再采样"""
+        if enabled:
+            from port_resources import ResourceSampler
+            self.collector_thread.sampler = ResourceSampler()
+        else:
+            self.collector_thread.sampler = None
+        self.table_model.set_resource_columns(enabled)
+        if enabled:
+            self.refresh_data()
+    
+    def set_name_columns(self, enabled):
+        """显示或隐藏服务名和远程主机名列，主机名在后台解析，解析完成后定时补入表格"""
+        if enabled:
+            self.resolver = NameResolver().start()
+            self.table_model.set_name_columns(self.resolver)
+            self.names_timer.start()
+        else:
+            self.names_timer.stop()
+            self.table_model.set_name_columns(None)
+            self.resolver.stop()
+            self.resolver = None
+    
+    def set_group_mode(self, mode):
+        """切换分组视图，mode 为 None 时恢复平铺表格"""
+        self.cancel_first_load()
+        rows = self.view_index.query(self.active_filter)
+        if mode is None:
+            self.group_model = None
+            self.tree.setModel(None)
+            self.tree.hide()
+            self.table_model.update_rows(rows)
+            self.table.show()
+        else:
+            if self.group_model is None:
+                self.group_model = PortGroupModel(mode, self)
+                self.group_model.rebuild(rows)
+                self.tree.setModel(self.group_model)
+                self.tree.header().setSectionResizeMode(0, QHeaderView.Stretch)
+                self.tree.header().setStretchLastSection(False)
+            else:
+                self.group_model.rebuild(rows, mode)
+            self.table.hide()
+            self.tree.show()
+        self.statusBar().showMessage(f"显示 {self.shown_count()} 条记录")
+    
+    def show_rows(self, rows):
+        """以 rows 替换当前视图（表格或分组树）的内容"""
+        self.cancel_first_load()
+        if self.group_model is not None:
+            self.group_model.rebuild(rows)
+        else:
+            self.table_model.update_rows(rows)
+    
+    def shown_count(self):
+        """当前视图中的连接数"""
+        if self.group_model is not None:
+            return self.group_model.tree.root.total
+        return self.table_model.rowCount()
+    
+    def on_data_ready(self, port_data, delta, port_index):
+        """后台采集完成，把差异应用到表格"""
+        self.finish_first_load()  # 新的差异基于完整的上一次快照，先补完尚未插入的行
+        first_load = not self.port_data
+        self.port_data = port_data
+        self.port_index = port_index
+        self.last_delta = delta
+        if not first_load:
+            self.scheduler.record_churn(len(delta), len(port_data))
+        if self.remote is not None:
+            self.update_hosts_label()
+        self.update_timeline_range()
+        if self.history_seq is not None:
+            # 正在查看历史快照时不更新表格
+            self.statusBar().showMessage(f"正在查看历史快照，实时数据共 {len(self.port_data)} 条记录")
+            self.profiler.end_tick()
+            return
+        self.view_index = port_index
+        with self.profiler.phase("table"):
+            if first_load and len(delta.added) > self.FIRST_LOAD_CHUNK:
+                self.start_first_load(delta.added)
+            else:
+                self.apply_view_delta(delta, highlight=not first_load)
+        if self.waiting_for_remote():
+            self.profiler.end_tick()
+            self.statusBar().showMessage("正在连接远程主机...")
+            return
+        if not self.loading:
+            self.load_progress.hide()
+        self.profiler.end_tick()
+        pushed = "、".join(PUSHDOWN_NAMES[name] for name in self.collector_thread.pushed)
+        self.statusBar().showMessage(
+            f"数据刷新完成，共 {len(self.port_data)} 条记录（{delta.summary()}）"
+            + (f"，已在内核中按{pushed}过滤" if pushed else ""))
+    
+    def apply_view_delta(self, delta, highlight=True):
+        """把快照差异应用到当前视图（表格或分组树）"""
+        if self.group_model is not None:
+            self.group_model.apply_delta(delta, self.active_filter.matches)
+        else:
+            self.table_model.apply_delta(delta, self.active_filter.matches, highlight=highlight)
+    
+    def start_first_load(self, added):
+        """分块插入首个快照：先插入第一块，其余每次事件循环插入一块，期间窗口保持响应"""
+        size = self.FIRST_LOAD_CHUNK
+        self.loading.extend(added[i:i + size] for i in range(0, len(added), size))
+        self.load_progress.setRange(0, len(added))
+        self.load_progress.setValue(0)
+        self.load_next_chunk()
+    
+    def load_next_chunk(self):
+        if not self.loading:
+            return
+        chunk = self.loading.popleft()
+        self.apply_view_delta(SnapshotDelta(chunk), highlight=False)
+        if self.loading:
+            self.load_progress.setValue(self.load_progress.value() + len(chunk))
+            QTimer.singleShot(0, self.load_next_chunk)
+        else:
+            self.load_progress.hide()
+    
+    def finish_first_load(self):
+        """立即插入首次加载剩余的行"""
+        while self.loading:
+            self.apply_view_delta(SnapshotDelta(self.loading.popleft()), highlight=False)
+    
+    def cancel_first_load(self):
+        """视图将按完整快照重建，丢弃首次加载剩余的行"""
+        self.loading.clear()
+        if self.port_data:
+            self.load_progress.hide()
+    
+    def waiting_for_remote(self):
+        """汇总远程主机时尚未收到任何快照，且仍有主机未完成首次连接"""
+        return self.remote is not None and not self.port_data and not self.remote.ready()
+    
+    def update_hosts_label(self):
+        """在状态栏显示远程主机的在线情况，鼠标悬停显示每个主机的详情"""
+        status = self.remote.status()
+        online = sum(1 for host in status if host["connected"])
+        self.hosts_label.setText(f"主机在线: {online}/{len(status)}")
+        lines = []
+        for host in status:
+            if host["connected"]:
+                state = f"{host['rows']} 条连接" + ("（超过上限，已截断）" if host["truncated"] else "")
+            else:
+                state = f"离线: {host['error'] or '正在连接'}"
+            lines.append(f"{host['host']}  {state}")
+        self.hosts_label.setToolTip("\n".join(lines))
+    
+    def on_alerts(self, alerts):
+        """规则触发告警：更新状态栏计数，并通过托盘通知汇总显示"""
+        self.alerts.extend(alerts)
+        self.alert_count += len(alerts)
+        self.alerts_label.setText(f"告警: {self.alert_count}")
+        lines = [time.strftime("%H:%M:%S", time.localtime(alert.timestamp)) + "  " + alert.message
+                 + (f"（另有 {alert.suppressed} 条被限流）" if alert.suppressed else "")
+                 for alert in list(self.alerts)[-10:]]
+        self.alerts_label.setToolTip("最近的告警:\n" + "\n".join(lines))
+        if self.tray is not None:
+            message = "\n".join(alert.message for alert in alerts[:3])
+            if len(alerts) > 3:
+                message += f"\n……共 {len(alerts)} 条"
+            self.tray.showMessage("端口监控告警", message, QSystemTrayIcon.Warning)
+    
+    def on_refresh_error(self, message):
+        """后台采集出错"""
+        self.load_progress.hide()
+        QMessageBox.critical(self, "错误", f"刷新数据时出错: {message}")
+        self.statusBar().showMessage("刷新数据失败")
+    
+    def on_refresh_finished(self):
+        """采集线程结束，处理期间被合并的刷新请求，或安排下一次刷新"""
+        if self.refresh_pending:
+            self.refresh_data()
+        else:
+            self.schedule_refresh()
+    
+    def is_window_active(self):
+        """窗口是否可见且未最小化"""
+        return self.isVisible() and not self.isMinimized()
+    
+    def schedule_refresh(self):
+        """按自适应调度安排下一次刷新；回放时按录制的间隔（除以回放速度）刷新"""
+        if self.replay is not None:
+            delay = self.replay.next_delay()
+            if delay is None:
+                self.interval_label.setText("回放结束")
+                return
+            self.timer.start(int(delay * 1000))
+            self.interval_label.setText(
+                "回放: " + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.replay.timestamp)))
+            return
+        if self.waiting_for_remote():
+            # 首个远程快照到达前短间隔刷新，到达后立即显示，期间保持忙碌指示
+            self.timer.start(self.REMOTE_WAIT_MS)
+            return
+        interval = self.scheduler.next_interval(self.collector_thread.collector.last_duration,
+                                                self.is_window_active())
+        self.timer.start(int(interval * 1000))
+        self.interval_label.setText(f"刷新间隔: {interval:.1f} 秒")
+    
+    def changeEvent(self, event):
+        """窗口从最小化恢复时，若等待时间已被放宽则提前刷新"""
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            self.reschedule_if_active()
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.reschedule_if_active()
+    
+    def reschedule_if_active(self):
+        if self.replay is not None or not self.is_window_active() or not self.timer.isActive():
+            return
+        # 与正常调度相同，不早于上一次采集耗时决定的保护间隔
+        interval = self.scheduler.active_interval(self.collector_thread.collector.last_duration)
+        if self.timer.remainingTime() > interval * 1000:
+            self.timer.start(int(interval * 1000))
+            self.interval_label.setText(f"刷新间隔: {interval:.1f} 秒")
+    
+    def show_perf_dialog(self):
+        """显示性能统计对话框"""
+        from port_dialogs import PerfDialog
+        dialog = PerfDialog(self, self)
+        dialog.exec_()
+    
+    def show_event_query_dialog(self):
+        """查询保存的连接事件"""
+        from port_dialogs import EventQueryDialog
+        dialog = EventQueryDialog(self.store, self)
+        dialog.exec_()
+    
+    def show_seek_dialog(self):
+        """跳转到录制文件中的某一时刻"""
+        from port_capture import parse_position
+        reader = self.replay.reader
+        fmt = "%Y-%m-%d %H:%M:%S"
+        text, ok = QInputDialog.getText(
+            self, "跳转回放时刻",
+            f"录制时间 {time.strftime(fmt, time.localtime(reader.first_time))} 至 "
+            f"{time.strftime(fmt, time.localtime(reader.last_time))}\n"
+            "输入时刻（如 03:10、2024-05-01 03:10）或相对录制开始的偏移（如 +10m）:")
+        if not ok or not text.strip():
+            return
         try:
-            self.statusBar().showMessage("正在刷新数据...")
-            # 获取所有网络连接
-            connections = psutil.net_connections(kind='inet')
-            self.port_data = []
-            
-            for conn in connections:
-                if conn.laddr:  # 确保有本地地址
-                    pid = conn.pid
-                    if pid is None:
-                        continue
-                    
-                    try:
-                        process = psutil.Process(pid)
-                        process_name = process.name()
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        process_name = "未知进程"
-                    
-                    local_address = f"{conn.laddr.ip}:{conn.laddr.port}"
-                    remote_address = "N/A"
-                    if conn.raddr:
-                        remote_address = f"{conn.raddr.ip}:{conn.raddr.port}"
-                    
-                    status = conn.status if conn.status else "未知"
-                    
-                    self.port_data.append({
-                        "pid": pid,
-                        "name": process_name,
-                        "local_address": local_address,
-                        "remote_address": remote_address,
-                        "status": status
-                    })
-            
-            self.apply_filter()
-            self.statusBar().showMessage(f"数据刷新完成，共 {len(self.port_data)} 条记录")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"刷新数据时出错: {str(e)}")
-            self.statusBar().showMessage("刷新数据失败")
+            position = parse_position(text, reader.first_time)
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+        self.collector_thread.wait()  # 回放读取很快，等待本次读取结束后再跳转
+        self.replay.seek(position)
+        self.refresh_data()
+    
+    def show_interval_dialog(self):
+        """设置刷新间隔的下限和上限"""
+        from port_dialogs import RefreshIntervalDialog
+        dialog = RefreshIntervalDialog(self.scheduler.floor, self.scheduler.ceiling, self)
+        if dialog.exec_():
+            self.scheduler.set_bounds(*dialog.values())
+            if not self.collector_thread.isRunning():
+                self.schedule_refresh()
+    
+    def closeEvent(self, event):
+        """关闭窗口前停止定时器并等待采集线程结束"""
+        self.timer.stop()
+        self.refresh_pending = False
+        self.collector_thread.wait()
+        if self.remote is not None:
+            self.remote.stop()
+        if self.store is not None:
+            self.store.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.kill_thread is not None:
+            self.kill_thread.wait()
+        self.table_model.wait_sort()
+        if self.resolver is not None:
+            self.names_timer.stop()
+            self.resolver.stop()
+        if self.tray is not None:
+            self.tray.hide()
+        super().closeEvent(event)
     
     def apply_filter(self):
         """应用过滤条件并更新表格"""
-        port_filter = self.filter_port.text().strip()
-        process_filter = self.filter_process.text().strip().lower()
-        
-        filtered_data = self.port_data
-        
-        # 应用端口过滤
-        if port_filter:
-            filtered_data = [item for item in filtered_data 
-                            if port_filter in item["local_address"].split(":")[1]]
+        self.filter_timer.stop()
+        try:
+            self.active_filter = FilterSpec(self.filter_port.text(),
+                                            self.filter_process.text(),
+                                            self.filter_remote.text())
+        except FilterError as e:
+            self.statusBar().showMessage(f"过滤条件无效: {e}")
+            return
         
-        # 应用进程名过滤
-        if process_filter:
-            filtered_data = [item for item in filtered_data 
-                            if process_filter in item["name"].lower()]
+        with self.profiler.phase("filter_query"):
+            filtered_data = self.view_index.query(self.active_filter)
         
         # 更新表格
-        self.table.setRowCount(0)  # 清空表格
-        for row, item in enumerate(filtered_data):
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(str(item["pid"])))
-            self.table.setItem(row, 1, QTableWidgetItem(item["name"]))
-            self.table.setItem(row, 2, QTableWidgetItem(item["local_address"]))
-            self.table.setItem(row, 3, QTableWidgetItem(item["remote_address"]))
-            self.table.setItem(row, 4, QTableWidgetItem(item["status"]))
+        with self.profiler.phase("filter_table"):
+            self.show_rows(filtered_data)
         
-        self.statusBar().showMessage(f"显示 {self.table.rowCount()} 条记录")
+        self.statusBar().showMessage(f"显示 {self.shown_count()} 条记录")
+        if self.pushdown and self.history_seq is None:
+            # 之前的快照只包含满足旧条件的连接，按新条件重新采集
+            self.refresh_data()
+    
+    def update_timeline_range(self):
+        """根据保留的历史快照更新时间轴范围"""
+        first, last = self.history.first_seq, self.history.last_seq
+        if last is None:
+            return
+        self.timeline_slider.blockSignals(True)
+        self.timeline_slider.setRange(first, last)
+        if self.history_seq is None:
+            self.timeline_slider.setValue(last)
+        self.timeline_slider.blockSignals(False)
+        if self.history_seq is not None and self.history_seq < first:
+            # 正在查看的快照已被淘汰，改为显示最旧的快照
+            self.show_history(first)
+    
+    def update_timeline_label(self, seq):
+        """更新时间轴旁显示的快照时间"""
+        timestamp = self.history.timestamp(seq)
+        if seq == self.history.last_seq or timestamp is None:
+            self.timeline_label.setText("实时")
+        else:
+            self.timeline_label.setText(time.strftime("%H:%M:%S", time.localtime(timestamp)))
+    
+    def show_history(self, seq):
+        """在表格中显示指定的历史快照"""
+        if seq == self.history.last_seq:
+            self.show_live()
+            return
+        rows = self.history.rows(seq)
+        if rows is None:
+            return
+        self.history_seq = seq
+        self.view_index = SnapshotIndex(rows)
+        self.show_rows(self.view_index.query(self.active_filter))
+        self.update_timeline_label(seq)
+        self.statusBar().showMessage(f"历史快照 {self.timeline_label.text()}，显示 {self.shown_count()} 条记录")
+    
+    def show_live(self):
+        """回到实时数据"""
+        self.history_seq = None
+        self.view_index = self.port_index
+        self.show_rows(self.view_index.query(self.active_filter))
+        self.timeline_slider.blockSignals(True)
+        self.timeline_slider.setValue(self.timeline_slider.maximum())
+        self.timeline_slider.blockSignals(False)
+        self.timeline_label.setText("实时")
+        self.statusBar().showMessage(f"显示 {self.shown_count()} 条记录")
+    
+    def active_view(self):
+        return self.tree if self.group_model is not None else self.table
+    
+    def selected_rows(self):
+        """当前视图中选中的连接，选中分组时包含分组下的所有连接"""
+        indexes = self.active_view().selectionModel().selectedRows()
+        if self.group_model is None:
+            return [self.table_model.row_data(index.row()) for index in indexes]
+        rows = []
+        for index in indexes:
+            rows.extend(index.internalPointer().rows())
+        return rows
     
     def get_selected_pid(self):
         """获取当前选中行的进程ID"""
-        selected_rows = self.table.selectedItems()
+        selected_rows = self.selected_rows()
         if not selected_rows:
             QMessageBox.warning(self, "警告", "请先选择一个进程")
             return None
         
-        row = selected_rows[0].row()
-        pid_item = self.table.item(row, 0)
-        return int(pid_item.text())
+        row = selected_rows[0]
+        if row.get("host") is not None:
+            QMessageBox.warning(self, "警告", "无法操作远程主机上的进程")
+            return None
+        return row["pid"]
     
     def view_process_details(self):
         """查看进程详细信息"""
         pid = self.get_selected_pid()
         if pid is not None:
+            from port_dialogs import ProcessDetailDialog
             dialog = ProcessDetailDialog(pid, self)
             dialog.exec_()
     
+    def get_selected_processes(self):
+        """获取所有选中行涉及的进程，返回 {pid: 进程名}，按选中顺序去重"""
+        processes = {}
+        for row in self.selected_rows():
+            if row.get("host") is not None:
+                QMessageBox.warning(self, "警告", "无法操作远程主机上的进程")
+                return {}
+            processes.setdefault(row["pid"], row["name"])
+        if not processes:
+            QMessageBox.warning(self, "警告", "请先选择一个进程")
+        return processes
+
     def kill_process(self, force=False):
-        """关闭进程"""
-        pid = self.get_selected_pid()
-        if pid is None:
+        """关闭选中的所有进程，确认一次后在后台执行"""
+        if self.kill_thread is not None:
+            QMessageBox.information(self, "提示", "正在关闭进程，请等待完成")
             return
-        
-        try:
-            process = psutil.Process(pid)
-            process_name = process.name()
-            
-            msg = f"确定要{'强制' if force else ''}关闭进程 {process_name} (PID: {pid})？"
-            reply = QMessageBox.question(self, "确认", msg, 
-                                       QMessageBox.Yes | QMessageBox.No, 
-                                       QMessageBox.No)
-            
-            if reply == QMessageBox.Yes:
-                if force:
-                    process.kill()  # 强制终止
-                else:
-                    process.terminate()  # 正常终止
-                
-                QMessageBox.information(self, "成功", f"进程 {process_name} 已{'强制' if force else ''}关闭")
-                # 短暂延迟后刷新数据
-                QTimer.singleShot(1000, self.refresh_data)
-        
-        except psutil.NoSuchProcess:
-            QMessageBox.warning(self, "警告", "进程不存在或已终止")
-        except psutil.AccessDenied:
-            QMessageBox.warning(self, "警告", "权限不足，无法关闭该进程")
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"关闭进程时出错: {str(e)}")
-    
+        processes = self.get_selected_processes()
+        if not processes:
+            return
+
+        action = "强制关闭" if force else "关闭"
+        targets = [f"{name} (PID: {pid})" for pid, name in processes.items()]
+        box = QMessageBox(QMessageBox.Question, "确认", f"确定要{action}以下 {len(targets)} 个进程？",
+                          QMessageBox.Yes | QMessageBox.No, self)
+        box.setDefaultButton(QMessageBox.No)
+        shown = 10
+        box.setInformativeText("\n".join(targets[:shown]) +
+                               (f"\n……等 {len(targets)} 个" if len(targets) > shown else ""))
+        if len(targets) > shown:
+            box.setDetailedText("\n".join(targets))
+        if box.exec_() != QMessageBox.Yes:
+            return
+
+        self.kill_names = processes
+        self.kill_thread = ProcessKillThread(list(processes), force, self)
+        self.kill_thread.progress.connect(self.on_kill_progress)
+        self.kill_thread.results_ready.connect(self.on_kill_finished)
+        self.kill_thread.finished.connect(self.kill_thread.deleteLater)
+        self.kill_progress.setRange(0, len(processes))
+        self.kill_progress.setValue(0)
+        self.kill_progress.show()
+        self.statusBar().showMessage(f"正在{action} {len(processes)} 个进程...")
+        self.kill_thread.start()
+
+    def on_kill_progress(self, done, total):
+        self.kill_progress.setValue(done)
+
+    def on_kill_finished(self, results):
+        """批量关闭完成，汇总显示每个进程的结果"""
+        from port_actions import TERMINATED, KILLED
+        self.kill_thread = None
+        self.kill_progress.hide()
+        lines = [f"{self.kill_names.get(pid, '')} (PID: {pid}): {outcome}"
+                 for pid, outcome in results.items()]
+        failed = sum(1 for outcome in results.values() if outcome not in (TERMINATED, KILLED))
+        summary = f"共 {len(results)} 个进程，成功 {len(results) - failed} 个，失败 {failed} 个"
+        self.statusBar().showMessage(summary)
+        box = QMessageBox(QMessageBox.Warning if failed else QMessageBox.Information,
+                          "关闭进程", summary, QMessageBox.Ok, self)
+        box.setInformativeText("\n".join(lines[:20]) +
+                               (f"\n……等 {len(lines)} 个" if len(lines) > 20 else ""))
+        if len(lines) > 20:
+            box.setDetailedText("\n".join(lines))
+        box.open()  # 非模态显示，不阻塞刷新
+        self.refresh_data()
+
     def show_context_menu(self, position):
         """显示右键菜单"""
         # 获取当前选中行
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        view = self.active_view()
+        selected_rows = view.selectionModel().selectedRows()
+        if not selected_rows:
             # 如果没有选中行，则在点击位置选择行
-            item = self.table.itemAt(position)
-            if item:
-                self.table.setCurrentItem(item)
-                selected_items = self.table.selectedItems()
+            index = view.indexAt(position)
+            if index.isValid():
+                view.selectionModel().select(index, QItemSelectionModel.ClearAndSelect
+                                             | QItemSelectionModel.Rows)
             else:
                 return
         
@@ -593,11 +1556,13 @@ class PortMonitor(QMainWindow):
         
         # 添加菜单项
         view_details_action = context_menu.addAction("查看进程详情")
-        kill_process_action = context_menu.addAction("关闭进程")
-        force_kill_action = context_menu.addAction("强制关闭进程")
+        count = len({row["pid"] for row in self.selected_rows()})
+        suffix = f" ({count} 个)" if count > 1 else ""
+        kill_process_action = context_menu.addAction("关闭进程" + suffix)
+        force_kill_action = context_menu.addAction("强制关闭进程" + suffix)
         
         # 显示菜单并获取用户选择的操作
-        action = context_menu.exec_(self.table.mapToGlobal(position))
+        action = context_menu.exec_(view.viewport().mapToGlobal(position))
         
         # 处理用户选择的操作
         if action == view_details_action:
@@ -608,8 +1573,88 @@ class PortMonitor(QMainWindow):
             self.kill_process(True)
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = PortMonitor()
+    parser = argparse.ArgumentParser(description="Windows端口占用监控工具")
+    parser.add_argument("--metrics-port", type=int, help="在该端口提供 Prometheus /metrics 接口")
+    parser.add_argument("--metrics-host", default="127.0.0.1", help="指标接口监听地址，默认 127.0.0.1")
+    parser.add_argument("--connect", action="append", default=[], metavar="HOST:PORT",
+                        help="连接远程代理并在同一表格中汇总显示（可重复），此时不采集本机")
+    parser.add_argument("--store", metavar="PATH", help="把连接事件和定期快照记录到该 SQLite 文件")
+    parser.add_argument("--rules", metavar="PATH", help="监视规则文件（JSON），触发时在托盘和状态栏提示")
+    parser.add_argument("--pushdown", action="store_true",
+                        help="把端口和远程网段条件下推到内核（Linux netlink 后端），只采集满足条件的连接")
+    parser.add_argument("--record", metavar="PATH", help="把每次采集的结果追加录制到该文件，可用 --replay 回放")
+    parser.add_argument("--replay", metavar="PATH", help="回放录制文件代替采集，可在「文件」菜单中跳转时刻")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="回放速度倍数，默认 1（按录制时的节奏）；0 表示不等待，逐帧刷新")
+    parser.add_argument("--seek", metavar="TIME",
+                        help="从该时刻开始回放，如 +10m（录制开始后10分钟）、03:00、2024-05-01 03:00")
+    args, qt_args = parser.parse_known_args()
+    if args.pushdown and (args.metrics_port is not None or args.connect or args.store or args.rules):
+        parser.error("--pushdown 只采集满足条件的连接，不能与 --metrics-port、--connect、--store、--rules 同时使用")
+    if args.replay and (args.connect or args.pushdown):
+        parser.error("--replay 不能与 --connect、--pushdown 同时使用")
+    if args.speed < 0:
+        parser.error("--speed 不能为负数")
+    app = QApplication(sys.argv[:1] + qt_args)
+    
+    replay = None
+    if args.replay:
+        from port_capture import CaptureReader, ReplayCollector, parse_position
+        try:
+            reader = CaptureReader(args.replay)
+            start = parse_position(args.seek, reader.first_time or 0.0) if args.seek else None
+        except (OSError, ValueError) as e:  # 包括文件格式错误（CaptureError）和时刻格式错误
+            QMessageBox.critical(None, "错误", f"无法回放录制文件: {e}")
+            sys.exit(2)
+        replay = ReplayCollector(reader, args.speed, start)
+    
+    recorder = None
+    if args.record:
+        from port_capture import CaptureError, CaptureWriter
+        try:
+            recorder = CaptureWriter(args.record)
+        except (OSError, CaptureError) as e:
+            QMessageBox.critical(None, "错误", f"无法打开录制文件: {e}")
+            sys.exit(2)
+    
+    remote = None
+    if args.connect:
+        from port_remote import RemoteAggregator
+        try:
+            remote = RemoteAggregator(args.connect).start()
+        except ValueError as e:
+            QMessageBox.critical(None, "错误", str(e))
+            sys.exit(2)
+    
+    metrics = None
+    if args.metrics_port is not None:
+        from port_metrics import MetricsRegistry, MetricsServer
+        metrics = MetricsRegistry()
+        try:
+            MetricsServer(metrics, args.metrics_host, args.metrics_port).start()
+        except OSError as e:
+            QMessageBox.warning(None, "警告", f"无法启动指标接口: {e}")
+            metrics = None
+    
+    store = None
+    if args.store:
+        import sqlite3
+        from port_store import EventStore
+        try:
+            store = EventStore(args.store).start()
+        except sqlite3.Error as e:
+            QMessageBox.warning(None, "警告", f"无法打开事件存储: {e}")
+    
+    rules = None
+    if args.rules:
+        from port_rules import RuleEngine, RuleError
+        try:
+            rules = RuleEngine.from_file(args.rules)
+        except RuleError as e:
+            QMessageBox.critical(None, "错误", str(e))
+            sys.exit(2)
+    
+    window = PortMonitor(metrics, remote, store, rules, args.pushdown, recorder=recorder, replay=replay)
     window.apply_theme()  # 应用当前主题
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""服务名和远程主机名
+
+本模块不依赖Qt。本地端口的服务名从系统服务数据库（/etc/services 等）读取，
+远程主机名通过反向DNS解析：
+- 解析在固定数量的后台线程中进行，采集和界面线程只查缓存，不会等待网络
+- 缓存按最近使用淘汰（LRU），解析成功和失败的结果分别在 ttl、negative_ttl 秒后过期
+- 同一地址正在解析时不会重复提交，等待解析的地址超过 max_pending 时暂不提交，下次查询时再提交
+- lookup 可替换为 StubLookup 等任意函数，便于在没有DNS的环境中测试
+"""
+import queue
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+UNRESOLVABLE = {"", "*", "0.0.0.0", "::"}
+
+_services = {}  # (端口, 协议) -> 服务名，None 表示没有登记
+
+
+def service_name(port, proto="tcp"):
+    """本地端口在服务数据库中的名称，没有登记时返回 None"""
+    key = (port, proto)
+    try:
+        return _services[key]
+    except KeyError:
+        pass
+    try:
+        name = socket.getservbyport(port, proto)
+    except (OSError, OverflowError):
+        name = None
+    _services[key] = name
+    return name
+
+
+def row_service(row):
+    """连接本地端口的服务名"""
+    return service_name(row["laddr"][1], "udp" if row["type"] == socket.SOCK_DGRAM else "tcp")
+
+
+def reverse_lookup(ip):
+    """反向DNS解析，失败时抛出 OSError"""
+    return socket.gethostbyaddr(ip)[0]
+
+
+class StubLookup:
+    """按固定表应答的解析函数，用于测试和基准测试；不在表中的地址视为解析失败"""
+    def __init__(self, names, delay=0.0):
+        self.names = dict(names)
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, ip):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        try:
+            return self.names[ip]
+        except KeyError:
+            raise OSError(f"无法解析 {ip}") from None
+
+
+class NameResolver:
+    """带缓存的后台反向DNS解析"""
+    def __init__(self, lookup=reverse_lookup, workers=4, max_entries=16384, ttl=3600.0,
+                 negative_ttl=300.0, max_pending=256, clock=time.monotonic):
+        self.lookup = lookup
+        self.workers = workers
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_pending = max_pending
+        self.clock = clock
+        self._cache = OrderedDict()  # IP -> (主机名或 None, 过期时间)
+        self._pending = set()  # 已提交、尚未完成的地址
+        self._resolved = []  # 上次 take_resolved() 之后完成的地址
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)  # 没有等待解析的地址时通知
+        self._queue = queue.Queue()
+        self._threads = []
+        self._stopping = False
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"name-resolver-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        """通知后台线程退出；不等待正在进行的解析（反向DNS可能要数秒才超时）"""
+        self._stopping = True  # 队列中尚未开始的地址不再解析
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
+
+    def get(self, ip):
+        """IP 的主机名：未知或过期时提交解析并返回 None，解析失败时也返回 None"""
+        if ip in UNRESOLVABLE:
+            return None
+        # 命中缓存时不加锁：OrderedDict 的单个操作在 GIL 下是原子的，
+        # 与解析线程的淘汰并发时最多丢失一次 LRU 位置更新
+        entry = self._cache.get(ip)
+        if entry is not None and entry[1] > self.clock():
+            try:
+                self._cache.move_to_end(ip)
+            except KeyError:
+                pass
+            self.hits += 1
+            return entry[0]
+        with self._lock:
+            entry = self._cache.get(ip)
+            self.misses += 1
+            if ip not in self._pending and len(self._pending) < self.max_pending:
+                self._pending.add(ip)
+                self._queue.put(ip)
+            # 过期的结果在重新解析完成前继续使用
+            return entry[0] if entry is not None else None
+
+    def wait(self, timeout):
+        """等待已提交的解析全部完成，超时返回 False"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout)
+
+    def take_resolved(self):
+        """返回并清空上次调用之后解析完成的地址"""
+        with self._lock:
+            resolved, self._resolved = self._resolved, []
+        return resolved
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._cache), "pending": len(self._pending),
+                    "hits": self.hits, "misses": self.misses}
+
+    def _run(self):
+        while True:
+            ip = self._queue.get()
+            if ip is None or self._stopping:
+                return
+            try:
+                name = self.lookup(ip)
+                ttl = self.ttl
+            except (OSError, UnicodeError):
+                name = None
+                ttl = self.negative_ttl
+            with self._lock:
+                self._pending.discard(ip)
+                self._cache[ip] = (name, self.clock() + ttl)
+                self._cache.move_to_end(ip)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+                self._resolved.append(ip)
+                if not self._pending:
+                    self._idle.notify_all()
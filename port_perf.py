@@ -0,0 +1,154 @@
+"""热路径性能统计
+
+本模块不依赖Qt。刷新过程被划分为若干阶段（采集、补充进程信息、差异、索引、
+表格更新等），每个阶段的耗时记录在固定长度的滚动窗口中，按需计算分位数和
+直方图。未启用时 phase() 返回共享的空上下文管理器，几乎没有额外开销。
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("port_monitor.perf")
+
+# 直方图桶的上界（毫秒），最后一个桶收纳更慢的样本
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class _NullPhase:
+    """未启用统计时使用的空上下文管理器"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "started")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class PhaseStats:
+    """单个阶段最近若干次的耗时"""
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def summary(self):
+        """最近窗口内的统计（毫秒）"""
+        samples = sorted(self.samples)
+        if not samples:
+            return {"count": self.count}
+        n = len(samples)
+        histogram = [0] * (len(BUCKETS_MS) + 1)
+        for sample in samples:
+            ms = sample * 1000
+            for i, bound in enumerate(BUCKETS_MS):
+                if ms <= bound:
+                    histogram[i] += 1
+                    break
+            else:
+                histogram[-1] += 1
+        return {
+            "count": self.count,
+            "last_ms": self.samples[-1] * 1000,
+            "mean_ms": sum(samples) / n * 1000,
+            "p50_ms": samples[n // 2] * 1000,
+            "p95_ms": samples[min(n - 1, int(n * 0.95))] * 1000,
+            "max_ms": samples[-1] * 1000,
+            "histogram": histogram,
+        }
+
+
+class Profiler:
+    """按阶段记录耗时，可在多线程间共享"""
+    def __init__(self, enabled=False, window=256, slow_tick_ms=None):
+        self.enabled = enabled
+        self.window = window
+        self.slow_tick_ms = slow_tick_ms  # 设置后，整次刷新超过该耗时时写日志
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._tick = {}  # 当前这次刷新各阶段的耗时
+        self._tick_started = None
+
+    def phase(self, name):
+        """计时上下文管理器：with profiler.phase("collect"): ..."""
+        if not self.enabled:
+            return NULL_PHASE
+        return _Phase(self, name)
+
+    def record(self, name, seconds):
+        with self._lock:
+            stats = self._phases.get(name)
+            if stats is None:
+                stats = self._phases[name] = PhaseStats(self.window)
+            stats.add(seconds)
+            self._tick[name] = self._tick.get(name, 0.0) + seconds
+
+    def begin_tick(self):
+        """一次刷新开始"""
+        if self.enabled:
+            with self._lock:
+                self._tick = {}
+                self._tick_started = time.perf_counter()
+
+    def end_tick(self):
+        """一次刷新结束，记录总耗时，超过阈值时写日志"""
+        if not self.enabled or self._tick_started is None:
+            return
+        seconds = time.perf_counter() - self._tick_started
+        self._tick_started = None
+        self.record("tick", seconds)
+        if self.slow_tick_ms is not None and seconds * 1000 > self.slow_tick_ms:
+            with self._lock:
+                breakdown = ", ".join(f"{name}={value * 1000:.1f}ms"
+                                      for name, value in self._tick.items() if name != "tick")
+            logger.warning("刷新耗时 %.1fms 超过阈值 %sms: %s", seconds * 1000, self.slow_tick_ms, breakdown)
+
+    def last_tick(self):
+        """最近一次刷新各阶段的耗时（毫秒）"""
+        with self._lock:
+            return {name: value * 1000 for name, value in self._tick.items()}
+
+    def summary(self):
+        with self._lock:
+            return {name: stats.summary() for name, stats in self._phases.items()}
+
+    def reset(self):
+        with self._lock:
+            self._phases = {}
+            self._tick = {}
+
+    def to_json(self, extra=None):
+        """导出统计为JSON文本"""
+        data = {"timestamp": time.time(), "buckets_ms": list(BUCKETS_MS), "phases": self.summary()}
+        if extra:
+            data.update(extra)
+        return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+DISABLED = Profiler(enabled=False)
@@ -0,0 +1,199 @@
+"""Linux /proc/net 连接采集后端
+
+直接批量读取 /proc/net/{tcp,tcp6,udp,udp6}，并维护一个增量更新的
+inode → pid 映射：只扫描新出现进程的 fd 目录，遇到无法归属的新 socket
+时再按可能性从高到低扫描已知进程，找到归属后立即停止。
+输出与 psutil.net_connections(kind='inet') 一致。
+"""
+import os
+import socket
+import struct
+import sys
+
+import psutil
+
+TCP_STATUSES = {
+    "01": psutil.CONN_ESTABLISHED,
+    "02": psutil.CONN_SYN_SENT,
+    "03": psutil.CONN_SYN_RECV,
+    "04": psutil.CONN_FIN_WAIT1,
+    "05": psutil.CONN_FIN_WAIT2,
+    "06": psutil.CONN_TIME_WAIT,
+    "07": psutil.CONN_CLOSE,
+    "08": psutil.CONN_CLOSE_WAIT,
+    "09": psutil.CONN_LAST_ACK,
+    "0A": psutil.CONN_LISTEN,
+    "0B": psutil.CONN_CLOSING,
+}
+
+INET_TABLES = (
+    ("tcp", socket.AF_INET, socket.SOCK_STREAM),
+    ("tcp6", socket.AF_INET6, socket.SOCK_STREAM),
+    ("udp", socket.AF_INET, socket.SOCK_DGRAM),
+    ("udp6", socket.AF_INET6, socket.SOCK_DGRAM),
+)
+
+LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def is_supported(procfs_path="/proc"):
+    """当前系统是否可以使用本后端"""
+    return sys.platform.startswith("linux") and os.access(f"{procfs_path}/net/tcp", os.R_OK)
+
+
+class HexAddressDecoder:
+    """/proc/net 中十六进制地址的解码器，缓存已解码的IP"""
+    def __init__(self):
+        self._ips = {}
+
+    def decode_ip(self, hex_ip, family):
+        ip = self._ips.get(hex_ip)
+        if ip is None:
+            raw = bytes.fromhex(hex_ip)
+            if family == socket.AF_INET:
+                ip = socket.inet_ntop(family, raw[::-1] if LITTLE_ENDIAN else raw)
+            else:
+                if LITTLE_ENDIAN:
+                    raw = struct.pack(">4I", *struct.unpack("<4I", raw))
+                ip = socket.inet_ntop(family, raw)
+            self._ips[hex_ip] = ip
+        return ip
+
+    def decode(self, addr, family):
+        """把 "0100007F:0016" 解码为 ("127.0.0.1", 22)，端口为0时返回 None"""
+        hex_ip, _, hex_port = addr.partition(":")
+        port = int(hex_port, 16)
+        if not port:
+            return None
+        return (self.decode_ip(hex_ip, family), port)
+
+    def __len__(self):
+        return len(self._ips)
+
+    def clear(self):
+        self._ips.clear()
+
+
+class ProcNetBackend:
+    """读取 /proc/net 表的采集后端"""
+    name = "procfs"
+    MAX_ADDRESS_CACHE = 65536
+
+    def __init__(self, procfs_path="/proc"):
+        self.procfs_path = procfs_path
+        self.decoder = HexAddressDecoder()
+        self._pid_inodes = {}  # pid -> 该进程持有的 socket inode 集合（无权限时为空集合）
+        self._inode_pids = {}  # inode -> 持有该 socket 的 pid 集合
+        self._orphans = set()  # 扫描所有进程后仍无法归属的 inode
+        self.scanned_pids = 0  # 最近一次采集扫描的 fd 目录数量
+
+    def read_tables(self):
+        """读取所有 inet 表，返回 [(family, type, laddr, raddr, status, inode)]"""
+        entries = []
+        decode = self.decoder.decode
+        for table, family, type_ in INET_TABLES:
+            path = f"{self.procfs_path}/net/{table}"
+            try:
+                with open(path, "r") as f:
+                    lines = f.read().splitlines()[1:]
+            except FileNotFoundError:
+                if table.endswith("6"):  # 未启用IPv6
+                    continue
+                raise
+            stream = type_ == socket.SOCK_STREAM
+            for line in lines:
+                fields = line.split(None, 10)
+                if len(fields) < 10:
+                    continue
+                laddr = decode(fields[1], family)
+                if laddr is None:
+                    continue
+                raddr = decode(fields[2], family)
+                status = TCP_STATUSES.get(fields[3], psutil.CONN_NONE) if stream else psutil.CONN_NONE
+                entries.append((family, type_, laddr, raddr, status, fields[9]))
+        if len(self.decoder) > self.MAX_ADDRESS_CACHE:
+            self.decoder.clear()
+        return entries
+
+    def list_pids(self):
+        return [int(name) for name in os.listdir(self.procfs_path) if name.isdigit()]
+
+    def pids(self):
+        return self.list_pids()
+
+    def scan_pid(self, pid):
+        """扫描进程的 fd 目录，更新 inode 映射"""
+        self.scanned_pids += 1
+        inodes = set()
+        fd_dir = f"{self.procfs_path}/{pid}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            fds = ()
+        for fd in fds:
+            try:
+                target = os.readlink(f"{fd_dir}/{fd}")
+            except OSError:
+                continue
+            if target.startswith("socket:["):
+                inodes.add(target[8:-1])
+
+        for inode in self._pid_inodes.get(pid, ()):
+            if inode not in inodes:
+                self._discard(inode, pid)
+        for inode in inodes:
+            self._inode_pids.setdefault(inode, set()).add(pid)
+        self._pid_inodes[pid] = inodes
+
+    def _discard(self, inode, pid):
+        holders = self._inode_pids.get(inode)
+        if holders is not None:
+            holders.discard(pid)
+            if not holders:
+                del self._inode_pids[inode]
+
+    def forget_pid(self, pid):
+        for inode in self._pid_inodes.pop(pid, ()):
+            self._discard(inode, pid)
+
+    def update_inode_map(self, wanted):
+        """确保 wanted 中的 inode 都尽量有归属进程"""
+        self.scanned_pids = 0
+        live = set(self.list_pids())
+        for pid in [pid for pid in self._pid_inodes if pid not in live]:
+            self.forget_pid(pid)
+
+        # 已关闭的 socket 不再保留映射
+        for inode in [inode for inode in self._inode_pids if inode not in wanted]:
+            for pid in self._inode_pids.pop(inode):
+                self._pid_inodes[pid].discard(inode)
+
+        for pid in sorted(live.difference(self._pid_inodes)):
+            self.scan_pid(pid)
+
+        self._orphans.intersection_update(wanted)
+        unresolved = {inode for inode in wanted
+                      if inode not in self._inode_pids and inode not in self._orphans}
+        if not unresolved:
+            return
+
+        # 已经持有 socket 的进程最可能创建新的 socket，优先扫描
+        candidates = sorted(live, key=lambda pid: -len(self._pid_inodes.get(pid, ())))
+        for pid in candidates:
+            self.scan_pid(pid)
+            unresolved.difference_update(self._pid_inodes[pid])
+            if not unresolved:
+                break
+        self._orphans.update(unresolved)
+
+    def connections(self):
+        """返回 [(pid, family, type, laddr, raddr, status)]"""
+        entries = self.read_tables()
+        self.update_inode_map({entry[5] for entry in entries})
+        result = []
+        for family, type_, laddr, raddr, status, inode in entries:
+            holders = self._inode_pids.get(inode)
+            # 与 psutil 一致：多个进程共享同一 socket 时取 PID 最大者
+            pid = max(holders) if holders else None
+            result.append((pid, family, type_, laddr, raddr, status))
+        return result
@@ -0,0 +1,475 @@
+"""多主机远程采集
+
+本模块不依赖Qt。AgentServer 在无界面模式中运行，把每次采集与上一次的差异编码后
+推送给所有连接的客户端；RemoteAggregator 连接多个代理，按主机分别维护最新快照，
+合并为一张带 host 字段的连接表，接口与 PortCollector.collect() 相同。
+
+协议：每帧为 4 字节大端长度 + zlib 压缩的 JSON 对象，字段 t 表示类型。
+- 代理在连接建立后发送 hello，随后发送完整快照 snap，此后每次采集发送一帧 delta
+- delta 的 seq 必须紧接上一帧，否则客户端发送 resync，代理回复完整快照
+- 客户端积压的帧超过 queue_size 时，代理丢弃积压的差异，改为发送一次完整快照
+- 长时间没有数据时代理发送 ping，客户端据此判断连接是否存活
+"""
+import asyncio
+import json
+import socket
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+
+from port_collector import make_row
+from port_diff import connection_key
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 9500
+HEADER = struct.Struct("!I")
+MAX_FRAME = 32 * 1024 * 1024  # 单帧压缩后的上限（字节）
+MAX_PAYLOAD = 256 * 1024 * 1024  # 单帧解压后的上限（字节）
+COMPRESS_LEVEL = 1  # 快照高度重复，低压缩级别已足够，且代理的CPU开销小
+KEEPALIVE = 15.0  # 代理在没有数据时发送 ping 的间隔（秒）
+
+
+class ProtocolError(ValueError):
+    """收到无法解析或不符合协议的帧"""
+
+
+def parse_address(text, default_port=DEFAULT_PORT):
+    """解析 host、host:port 或 [IPv6]:port"""
+    text = text.strip()
+    if text.startswith("["):
+        host, sep, rest = text[1:].partition("]")
+        if not sep:
+            raise ValueError(f"地址格式无效: {text}")
+        port = rest[1:] if rest.startswith(":") else ""
+    elif text.count(":") == 1:
+        host, port = text.split(":")
+    else:
+        host, port = text, ""
+    if not host:
+        raise ValueError(f"地址格式无效: {text}")
+    try:
+        port = int(port) if port else default_port
+    except ValueError:
+        raise ValueError(f"端口无效: {text}") from None
+    if not 0 < port < 65536:
+        raise ValueError(f"端口无效: {text}")
+    return host, port
+
+
+def encode_row(row):
+    """把一行数据编码为紧凑的列表"""
+    laddr, raddr = row["laddr"], row["raddr"]
+    return [row["pid"], row["name"], row["family"], row["type"], laddr[0], laddr[1],
+            raddr[0] if raddr else None, raddr[1] if raddr else None, row["status"]]
+
+
+def decode_items(items, host):
+    """把 [[序号, 编码行], ...] 还原为 [(键, 行), ...]"""
+    result = []
+    for n, (pid, name, family, type_, lip, lport, rip, rport, status) in items:
+        row = make_row(pid, name, family, type_, (lip, lport),
+                       (rip, rport) if rip is not None else None, status)
+        row["host"] = host
+        result.append(((connection_key(row), n), row))
+    return result
+
+
+def encode_frame(message):
+    payload = zlib.compress(json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+                            .encode("utf-8"), COMPRESS_LEVEL)
+    return HEADER.pack(len(payload)) + payload
+
+
+async def read_frame(reader):
+    """读取并解码一帧，超过大小上限或格式错误时抛出 ProtocolError"""
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_FRAME:
+        raise ProtocolError(f"帧过大: {length} 字节")
+    payload = await reader.readexactly(length)
+    decompressor = zlib.decompressobj()
+    try:
+        data = decompressor.decompress(payload, MAX_PAYLOAD)
+    except zlib.error as e:
+        raise ProtocolError(f"解压失败: {e}") from None
+    if decompressor.unconsumed_tail:
+        raise ProtocolError("帧解压后过大")
+    try:
+        message = json.loads(data)
+    except ValueError as e:
+        raise ProtocolError(f"JSON 无效: {e}") from None
+    if not isinstance(message, dict):
+        raise ProtocolError("帧格式无效")
+    return message
+
+
+def cancel_tasks(loop):
+    """事件循环停止后取消并等待其中剩余的任务"""
+    tasks = asyncio.all_tasks(loop)
+    for task in tasks:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+
+def snapshot_message(seq, rows, timestamp):
+    index = {}
+    items = []
+    for row in rows:
+        key = connection_key(row)
+        n = index.get(key, 0)
+        index[key] = n + 1
+        items.append([n, encode_row(row)])
+    return {"t": "snap", "seq": seq, "ts": timestamp, "rows": items}
+
+
+def delta_message(seq, delta, timestamp):
+    return {
+        "t": "delta", "seq": seq, "ts": timestamp,
+        "add": [[key[1], encode_row(row)] for key, row in delta.added],
+        "del": [[key[1], encode_row(row)] for key, row in delta.removed],
+        "chg": [[key[1], encode_row(new)] for key, _, new in delta.changed],
+    }
+
+
+class _Client:
+    """代理端的一个客户端连接：待发送的差异帧和是否需要完整快照"""
+    __slots__ = ("writer", "pending", "wakeup", "resync")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = deque()
+        self.wakeup = asyncio.Event()
+        self.resync = True  # 新连接先发送完整快照
+
+
+class AgentServer:
+    """向远程客户端推送采集结果的 TCP 服务，运行在独立线程的 asyncio 事件循环中"""
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, queue_size=8):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._started = threading.Event()
+        self._error = None
+        self._clients = set()
+        self._next_seq = 0  # 由采集线程分配
+        self._seq = 0  # 事件循环中已发布的最新序号
+        self._rows = []
+        self._timestamp = None
+        self._snapshot = None  # (序号, 编码完整快照的 future)
+
+    def start(self):
+        """启动服务，端口被占用等错误会在此抛出"""
+        self._thread = threading.Thread(target=self._run, name="agent-server", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    @property
+    def client_count(self):
+        return len(self._clients)
+
+    def publish(self, rows, delta, timestamp=None):
+        """发布一次采集结果及其与上一次的差异（在采集线程中调用）
+
+        差异帧在调用线程中编码，事件循环只负责分发。
+        """
+        loop = self._loop
+        if loop is None:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        self._next_seq += 1
+        seq = self._next_seq
+        frame = encode_frame(delta_message(seq, delta, timestamp))
+        loop.call_soon_threadsafe(self._broadcast, seq, rows, timestamp, frame)
+
+    def _broadcast(self, seq, rows, timestamp, frame):
+        self._seq = seq
+        self._rows = rows
+        self._timestamp = timestamp
+        for client in self._clients:
+            if not client.resync:
+                client.pending.append(frame)
+                if len(client.pending) > self.queue_size:
+                    # 客户端跟不上：丢弃积压的差异，之后发送一次完整快照
+                    client.pending.clear()
+                    client.resync = True
+            client.wakeup.set()
+
+    async def _snapshot_frame(self):
+        """当前最新快照的完整帧，同一序号只编码一次"""
+        seq, rows, timestamp = self._seq, self._rows, self._timestamp
+        if self._snapshot is None or self._snapshot[0] != seq:
+            future = self._loop.run_in_executor(
+                None, lambda: encode_frame(snapshot_message(seq, rows, timestamp)))
+            self._snapshot = (seq, future)
+        return await asyncio.shield(self._snapshot[1])
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            self._server = loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self._error = e
+            self._started.set()
+            loop.close()
+            return
+        self._loop = loop
+        self._started.set()
+        try:
+            loop.run_forever()
+        finally:
+            self._server.close()
+            cancel_tasks(loop)
+            loop.run_until_complete(self._server.wait_closed())
+            loop.close()
+
+    async def _handle(self, reader, writer):
+        client = _Client(writer)
+        self._clients.add(client)
+        tasks = [asyncio.ensure_future(self._send(client)),
+                 asyncio.ensure_future(self._receive(reader, client))]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            for task in done:
+                task.exception()  # 连接断开等异常在此取走，不再报告
+        except asyncio.CancelledError:
+            # 服务停止
+            for task in tasks:
+                task.cancel()
+        finally:
+            self._clients.discard(client)
+            writer.close()
+
+    async def _send(self, client):
+        writer = client.writer
+        try:
+            writer.write(encode_frame({"t": "hello", "v": PROTOCOL_VERSION,
+                                       "host": socket.gethostname()}))
+            while True:
+                if client.resync and self._seq:
+                    client.resync = False
+                    client.pending.clear()
+                    frame = await self._snapshot_frame()
+                elif client.pending and not client.resync:
+                    frame = client.pending.popleft()
+                else:
+                    client.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(client.wakeup.wait(), KEEPALIVE)
+                    except asyncio.TimeoutError:
+                        writer.write(encode_frame({"t": "ping"}))
+                        await writer.drain()
+                    continue
+                writer.write(frame)
+                await writer.drain()  # 客户端接收缓慢时在此等待，期间积压的帧受 queue_size 限制
+        except ConnectionError:
+            pass
+
+    async def _receive(self, reader, client):
+        try:
+            while True:
+                message = await read_frame(reader)
+                if message.get("t") == "resync":
+                    client.resync = True
+                    client.wakeup.set()
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            pass
+
+
+class HostState:
+    """一个远程主机的连接状态和最新快照"""
+    def __init__(self, label, host, port):
+        self.label = label
+        self.host = host
+        self.port = port
+        self.index = {}  # (连接标识, 序号) -> 行
+        self.seq = None  # 最近应用的帧序号，None 表示等待完整快照
+        self.connected = False
+        self.truncated = False  # 行数超过上限，部分连接未保存
+        self.error = None
+        self.updated = None  # 最近一次收到快照或差异的时间
+
+
+class RemoteAggregator:
+    """连接多个代理并合并它们的最新快照
+
+    每个主机最多保存 max_rows 行；连接断开后清空该主机的数据，
+    按指数退避重连，重连后由代理发送的完整快照重新同步。
+    """
+    name = "remote"
+    process_cache = None
+
+    def __init__(self, addresses, max_rows=200_000, timeout=60.0, retry=(1.0, 30.0)):
+        self.hosts = [HostState(text, *parse_address(text)) for text in addresses]
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.retry = retry
+        self.last_duration = 0.0
+        self._lock = threading.Lock()
+        self._attempted = set()  # 已完成首次连接尝试的主机
+        self._ready = threading.Condition(self._lock)
+        self._loop = None
+        self._thread = None
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="remote-aggregator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def wait_ready(self, timeout=5.0):
+        """等待每个主机完成首次连接（收到完整快照或连接失败），最多等待 timeout 秒"""
+        deadline = time.monotonic() + timeout
+        with self._ready:
+            while len(self._attempted) < len(self.hosts):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._ready.wait(remaining)
+        return True
+
+    def ready(self):
+        """每个主机是否都已完成首次连接（不等待）"""
+        with self._lock:
+            return len(self._attempted) == len(self.hosts)
+
+    def collect(self):
+        """合并所有主机的最新快照"""
+        started = time.perf_counter()
+        rows = []
+        with self._lock:
+            for state in self.hosts:
+                rows.extend(state.index.values())
+        self.last_duration = time.perf_counter() - started
+        return rows
+
+    def status(self):
+        """各主机的连接状态"""
+        with self._lock:
+            return [{"host": state.label, "connected": state.connected, "rows": len(state.index),
+                     "truncated": state.truncated, "error": state.error, "updated": state.updated}
+                    for state in self.hosts]
+
+    def connected_count(self):
+        with self._lock:
+            return sum(1 for state in self.hosts if state.connected)
+
+    def _run(self):
+        loop = self._loop
+        asyncio.set_event_loop(loop)
+        for state in self.hosts:
+            loop.create_task(self._follow(state))
+        try:
+            loop.run_forever()
+        finally:
+            cancel_tasks(loop)
+            loop.close()
+
+    def _mark_attempted(self, state):
+        with self._ready:
+            if state.label not in self._attempted:
+                self._attempted.add(state.label)
+                self._ready.notify_all()
+
+    async def _follow(self, state):
+        """保持与一个代理的连接，断开后按指数退避重连"""
+        delay = self.retry[0]
+        while True:
+            writer = None
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(state.host, state.port), self.timeout)
+                await self._receive(state, reader, writer)
+            except (OSError, EOFError, asyncio.TimeoutError, ValueError, KeyError, TypeError) as e:
+                error = str(e) or type(e).__name__
+            else:
+                error = None
+            if writer is not None:
+                writer.close()
+            with self._lock:
+                synced = state.updated is not None
+                state.connected = False
+                state.index = {}
+                state.seq = None
+                state.error = error
+                state.updated = None
+            self._mark_attempted(state)
+            if synced:
+                delay = self.retry[0]  # 成功同步过，从最短间隔开始重连
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.retry[1])
+
+    async def _receive(self, state, reader, writer):
+        while True:
+            message = await asyncio.wait_for(read_frame(reader), self.timeout)
+            kind = message.get("t")
+            if kind == "hello":
+                if message.get("v") != PROTOCOL_VERSION:
+                    raise ProtocolError(f"协议版本不兼容: {message.get('v')}")
+                with self._lock:
+                    state.connected = True
+                    state.error = None
+            elif kind == "snap":
+                self._apply_snapshot(state, message)
+                self._mark_attempted(state)
+            elif kind == "delta" and state.seq is not None:
+                if message["seq"] != state.seq + 1:
+                    # 丢失了中间的帧，请求完整快照重新同步
+                    state.seq = None
+                    writer.write(encode_frame({"t": "resync"}))
+                    await writer.drain()
+                    continue
+                self._apply_delta(state, message)
+
+    def _apply_snapshot(self, state, message):
+        items = decode_items(message["rows"], state.label)
+        truncated = len(items) > self.max_rows
+        index = dict(items[:self.max_rows])
+        with self._lock:
+            state.index = index
+            state.seq = message["seq"]
+            state.truncated = truncated
+            state.updated = time.time()
+
+    def _apply_delta(self, state, message):
+        host = state.label
+        removed = [key for key, _ in decode_items(message["del"], host)]
+        changed = decode_items(message["chg"], host)
+        added = decode_items(message["add"], host)
+        with self._lock:
+            index = state.index
+            for key in removed:
+                index.pop(key, None)
+            for key, row in changed:
+                if key in index:  # 超过行数上限而未保存的连接不会出现在这里
+                    index[key] = row
+            room = self.max_rows - len(index)
+            if len(added) > room:
+                state.truncated = True
+                added = added[:max(room, 0)]
+            index.update(added)
+            state.seq = message["seq"]
+            state.updated = time.time()
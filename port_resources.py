@@ -0,0 +1,97 @@
+"""进程资源占用采样
+
+本模块不依赖Qt。每次刷新对快照中出现的每个PID最多采样一次 CPU 时间、RSS、
+线程数和句柄数（Windows 为句柄，其他系统为文件描述符）：
+- 表格中可见行的进程每次都采样，其余进程按上次采样的先后轮流采样，每次最多 budget 个
+- 需要采样的进程占系统进程的大部分时，用一次 process_iter(attrs=...) 批量读取，
+  否则逐个在 oneshot() 中读取
+- CPU% 由本次与上次采样之间的 CPU 时间差除以经过的时间得到，不需要额外等待
+"""
+import time
+
+import psutil
+
+FD_ATTR = "num_handles" if psutil.WINDOWS else "num_fds"
+ATTRS = ["create_time", "cpu_times", "memory_info", "num_threads", FD_ATTR]
+
+
+class ResourceSample:
+    """一个进程最近一次采样的结果，无法获取的项为 None"""
+    __slots__ = ("create_time", "cpu_time", "sampled", "cpu_percent", "rss", "threads", "fds")
+
+    def __init__(self, create_time, cpu_time, sampled, cpu_percent, rss, threads, fds):
+        self.create_time = create_time
+        self.cpu_time = cpu_time
+        self.sampled = sampled
+        self.cpu_percent = cpu_percent
+        self.rss = rss
+        self.threads = threads
+        self.fds = fds
+
+
+class ResourceSampler:
+    """按PID采样进程资源，保存上一次的采样用于计算 CPU%"""
+    BATCH_RATIO = 0.5  # 需要采样的进程达到系统进程数的该比例时改用 process_iter 批量读取
+
+    def __init__(self, budget=64, process_factory=psutil.Process):
+        self.budget = budget  # 每次最多采样的不可见进程数
+        self.process_factory = process_factory
+        self._samples = {}  # pid -> ResourceSample
+        self._processes = {}  # pid -> psutil.Process，复用以保留 oneshot 之外的缓存
+
+    def update(self, pids, visible=()):
+        """采样本次需要的进程，返回 {pid: ResourceSample} 的副本"""
+        wanted = set(pids)
+        for cache in (self._samples, self._processes):
+            for pid in [pid for pid in cache if pid not in wanted]:
+                del cache[pid]
+
+        visible = wanted.intersection(visible)
+        # 从未采样过的进程排在最前，其余按上次采样时间先后
+        rest = sorted((pid for pid in wanted if pid not in visible),
+                      key=lambda pid: self._samples[pid].sampled if pid in self._samples else 0.0)
+        due = visible.union(rest[:self.budget])
+        if not due:
+            return dict(self._samples)
+
+        now = time.monotonic()
+        if len(due) >= self.BATCH_RATIO * len(psutil.pids()):
+            self._sample_all(due, now)
+        else:
+            for pid in due:
+                self._sample_one(pid, now)
+        return dict(self._samples)
+
+    def _sample_one(self, pid, now):
+        process = self._processes.get(pid)
+        try:
+            if process is None:
+                process = self._processes[pid] = self.process_factory(pid)
+            with process.oneshot():
+                info = process.as_dict(ATTRS, ad_value=None)
+        except psutil.NoSuchProcess:
+            self._samples.pop(pid, None)
+            self._processes.pop(pid, None)
+            return
+        self._record(pid, info, now)
+
+    def _sample_all(self, due, now):
+        for process in psutil.process_iter(ATTRS, ad_value=None):
+            if process.pid in due:
+                self._processes[process.pid] = process
+                self._record(process.pid, process.info, now)
+
+    def _record(self, pid, info, now):
+        create_time = info["create_time"]
+        cpu_times = info["cpu_times"]
+        cpu_time = cpu_times.user + cpu_times.system if cpu_times is not None else None
+        memory = info["memory_info"]
+        previous = self._samples.get(pid)
+        cpu_percent = None
+        if (previous is not None and previous.create_time == create_time
+                and previous.cpu_time is not None and cpu_time is not None
+                and now > previous.sampled):
+            cpu_percent = max(0.0, (cpu_time - previous.cpu_time) / (now - previous.sampled) * 100)
+        self._samples[pid] = ResourceSample(create_time, cpu_time, now, cpu_percent,
+                                            memory.rss if memory is not None else None,
+                                            info["num_threads"], info[FD_ATTR])
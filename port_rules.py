@@ -0,0 +1,315 @@
+"""监视规则引擎
+
+本模块不依赖Qt。规则文件（JSON）中的每条规则在加载时编译为匹配函数，之后每次
+刷新只对快照差异中的连接求值，不再扫描完整快照：
+- 事件规则：连接开始满足条件（新增，或状态变化后才满足）时触发；on 为 "leave" 时
+  在连接不再满足条件（关闭或状态变化）时触发
+- 计数规则：按 group 分组统计满足条件的连接数，随差异增减，超过 above 时触发一次，
+  回落到 above 以下后才会再次触发
+
+同一规则对同一对象（连接或分组）在 dedup 秒内只触发一次，每条规则每分钟最多
+触发 rate 次，超出的告警被抑制并计入下一条告警。
+
+规则文件示例:
+    {"rules": [
+        {"name": "新的全地址监听", "match": {"status": "LISTEN", "local": ["0.0.0.0", "::/128"]},
+         "initial": false},
+        {"name": "8080 被非 java 进程占用",
+         "match": {"port": "8080", "status": "LISTEN", "process_not": "java"}},
+        {"name": "TIME_WAIT 过多", "match": {"status": "TIME_WAIT"}, "group": "process", "above": 5000}
+    ]}
+"""
+import json
+import logging
+import time
+from collections import deque
+
+from port_collector import protocol_name
+from port_filter import AddressFilter, FilterError
+
+logger = logging.getLogger("port_monitor.rules")
+
+MATCH_KEYS = ("port", "process", "process_not", "local", "remote", "status", "proto", "host")
+GROUPS = {
+    "process": lambda row: (row.get("host"), row["name"], row["pid"]),
+    "pid": lambda row: (row.get("host"), row["pid"]),
+    "name": lambda row: (row.get("host"), row["name"]),
+    "port": lambda row: (row.get("host"), row["laddr"][1]),
+    "host": lambda row: (row.get("host"),),
+    "all": lambda row: (),
+}
+RATE_WINDOW = 60.0
+
+
+class RuleError(ValueError):
+    """规则文件格式错误"""
+
+
+def _values(value):
+    """规则中的条件值可以是单个字符串（逗号分隔）或列表"""
+    if isinstance(value, (list, tuple)):
+        parts = value
+    else:
+        parts = str(value).replace("，", ",").split(",")
+    return [str(part).strip() for part in parts if str(part).strip()]
+
+
+def _port_ranges(value):
+    ranges = []
+    for part in _values(value):
+        low, sep, high = part.partition("-")
+        try:
+            low = int(low)
+            high = int(high) if sep else low
+        except ValueError:
+            raise RuleError(f"无效的端口: {part}") from None
+        ranges.append((min(low, high), max(low, high)))
+    return ranges
+
+
+def compile_match(match):
+    """把条件字典编译为匹配函数，各条件之间为「与」，同一条件的多个值之间为「或」"""
+    unknown = set(match) - set(MATCH_KEYS)
+    if unknown:
+        raise RuleError(f"未知的条件: {', '.join(sorted(unknown))}")
+    checks = []
+    # 先检查开销小、区分度高的条件
+    if "status" in match:
+        states = {value.upper() for value in _values(match["status"])}
+        checks.append(lambda row: row["status"].upper() in states)
+    if "port" in match:
+        ranges = _port_ranges(match["port"])
+        checks.append(lambda row: any(low <= row["laddr"][1] <= high for low, high in ranges))
+    if "proto" in match:
+        protos = {value.lower() for value in _values(match["proto"])}
+        checks.append(lambda row: protocol_name(row) in protos)
+    if "host" in match:
+        hosts = set(_values(match["host"]))
+        checks.append(lambda row: row.get("host") in hosts)
+    for key, negate in (("process", False), ("process_not", True)):
+        if key in match:
+            names = [value.lower() for value in _values(match[key])]
+            pids = {int(value) for value in names if value.isdigit()}
+
+            def check(row, names=names, pids=pids, negate=negate):
+                name = row["name"].lower()
+                found = row["pid"] in pids or any(value in name for value in names)
+                return found != negate
+            checks.append(check)
+    for key, field in (("local", "laddr"), ("remote", "raddr")):
+        if key in match:
+            try:
+                filters = [AddressFilter(value) for value in _values(match[key])]
+            except FilterError as e:
+                raise RuleError(str(e)) from None
+
+            def check(row, filters=filters, field=field):
+                address = row[field]
+                return address is not None and any(f.matches_ip(address[0]) for f in filters)
+            checks.append(check)
+
+    if not checks:
+        return lambda row: True
+    if len(checks) == 1:
+        return checks[0]
+    return lambda row: all(check(row) for check in checks)
+
+
+def row_fields(row):
+    """告警消息模板中可用的字段"""
+    return {
+        "host": row.get("host") or "",
+        "pid": row["pid"],
+        "name": row["name"],
+        "proto": protocol_name(row),
+        "port": row["laddr"][1],
+        "local": row["local_address"],
+        "remote": row["remote_address"],
+        "status": row["status"],
+    }
+
+
+class Rule:
+    """编译后的一条规则"""
+    def __init__(self, spec):
+        if not isinstance(spec, dict) or not spec.get("name"):
+            raise RuleError("每条规则都必须有 name")
+        self.name = str(spec["name"])
+        try:
+            self.matches = compile_match(spec.get("match") or {})
+            self.on = spec.get("on", "enter")
+            if self.on not in ("enter", "leave"):
+                raise RuleError(f"on 只能为 enter 或 leave: {self.on}")
+            self.group = spec.get("group")
+            self.above = spec.get("above")
+            if (self.group is None) != (self.above is None):
+                raise RuleError("计数规则需要同时设置 group 和 above")
+            if self.group is not None and self.group not in GROUPS:
+                raise RuleError(f"未知的分组: {self.group}，可选 {', '.join(GROUPS)}")
+            if self.above is not None and not isinstance(self.above, int):
+                raise RuleError("above 必须为整数")
+            self.group_key = GROUPS[self.group] if self.group is not None else None
+            self.initial = bool(spec.get("initial", True))  # 是否对启动时已存在的连接触发
+            self.dedup = float(spec.get("dedup", 300))
+            self.rate = int(spec.get("rate", 10))
+            self.message = spec.get("message")
+        except RuleError as e:
+            raise RuleError(f"规则「{self.name}」: {e}") from None
+        except (TypeError, ValueError) as e:
+            raise RuleError(f"规则「{self.name}」: {e}") from None
+        self.counts = {}  # 计数规则：分组 -> 满足条件的连接数
+        self.fired_groups = set()  # 计数规则：已超过阈值、等待回落的分组
+        self.last_fired = {}  # 对象 -> 最近一次触发时间，用于去重
+        self.recent = deque()  # 最近一分钟内的触发时间，用于限流
+        self.suppressed = 0
+
+    @property
+    def is_count(self):
+        return self.group_key is not None
+
+    def format(self, row, count=None):
+        fields = row_fields(row)
+        fields.update(rule=self.name, count=count, above=self.above)
+        if self.message:
+            try:
+                return self.message.format(**fields)
+            except (KeyError, IndexError, ValueError):
+                pass
+        host = f"[{fields['host']}] " if fields["host"] else ""
+        if count is not None:
+            target = {"port": f"端口 {fields['port']}", "host": "主机", "all": "全部"}.get(
+                self.group, f"{fields['name']}(PID {fields['pid']})")
+            return f"{self.name}: {host}{target} 的匹配连接数 {count} 超过 {self.above}"
+        return (f"{self.name}: {host}{fields['name']}(PID {fields['pid']}) {fields['proto']} "
+                f"{fields['local']} -> {fields['remote']} {fields['status']}")
+
+
+class Alert:
+    """一次规则触发"""
+    __slots__ = ("rule", "message", "timestamp", "row", "count", "suppressed")
+
+    def __init__(self, rule, message, timestamp, row, count=None, suppressed=0):
+        self.rule = rule
+        self.message = message
+        self.timestamp = timestamp
+        self.row = row
+        self.count = count
+        self.suppressed = suppressed  # 此前因限流被抑制的告警数
+
+    def to_record(self):
+        record = {"ts": self.timestamp, "event": "alert", "rule": self.rule, "message": self.message}
+        record.update(row_fields(self.row))
+        if self.count is not None:
+            record["count"] = self.count
+        if self.suppressed:
+            record["suppressed"] = self.suppressed
+        return record
+
+
+def load_rules(path):
+    """读取并编译规则文件"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except OSError as e:
+        raise RuleError(f"无法读取规则文件: {e}") from None
+    except ValueError as e:
+        raise RuleError(f"规则文件不是有效的 JSON: {e}") from None
+    specs = data.get("rules") if isinstance(data, dict) else data
+    if not isinstance(specs, list):
+        raise RuleError("规则文件应为 {\"rules\": [...]} 或规则列表")
+    return [Rule(spec) for spec in specs]
+
+
+class RuleEngine:
+    """对每次刷新的快照差异求值所有规则"""
+    def __init__(self, rules):
+        self.rules = rules
+        self.first = True
+        self.fired = 0  # 累计告警数（不含被抑制的）
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(load_rules(path))
+
+    def process(self, delta, timestamp=None):
+        """求值一次快照差异，返回本次产生的告警列表"""
+        timestamp = time.time() if timestamp is None else timestamp
+        alerts = []
+        for rule in self.rules:
+            if rule.is_count:
+                self._process_count(rule, delta, timestamp, alerts)
+            elif self.first and not rule.initial:
+                continue
+            else:
+                self._process_event(rule, delta, timestamp, alerts)
+        self.first = False
+        self.fired += len(alerts)
+        for alert in alerts:
+            logger.warning("%s", alert.message)
+        return alerts
+
+    def _process_event(self, rule, delta, timestamp, alerts):
+        matches = rule.matches
+        entering = rule.on == "enter"
+        for key, row in (delta.added if entering else delta.removed):
+            if matches(row):
+                self._fire(rule, key[0], row, timestamp, alerts)
+        for key, old, new in delta.changed:
+            was, now = matches(old), matches(new)
+            if entering and now and not was:
+                self._fire(rule, key[0], new, timestamp, alerts)
+            elif not entering and was and not now:
+                self._fire(rule, key[0], new, timestamp, alerts)
+
+    def _process_count(self, rule, delta, timestamp, alerts):
+        matches, group_key, counts = rule.matches, rule.group_key, rule.counts
+        touched = {}
+
+        def adjust(row, step):
+            group = group_key(row)
+            counts[group] = counts.get(group, 0) + step
+            touched[group] = row
+
+        for _, row in delta.added:
+            if matches(row):
+                adjust(row, 1)
+        for _, row in delta.removed:
+            if matches(row):
+                adjust(row, -1)
+        for _, old, new in delta.changed:
+            was, now = matches(old), matches(new)
+            if was != now:
+                adjust(new, 1 if now else -1)
+
+        for group, row in touched.items():
+            count = counts[group]
+            if count <= 0:
+                del counts[group]
+            if count > rule.above:
+                if group not in rule.fired_groups:
+                    rule.fired_groups.add(group)
+                    if not (self.first and not rule.initial):
+                        self._fire(rule, group, row, timestamp, alerts, count)
+            else:
+                rule.fired_groups.discard(group)
+
+    def _fire(self, rule, identity, row, timestamp, alerts, count=None):
+        """去重和限流后产生告警"""
+        last = rule.last_fired.get(identity)
+        if last is not None and timestamp - last < rule.dedup:
+            return
+        recent = rule.recent
+        while recent and timestamp - recent[0] >= RATE_WINDOW:
+            recent.popleft()
+        if len(recent) >= rule.rate:
+            # 被限流的告警不计入去重，之后仍会再次报告
+            rule.suppressed += 1
+            return
+        recent.append(timestamp)
+        rule.last_fired[identity] = timestamp
+        if len(rule.last_fired) > 10000:
+            cutoff = timestamp - rule.dedup
+            rule.last_fired = {key: ts for key, ts in rule.last_fired.items() if ts >= cutoff}
+        alerts.append(Alert(rule.name, rule.format(row, count), timestamp, row, count, rule.suppressed))
+        rule.suppressed = 0
@@ -0,0 +1,63 @@
+"""自适应刷新调度
+
+本模块不依赖Qt，只负责计算下一次采集前的等待时间：
+- 窗口隐藏或最小化时退到上限
+- 快照变化剧烈时缩短间隔，平稳时逐渐放宽
+- 两次采集之间至少间隔本次采集耗时的若干倍，采集本身越慢间隔越大
+- 结果始终位于用户设置的下限和上限之间（耗时保护间隔除外）
+"""
+
+
+class RefreshScheduler:
+    """根据窗口可见性、变化率和采集耗时计算刷新间隔（秒）"""
+    HIGH_CHURN = 0.05  # 每次刷新变化的连接占比超过该值视为变化剧烈
+    LOW_CHURN = 0.005
+    COST_FACTOR = 2.0  # 采集结束后至少等待 采集耗时 × COST_FACTOR
+    SMOOTHING = 0.5  # 变化率的指数平滑系数
+    QUIET_FACTOR = 2.0  # 窗口可见且数据平稳时，间隔最多放宽到基准间隔的倍数
+
+    def __init__(self, base=5.0, floor=1.0, ceiling=60.0):
+        self.base = base
+        self.floor = floor
+        self.ceiling = ceiling
+        self.churn = 0.0
+        self.interval = self.clamp(base)
+
+    def clamp(self, interval):
+        return min(max(interval, self.floor), self.ceiling)
+
+    def set_bounds(self, floor, ceiling):
+        """设置下限和上限，下限大于上限时交换"""
+        if floor > ceiling:
+            floor, ceiling = ceiling, floor
+        self.floor = floor
+        self.ceiling = ceiling
+        self.interval = self.clamp(self.interval)
+
+    def record_churn(self, changed, total):
+        """记录一次刷新的变化量"""
+        ratio = changed / total if total else 0.0
+        self.churn = self.SMOOTHING * ratio + (1 - self.SMOOTHING) * self.churn
+
+    def next_interval(self, scan_seconds, visible=True):
+        """计算下一次采集前的等待时间（秒）"""
+        if not visible:
+            interval = self.ceiling
+        else:
+            if self.churn >= self.HIGH_CHURN:
+                self.interval *= 0.5
+            elif self.churn <= self.LOW_CHURN:
+                self.interval = min(self.interval * 1.25, max(self.base * self.QUIET_FACTOR, self.floor))
+            else:
+                # 变化适中时回到基准间隔
+                self.interval += (self.base - self.interval) * 0.5
+            self.interval = self.clamp(self.interval)
+            interval = self.interval
+        return self.cost_guard(interval, scan_seconds)
+
+    def active_interval(self, scan_seconds):
+        """窗口恢复可见时的等待时间：当前间隔，但不短于耗时保护间隔；不改变调度状态"""
+        return self.cost_guard(self.interval, scan_seconds)
+
+    def cost_guard(self, interval, scan_seconds):
+        return max(interval, scan_seconds * self.COST_FACTOR)
@@ -0,0 +1,122 @@
+"""表格排序
+
+本模块不依赖Qt。每行的排序键在行进入快照时计算一次（row_sort_key），之后排序只比较
+这些预先计算的键：
+- 进程ID 按整数，本地/远程地址按 (IP版本, IP整数值, 端口)，状态按连接建立到关闭的顺序
+- 多列排序为从次要列到主要列的多趟稳定排序，每趟都是对普通元组的C层比较，
+  相等的行保持原来的相对顺序
+- 刷新时新增或排序键变化的行用二分查找插入到正确位置，其余行不重新排序
+"""
+from port_filter import ip_key
+
+SORT_FIELDS = ("host", "pid", "name", "local_address", "remote_address", "status")
+FIELD_INDEX = {field: i for i, field in enumerate(SORT_FIELDS)}
+STATE_ORDER = {state: i for i, state in enumerate((
+    "LISTEN", "SYN_SENT", "SYN_RECV", "ESTABLISHED", "FIN_WAIT1", "FIN_WAIT2",
+    "CLOSE_WAIT", "CLOSING", "LAST_ACK", "TIME_WAIT", "CLOSE", "NONE"))}
+
+def address_key(address):
+    """(IP, 端口) 的排序键，没有地址（如监听中的连接）排在最前"""
+    if address is None:
+        return (0, 0, 0)
+    ip, port = address
+    try:
+        return ip_key(ip) + (port,)
+    except ValueError:
+        return (9, 0, port)
+
+
+class AddressKeyCache:
+    """带缓存的 address_key，同一地址在快照中大量重复
+
+    缓存不加锁，每个实例只能由一个线程使用。
+    """
+    MAX_SIZE = 100000
+
+    def __init__(self):
+        self._keys = {}  # IP 字符串 -> (版本, 整数)
+
+    def __call__(self, address):
+        if address is None:
+            return (0, 0, 0)
+        ip, port = address
+        key = self._keys.get(ip)
+        if key is None:
+            try:
+                key = ip_key(ip)
+            except ValueError:
+                key = (9, 0)
+            if len(self._keys) >= self.MAX_SIZE:
+                self._keys.clear()
+            self._keys[ip] = key
+        return key + (port,)
+
+
+def row_sort_key(row, address_key=address_key):
+    """一行的排序键，顺序与 SORT_FIELDS 相同；address_key 可以换成 AddressKeyCache 实例"""
+    name = row["name"]
+    status = row["status"]
+    return (row.get("host") or "", row["pid"], (name.casefold(), name),
+            address_key(row["laddr"]), address_key(row["raddr"]),
+            (STATE_ORDER.get(status, len(STATE_ORDER)), status))
+
+
+class SortKeyCache:
+    """按差异键缓存排序键
+
+    采集线程在每次刷新时调用 update()，只为新增和变化的行计算排序键；
+    界面线程只通过 get() 读取，行对象不一致（例如历史快照中的行）时当场计算。
+    两个线程各用一个地址缓存，互不共享。
+    """
+    def __init__(self):
+        self._keys = {}  # 差异键 -> (行, 排序键)
+        self._update_addresses = AddressKeyCache()
+        self._get_addresses = AddressKeyCache()
+
+    def update(self, delta):
+        keys = self._keys
+        address_key = self._update_addresses
+        for key, _ in delta.removed:
+            keys.pop(key, None)
+        for key, _, row in delta.changed:
+            keys[key] = (row, row_sort_key(row, address_key))
+        for key, row in delta.added:
+            keys[key] = (row, row_sort_key(row, address_key))
+
+    def get(self, key, row):
+        entry = self._keys.get(key)
+        if entry is not None and entry[0] is row:
+            return entry[1]
+        return row_sort_key(row, self._get_addresses)
+
+    def clear(self):
+        self._keys = {}
+
+
+def sort_order(sort_keys, spec):
+    """按 spec（[(字段序号, 是否降序)]，主要列在前）返回行的顺序"""
+    order = list(range(len(sort_keys)))
+    for index, descending in reversed(spec):
+        order.sort(key=lambda i: sort_keys[i][index], reverse=descending)
+    return order
+
+
+def precedes(a, b, spec):
+    """按 spec 排序时 a 是否应排在 b 之前"""
+    for index, descending in spec:
+        x, y = a[index], b[index]
+        if x != y:
+            return x > y if descending else x < y
+    return False
+
+
+def insert_position(sort_keys, key, spec):
+    """key 在已排序的 sort_keys 中的插入位置（相等的行之后）"""
+    low, high = 0, len(sort_keys)
+    while low < high:
+        middle = (low + high) // 2
+        if precedes(key, sort_keys[middle], spec):
+            high = middle
+        else:
+            low = middle + 1
+    return low
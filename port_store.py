@@ -0,0 +1,355 @@
+"""连接事件的持久化存储（SQLite）
+
+本模块不依赖Qt。每次采集的差异记录为 open / close / change 事件，并按间隔写入
+完整快照（snapshot），因此既能按时间范围查询事件，也能还原任意时刻的连接表
+（最近一次快照加上之后的事件）。
+
+写入由后台线程完成：采集线程只把本次的事件放入有界队列，写入线程把排队的
+批次合并到一个事务中。队列满时丢弃本批并在下一次写入完整快照。保留策略按
+时间和文件大小删除最旧的数据，删除后通过增量 VACUUM 归还空间。查询逐批读取
+游标，不会把整个历史读入内存。
+"""
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from port_collector import make_row, protocol_name
+from port_diff import index_rows
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    ts REAL NOT NULL,
+    event TEXT NOT NULL,
+    host TEXT,
+    pid INTEGER,
+    name TEXT,
+    family INTEGER,
+    type INTEGER,
+    laddr TEXT,
+    lport INTEGER,
+    raddr TEXT,
+    rport INTEGER,
+    status TEXT,
+    old_status TEXT,
+    n INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_lport ON events (lport, ts);
+CREATE INDEX IF NOT EXISTS events_pid ON events (pid, ts);
+CREATE INDEX IF NOT EXISTS events_name ON events (name, ts);
+CREATE TABLE IF NOT EXISTS snapshots (ts REAL PRIMARY KEY);
+"""
+COLUMNS = "ts, event, host, pid, name, family, type, laddr, lport, raddr, rport, status, old_status"
+# n 为同一连接标识在快照中的序号（与 port_diff.index_rows 相同），用于还原连接表时区分重复的连接
+INSERT = f"INSERT INTO events ({COLUMNS}, n) VALUES ({', '.join('?' * 14)})"
+FETCH_SIZE = 500
+MAX_PORT_CANDIDATES = 256  # 端口子串对应的候选端口不超过该数量时才改写为 IN 查询
+RELATIVE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%H:%M:%S", "%H:%M")
+
+
+def parse_time(text, now=None):
+    """解析时间：Unix 时间戳、30m / 2h / 1d 等相对于现在之前的时间（可带负号）、
+    日期时间或当天的时分"""
+    text = text.strip()
+    now = time.time() if now is None else now
+    if text[-1:] in RELATIVE_UNITS:
+        try:
+            return now - abs(float(text[:-1])) * RELATIVE_UNITS[text[-1]]
+        except ValueError:
+            raise ValueError(f"无效的时间: {text}") from None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    for fmt in TIME_FORMATS:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if not fmt.startswith("%Y"):
+            today = datetime.fromtimestamp(now)
+            parsed = parsed.replace(year=today.year, month=today.month, day=today.day)
+        return parsed.timestamp()
+    raise ValueError(f"无效的时间: {text}")
+
+
+def row_columns(timestamp, event, key, row, old_status=None):
+    """一行数据对应的记录，key 为 index_rows 的键 (连接标识, 序号)"""
+    raddr = row["raddr"]
+    return (timestamp, event, row.get("host"), row["pid"], row["name"], int(row["family"]),
+            int(row["type"]), row["laddr"][0], row["laddr"][1],
+            raddr[0] if raddr else None, raddr[1] if raddr else None, row["status"], old_status, key[1])
+
+
+def state_key(columns):
+    """还原连接表时的键：与 port_diff.connection_key 相同的字段加上序号，不含进程名和状态"""
+    return columns[2:4] + columns[5:11] + columns[13:14]
+
+
+def columns_row(columns):
+    """把一条记录还原为与采集结果相同的行"""
+    _, _, host, pid, name, family, type_, laddr, lport, raddr, rport, status, _ = columns
+    row = make_row(pid, name, family, type_, (laddr, lport),
+                   (raddr, rport) if raddr is not None else None, status)
+    if host is not None:
+        row["host"] = host
+    return row
+
+
+def columns_record(columns, row):
+    """记录转换为与无界面模式输出相同格式的字典"""
+    ts, event, host, pid, name, _, _, laddr, lport, raddr, rport, status, old_status = columns
+    record = {"ts": ts, "event": event, "pid": pid, "name": name, "proto": protocol_name(row),
+              "laddr": laddr, "lport": lport, "raddr": raddr, "rport": rport, "status": status}
+    if host is not None:
+        record["host"] = host
+    if old_status is not None:
+        record["old_status"] = old_status
+    return record
+
+
+def spec_clauses(spec, with_status=True):
+    """把过滤条件中可以由索引完成的部分转换为 SQL 条件，其余部分在读出后再判断"""
+    clauses, params = [], []
+    if spec is None:
+        return clauses, params
+    port = spec.port
+    if port:
+        ports = set()
+        if port.substrings:
+            ports.update(p for p in range(65536) if any(sub in str(p) for sub in port.substrings))
+        if len(ports) <= MAX_PORT_CANDIDATES:
+            parts = []
+            if ports:
+                parts.append(f"lport IN ({', '.join('?' * len(ports))})")
+                params.extend(sorted(ports))
+            for low, high in port.ranges:
+                parts.append("lport BETWEEN ? AND ?")
+                params.extend((low, high))
+            clauses.append("(" + " OR ".join(parts) + ")")
+    if spec.process:
+        if spec.pid is not None:
+            clauses.append("(pid = ? OR instr(lower(name), ?) > 0)")
+            params.extend((spec.pid, spec.process))
+        else:
+            clauses.append("instr(lower(name), ?) > 0")
+            params.append(spec.process)
+    if with_status and spec.states:
+        clauses.append(f"upper(status) IN ({', '.join('?' * len(spec.states))})")
+        params.extend(sorted(spec.states))
+    return clauses, params
+
+
+class EventStore:
+    """连接事件存储：后台批量写入、按时间和大小保留、按时间范围查询"""
+    RETENTION_INTERVAL = 60.0  # 两次执行保留策略的最短间隔（秒）
+
+    def __init__(self, path, snapshot_interval=300.0, max_age=7 * 86400,
+                 max_bytes=512 * 1024 * 1024, queue_size=64):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.dropped = 0  # 队列满时被丢弃的批次数
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._last_snapshot = None
+        self._last_retention = 0.0
+        conn = self._connect()
+        try:
+            # auto_vacuum 只能在建表前设置，对已有的数据库不起作用
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("PRAGMA journal_mode = WAL")  # 写入期间仍可查询
+            conn.executescript(SCHEMA)
+            if "n" not in {info[1] for info in conn.execute("PRAGMA table_info(events)")}:
+                # 早期版本的数据库没有序号列，已有记录的序号视为 0
+                conn.execute("ALTER TABLE events ADD COLUMN n INTEGER NOT NULL DEFAULT 0")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="event-store", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """写入队列中剩余的批次后停止"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def record(self, rows, delta, timestamp=None):
+        """记录一次采集（在采集线程中调用），到达间隔时附带完整快照"""
+        timestamp = time.time() if timestamp is None else timestamp
+        batch = []
+        snapshot = (self._last_snapshot is None
+                    or timestamp - self._last_snapshot >= self.snapshot_interval)
+        if snapshot:
+            batch.extend(row_columns(timestamp, "snapshot", key, row)
+                         for key, row in index_rows(rows).items())
+        if self._last_snapshot is not None:
+            # 第一次的差异就是完整快照本身，不再重复记录为 open 事件
+            batch.extend(row_columns(timestamp, "open", key, row) for key, row in delta.added)
+            batch.extend(row_columns(timestamp, "close", key, row) for key, row in delta.removed)
+            batch.extend(row_columns(timestamp, "change", key, new, old["status"])
+                         for key, old, new in delta.changed)
+        if snapshot:
+            self._last_snapshot = timestamp
+        try:
+            self._queue.put_nowait((timestamp if snapshot else None, batch))
+        except queue.Full:
+            # 写入跟不上：丢弃本批，下一次写入完整快照以便还原连接表
+            self.dropped += 1
+            self._last_snapshot = None
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                batches = [self._queue.get()]
+                while True:
+                    try:
+                        batches.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stopping = None in batches
+                with conn:
+                    for item in batches:
+                        if item is None:
+                            continue
+                        snapshot_ts, rows = item
+                        conn.executemany(INSERT, rows)
+                        if snapshot_ts is not None:
+                            conn.execute("INSERT OR IGNORE INTO snapshots (ts) VALUES (?)",
+                                         (snapshot_ts,))
+                now = time.time()
+                if now - self._last_retention >= self.RETENTION_INTERVAL:
+                    self._last_retention = now
+                    self.apply_retention(conn, now)
+        finally:
+            conn.close()
+
+    def apply_retention(self, conn, now=None):
+        """删除超过保留时间的数据，超过大小上限时按超出比例继续删除最旧的时间段"""
+        now = time.time() if now is None else now
+        cutoff = now - self.max_age
+        with conn:
+            conn.execute("DELETE FROM events WHERE ts < ?", (cutoff,))
+            conn.execute("DELETE FROM snapshots WHERE ts < ?", (cutoff,))
+        for _ in range(5):
+            size = self.data_size(conn)
+            if size <= self.max_bytes:
+                break
+            oldest, newest = conn.execute("SELECT MIN(ts), MAX(ts) FROM events").fetchone()
+            if oldest is None:
+                break
+            # 假设数据量随时间均匀分布，多删除 10% 以免每次只降到上限附近
+            fraction = min(1.0, 1 - self.max_bytes / size + 0.1)
+            cutoff = oldest + max((newest - oldest) * fraction, 1e-3)
+            with conn:
+                conn.execute("DELETE FROM events WHERE ts < ?", (cutoff,))
+                conn.execute("DELETE FROM snapshots WHERE ts < ?", (cutoff,))
+        # execute() 执行该语句时只释放一页，executescript() 会一直执行到完成
+        conn.executescript("PRAGMA incremental_vacuum;")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+    @staticmethod
+    def data_size(conn):
+        """数据占用的字节数（不含空闲页）"""
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (pages - free) * page_size
+
+    def query(self, start=None, end=None, spec=None, events=("open", "close", "change"),
+              limit=None):
+        """按时间顺序逐条返回时间范围内满足条件的事件记录"""
+        clauses, params = spec_clauses(spec)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts <= ?")
+            params.append(end)
+        if events:
+            clauses.append(f"event IN ({', '.join('?' * len(events))})")
+            params.extend(events)
+        sql = f"SELECT {COLUMNS} FROM events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts"
+        conn = self._connect()
+        try:
+            cursor = conn.execute(sql, params)
+            count = 0
+            while True:
+                chunk = cursor.fetchmany(FETCH_SIZE)
+                if not chunk:
+                    return
+                for columns in chunk:
+                    row = columns_row(columns)
+                    if spec is None or spec.matches(row):
+                        yield columns_record(columns, row)
+                        count += 1
+                        if limit is not None and count >= limit:
+                            return
+        finally:
+            conn.close()
+
+    def state_at(self, timestamp, spec=None):
+        """还原某一时刻的连接表：此前最近的完整快照加上之后到该时刻的事件"""
+        conn = self._connect()
+        try:
+            base = conn.execute("SELECT MAX(ts) FROM snapshots WHERE ts <= ?",
+                                (timestamp,)).fetchone()[0]
+            # 连接的状态会变化，状态条件在重放之后再判断
+            clauses, params = spec_clauses(spec, with_status=False)
+            where = "".join(" AND " + clause for clause in clauses)
+            alive = {}
+            if base is not None:
+                cursor = conn.execute(
+                    f"SELECT {COLUMNS}, n FROM events WHERE event = 'snapshot' AND ts = ?{where}",
+                    [base] + params)
+                for columns in cursor:
+                    alive[state_key(columns)] = columns[:13]
+            # 同一时刻的事件按写入顺序重放
+            cursor = conn.execute(
+                f"SELECT {COLUMNS}, n FROM events WHERE ts > ? AND ts <= ? "
+                f"AND event IN ('open', 'close', 'change'){where} ORDER BY ts, rowid",
+                [base if base is not None else float("-inf"), timestamp] + params)
+            for columns in cursor:
+                key = state_key(columns)
+                if columns[1] == "close":
+                    alive.pop(key, None)
+                else:
+                    alive[key] = columns[:13]
+        finally:
+            conn.close()
+        records = []
+        for columns in alive.values():
+            row = columns_row(columns)
+            if spec is None or spec.matches(row):
+                record = columns_record(columns, row)
+                record["event"] = "state"
+                record.pop("old_status", None)
+                records.append(record)
+        return records
+
+    def time_range(self):
+        """已保存数据的最早和最晚时间"""
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT MIN(ts), MAX(ts) FROM events").fetchone()
+        finally:
+            conn.close()
+
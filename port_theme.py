@@ -0,0 +1,137 @@
+"""深色主题的样式表
+
+只在切换到深色主题时由 port_monitor 导入。
+"""
+
+TABLE = """
+QTableView {
+    background-color: #2D2D2D;
+    color: white;
+    gridline-color: #3A3A3A;
+    border: 1px solid #3A3A3A;
+}
+QTableView::item {
+    background-color: #2D2D2D;
+    color: white;
+}
+QTableView::item:selected {
+    background-color: #3A6EA5;
+    color: white;
+}
+QHeaderView::section {
+    background-color: #3A3A3A;
+    color: white;
+    padding: 4px;
+    border: 1px solid #505050;
+}
+QTableCornerButton::section {
+    background-color: #3A3A3A;
+    border: 1px solid #505050;
+}
+"""
+
+TREE = """
+QTreeView {
+    background-color: #2D2D2D;
+    color: white;
+    border: 1px solid #3A3A3A;
+}
+QTreeView::item:selected {
+    background-color: #3A6EA5;
+    color: white;
+}
+QHeaderView::section {
+    background-color: #3A3A3A;
+    color: white;
+    padding: 4px;
+    border: 1px solid #505050;
+}
+"""
+
+BUTTON = """
+QPushButton {
+    background-color: #3A3A3A;
+    color: white;
+    border: 1px solid #505050;
+    border-radius: 3px;
+    padding: 5px 10px;
+}
+QPushButton:hover {
+    background-color: #505050;
+}
+QPushButton:pressed {
+    background-color: #3A6EA5;
+}
+QPushButton:disabled {
+    background-color: #2D2D2D;
+    color: #808080;
+    border: 1px solid #404040;
+}
+"""
+
+LINEEDIT = """
+QLineEdit {
+    background-color: #2D2D2D;
+    color: white;
+    border: 1px solid #505050;
+    border-radius: 3px;
+    padding: 3px;
+}
+QLineEdit:focus {
+    border: 1px solid #3A6EA5;
+}
+QLineEdit::placeholder {
+    color: #A0A0A0;
+}
+"""
+
+GROUPBOX = """
+QGroupBox {
+    border: 1px solid #505050;
+    border-radius: 5px;
+    margin-top: 10px;
+    font-weight: bold;
+    color: white;
+}
+QGroupBox::title {
+    subcontrol-origin: margin;
+    subcontrol-position: top center;
+    padding: 0 5px;
+    background-color: #3A3A3A;
+}
+QLabel {
+    color: white;
+}
+"""
+
+MENU_BAR = """
+QMenuBar {
+    background-color: #3A3A3A;
+    color: white;
+    border-bottom: 1px solid #505050;
+}
+QMenuBar::item {
+    background-color: transparent;
+    padding: 4px 10px;
+}
+QMenuBar::item:selected {
+    background-color: #505050;
+    color: white;
+}
+QMenuBar::item:pressed {
+    background-color: #3A6EA5;
+    color: white;
+}
+QMenu {
+    background-color: #3A3A3A;
+    color: white;
+    border: 1px solid #505050;
+}
+QMenu::item {
+    padding: 5px 30px 5px 20px;
+}
+QMenu::item:selected {
+    background-color: #3A6EA5;
+    color: white;
+}
+"""
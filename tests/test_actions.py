@@ -0,0 +1,82 @@
+"""批量关闭进程测试"""
+import os
+import sys
+
+import psutil
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import port_actions
+from port_actions import ALIVE, DENIED, GONE, KILLED, TERMINATED, terminate_processes
+
+
+class StubProcess:
+    """模拟 psutil.Process：exits_on 为收到后退出的信号，raises 为各信号抛出的异常"""
+    def __init__(self, pid, exits_on=(), raises=None):
+        self.pid = pid
+        self.exits_on = set(exits_on)
+        self.raises = raises or {}
+        self.signals = []
+        self.exited = False
+
+    def send(self, method):
+        self.signals.append(method)
+        if method in self.raises:
+            raise self.raises[method]
+        if method in self.exits_on:
+            self.exited = True
+
+    def terminate(self):
+        self.send("terminate")
+
+    def kill(self):
+        self.send("kill")
+
+
+@pytest.fixture
+def procs(monkeypatch):
+    table = {}
+
+    def process(pid):
+        if pid not in table:
+            raise psutil.NoSuchProcess(pid)
+        return table[pid]
+
+    def wait_procs(procs, timeout=None, callback=None):
+        gone = [proc for proc in procs if proc.exited]
+        for proc in gone:
+            callback(proc)
+        return gone, [proc for proc in procs if not proc.exited]
+
+    monkeypatch.setattr(port_actions.psutil, "Process", process)
+    monkeypatch.setattr(port_actions.psutil, "wait_procs", wait_procs)
+    return table
+
+
+def add(table, *stubs):
+    for stub in stubs:
+        table[stub.pid] = stub
+
+
+def test_terminate_then_kill(procs):
+    add(procs, StubProcess(1, exits_on=["terminate"]), StubProcess(2, exits_on=["kill"]),
+        StubProcess(3), StubProcess(4, raises={"terminate": psutil.AccessDenied(4)}))
+    progress = []
+    results = terminate_processes([1, 2, 3, 4, 5], on_progress=lambda done, total: progress.append(done))
+    assert results == {1: TERMINATED, 2: KILLED, 3: ALIVE, 4: DENIED, 5: GONE}
+    assert procs[1].signals == ["terminate"]
+    assert procs[2].signals == ["terminate", "kill"]
+    assert progress == [1, 2, 3, 4, 5]
+
+
+def test_exit_during_escalation_counts_as_terminated(procs):
+    # terminate 等待超时后、kill 之前进程自行退出
+    add(procs, StubProcess(1, raises={"kill": psutil.NoSuchProcess(1)}))
+    assert terminate_processes([1]) == {1: TERMINATED}
+
+
+def test_force_kills_immediately(procs):
+    add(procs, StubProcess(1, exits_on=["kill"]), StubProcess(2, raises={"kill": psutil.NoSuchProcess(2)}))
+    assert terminate_processes([1, 2], force=True) == {1: KILLED, 2: GONE}
+    assert procs[1].signals == ["kill"]
@@ -0,0 +1,236 @@
+"""采集后端一致性测试
+
+打开真实的回环 TCP/UDP（IPv4/IPv6）socket，比较 ProcNetBackend、SockDiagBackend
+与 PsutilBackend 返回的连接集合，并测试十六进制地址解码与 inode → pid 映射。
+"""
+import logging
+import os
+import socket
+import sys
+
+import psutil
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import port_netlink
+import port_procfs
+from port_collector import PortCollector, ProcessCache, PsutilBackend
+from port_filter import FilterSpec
+
+linux_only = pytest.mark.skipif(not port_procfs.is_supported(), reason="需要 Linux /proc/net")
+
+
+def ipv6_available():
+    if not socket.has_ipv6:
+        return False
+    try:
+        with socket.socket(socket.AF_INET6, socket.SOCK_STREAM) as sock:
+            sock.bind(("::1", 0))
+    except OSError:
+        return False
+    return True
+
+
+FAMILIES = [(socket.AF_INET, "127.0.0.1")]
+if ipv6_available():
+    FAMILIES.append((socket.AF_INET6, "::1"))
+
+
+@pytest.fixture
+def loopback_sockets():
+    """每个地址族打开 TCP 监听、一对已建立连接和一个 UDP socket，返回 (socket列表, 端口集合)"""
+    sockets = []
+    for family, host in FAMILIES:
+        server = socket.socket(family, socket.SOCK_STREAM)
+        server.bind((host, 0))
+        server.listen()
+        client = socket.create_connection(server.getsockname()[:2])
+        accepted, _ = server.accept()
+        udp = socket.socket(family, socket.SOCK_DGRAM)
+        udp.bind((host, 0))
+        sockets += [server, client, accepted, udp]
+    ports = {sock.getsockname()[1] for sock in sockets}
+    yield sockets, ports
+    for sock in sockets:
+        sock.close()
+
+
+def owned(connections, ports):
+    """只保留本进程在测试端口上的连接，统一为可比较的元组"""
+    pid = os.getpid()
+    return {
+        (conn_pid, int(family), int(type_), laddr, raddr, status)
+        for conn_pid, family, type_, laddr, raddr, status in connections
+        if conn_pid == pid and laddr[1] in ports
+    }
+
+
+def expected(sockets):
+    result = set()
+    for sock in sockets:
+        laddr = sock.getsockname()[:2]
+        if sock.type == socket.SOCK_DGRAM:
+            raddr, status = None, psutil.CONN_NONE
+        else:
+            try:
+                raddr, status = sock.getpeername()[:2], psutil.CONN_ESTABLISHED
+            except OSError:
+                raddr, status = None, psutil.CONN_LISTEN
+        result.add((os.getpid(), int(sock.family), int(sock.type), laddr, raddr, status))
+    return result
+
+
+@linux_only
+def test_procfs_matches_psutil(loopback_sockets):
+    sockets, ports = loopback_sockets
+    procfs = owned(port_procfs.ProcNetBackend().connections(), ports)
+    assert procfs == expected(sockets)
+    assert owned(PsutilBackend().connections(), ports) == procfs
+
+
+@linux_only
+@pytest.mark.skipif(not port_netlink.is_supported(), reason="需要 netlink sock_diag")
+def test_netlink_matches_procfs(loopback_sockets):
+    sockets, ports = loopback_sockets
+    netlink = owned(port_netlink.SockDiagBackend().connections(), ports)
+    assert netlink == expected(sockets)
+    assert netlink == owned(port_procfs.ProcNetBackend().connections(), ports)
+
+
+@linux_only
+def test_netlink_failure_stops_pushdown(monkeypatch, caplog):
+    def fail(*args):
+        raise OSError(93, "protocol not supported")
+
+    collector = PortCollector(ProcessCache(), backend=port_netlink.SockDiagBackend())
+    assert collector.set_filter(FilterSpec(state="LISTEN")) == ("state",)
+    monkeypatch.setattr(port_netlink.SockDiagBackend, "_dump", fail)
+    with caplog.at_level(logging.WARNING, logger="port_monitor.netlink"):
+        collector.collect()
+        collector.collect()
+    # 回退到 /proc/net 后不再报告内核过滤，只记录一次
+    assert collector.backend.failed
+    assert collector.pushed == ()
+    assert collector.set_filter(FilterSpec(state="LISTEN")) == ()
+    assert len(caplog.records) == 1
+
+
+@linux_only
+def test_inode_map_tracks_new_and_closed_sockets():
+    backend = port_procfs.ProcNetBackend()
+    backend.connections()
+    pid = os.getpid()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    inode = str(os.fstat(sock.fileno()).st_ino)
+    try:
+        # 新 socket 属于已扫描过的进程，需要重新扫描才能归属
+        backend.update_inode_map({inode})
+        assert backend._inode_pids[inode] == {pid}
+        assert inode in backend._pid_inodes[pid]
+    finally:
+        sock.close()
+    backend.update_inode_map(set())
+    assert inode not in backend._inode_pids
+    assert inode not in backend._pid_inodes[pid]
+
+
+@linux_only
+def test_inode_map_forgets_exited_process():
+    backend = port_procfs.ProcNetBackend()
+    backend._pid_inodes[-1] = {"12345"}
+    backend._inode_pids["12345"] = {-1}
+    backend.update_inode_map({"12345"})
+    assert -1 not in backend._pid_inodes
+    assert "12345" in backend._orphans
+
+
+def test_scan_pid_replaces_previous_inodes(tmp_path):
+    fd_dir = tmp_path / "42" / "fd"
+    fd_dir.mkdir(parents=True)
+    os.symlink("socket:[100]", fd_dir / "3")
+    os.symlink("socket:[101]", fd_dir / "4")
+    os.symlink("/dev/null", fd_dir / "5")
+    backend = port_procfs.ProcNetBackend(str(tmp_path))
+    backend.scan_pid(42)
+    assert backend._pid_inodes[42] == {"100", "101"}
+    assert backend._inode_pids == {"100": {42}, "101": {42}}
+
+    os.unlink(fd_dir / "3")
+    backend.scan_pid(42)
+    assert backend._pid_inodes[42] == {"101"}
+    assert backend._inode_pids == {"101": {42}}
+
+    backend.scan_pid(43)  # 不存在的进程
+    assert backend._pid_inodes[43] == set()
+
+
+def test_read_tables_from_fake_procfs(tmp_path):
+    header = "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n"
+    net = tmp_path / "net"
+    net.mkdir()
+    local = "0100007F:1F90" if port_procfs.LITTLE_ENDIAN else "7F000001:1F90"
+    (net / "tcp").write_text(
+        header
+        + f"   0: {local} 00000000:0000 0A 00000000:00000000 00:00000000 00000000  1000 0 555 1\n"
+        + "   1: 00000000:0000 00000000:0000 07 00000000:00000000 00:00000000 00000000  1000 0 556 1\n")
+    (net / "udp").write_text(header)
+    backend = port_procfs.ProcNetBackend(str(tmp_path))
+    assert backend.read_tables() == [
+        (socket.AF_INET, socket.SOCK_STREAM, ("127.0.0.1", 8080), None, psutil.CONN_LISTEN, "555"),
+    ]
+
+
+def test_read_tables_unknown_tcp_state(tmp_path):
+    header = "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n"
+    net = tmp_path / "net"
+    net.mkdir()
+    local = "0100007F:1F90" if port_procfs.LITTLE_ENDIAN else "7F000001:1F90"
+    # 0D 不在状态表中（新内核可能增加状态），不应使整次扫描失败
+    (net / "tcp").write_text(
+        header + f"   0: {local} 00000000:0000 0D 00000000:00000000 00:00000000 00000000  1000 0 557 1\n")
+    (net / "udp").write_text(header)
+    backend = port_procfs.ProcNetBackend(str(tmp_path))
+    assert backend.read_tables() == [
+        (socket.AF_INET, socket.SOCK_STREAM, ("127.0.0.1", 8080), None, psutil.CONN_NONE, "557"),
+    ]
+
+
+@pytest.mark.skipif(not port_procfs.LITTLE_ENDIAN, reason="测试数据为小端序")
+class TestHexAddressDecoder:
+    def test_ipv4(self):
+        decoder = port_procfs.HexAddressDecoder()
+        assert decoder.decode("0100007F:0016", socket.AF_INET) == ("127.0.0.1", 22)
+        assert decoder.decode("0101A8C0:C350", socket.AF_INET) == ("192.168.1.1", 50000)
+
+    def test_ipv6(self):
+        decoder = port_procfs.HexAddressDecoder()
+        loopback = "00000000000000000000000001000000"
+        assert decoder.decode(f"{loopback}:1F90", socket.AF_INET6) == ("::1", 8080)
+        mapped = "0000000000000000FFFF00000100007F"
+        assert decoder.decode(f"{mapped}:0050", socket.AF_INET6) == ("::ffff:127.0.0.1", 80)
+        link_local = "000080FE000000000000000001000000"
+        assert decoder.decode_ip(link_local, socket.AF_INET6) == "fe80::1"
+
+    def test_zero_port_is_unbound(self):
+        decoder = port_procfs.HexAddressDecoder()
+        assert decoder.decode("00000000:0000", socket.AF_INET) is None
+
+    def test_cache(self):
+        decoder = port_procfs.HexAddressDecoder()
+        decoder.decode("0100007F:0016", socket.AF_INET)
+        decoder.decode("0100007F:0050", socket.AF_INET)
+        assert len(decoder) == 1
+        decoder.clear()
+        assert len(decoder) == 0
+
+    def test_matches_inet_pton(self):
+        decoder = port_procfs.HexAddressDecoder()
+        for ip in ("10.0.0.1", "255.254.253.252"):
+            hex_ip = socket.inet_pton(socket.AF_INET, ip)[::-1].hex().upper()
+            assert decoder.decode_ip(hex_ip, socket.AF_INET) == ip
+        for ip in ("2001:db8::1", "fe80::1234:5678:9abc:def0"):
+            raw = socket.inet_pton(socket.AF_INET6, ip)
+            words = b"".join(raw[i:i + 4][::-1] for i in range(0, 16, 4))
+            assert decoder.decode_ip(words.hex().upper(), socket.AF_INET6) == ip
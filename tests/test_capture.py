@@ -0,0 +1,226 @@
+"""录制文件与回放测试
+
+录制一组快照后重新打开、截断最后一帧的一部分再续写，检查 CaptureReader 的定位和
+ReplayCollector 在逐帧（speed=0）与按速度回放时返回的快照与录制时一致。
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from port_capture import (DELTA, KEYFRAME, MAGIC, CaptureError, CaptureReader, CaptureWriter,
+                          ReplayCollector, index_path, parse_position)
+from port_collector import make_row
+from port_diff import SnapshotDiffer, index_rows
+
+START = 1000.0
+
+
+def make_snapshots(count, first=0):
+    """生成 count 个相邻的快照：每次关闭、新增、改变少量连接，每 7 次替换大半连接"""
+    snapshots = []
+    rows = [make_row(100 + i, f"proc{i}", 2, 1, ("127.0.0.1", 8000 + i), ("10.0.0.2", 443),
+                     "ESTABLISHED") for i in range(first, first + 20)]
+    # 同一进程重复监听同一端口（SO_REUSEPORT），以及带 host 字段的远程行
+    rows.append(make_row(1, "reuse", 2, 1, ("0.0.0.0", 80), None, "LISTEN"))
+    rows.append(make_row(1, "reuse", 2, 1, ("0.0.0.0", 80), None, "LISTEN"))
+    rows.append(dict(make_row(7, "remote", 10, 2, ("::1", 53), None, "NONE"), host="db1:9500"))
+    for step in range(count):
+        rows = list(rows)
+        if step % 7 == 6:
+            rows[:15] = [make_row(500 + step * 20 + i, "burst", 2, 1, ("127.0.0.1", 20000 + step * 20 + i),
+                                  None, "LISTEN") for i in range(15)]
+        elif step:
+            del rows[step % len(rows)]
+            rows[0] = dict(rows[0], status="CLOSE_WAIT" if rows[0]["status"] != "CLOSE_WAIT" else "ESTABLISHED")
+            rows.append(make_row(300 + step, f"new{step}", 2, 2, ("127.0.0.1", 30000 + step), None, "NONE"))
+        snapshots.append((START + step + first, rows))
+    return snapshots
+
+
+def record(path, snapshots, keyframe_interval=5):
+    writer = CaptureWriter(path, keyframe_interval=keyframe_interval)
+    differ = SnapshotDiffer()
+    kinds = []
+    for ts, rows in snapshots:
+        kinds.append(writer.record(rows, differ.update(rows), ts))
+    writer.close()
+    return kinds
+
+
+def assert_same(actual_rows, expected_rows):
+    assert index_rows(actual_rows) == index_rows(expected_rows)
+
+
+@pytest.fixture
+def capture(tmp_path):
+    path = str(tmp_path / "capture.pcap")
+    snapshots = make_snapshots(12)
+    kinds = record(path, snapshots)
+    return path, snapshots, kinds
+
+
+def test_keyframes_written(capture):
+    path, snapshots, kinds = capture
+    assert kinds[0] == KEYFRAME
+    assert DELTA in kinds
+    assert kinds[6] == KEYFRAME  # 差异超过快照的一半
+    with CaptureReader(path) as reader:
+        assert reader.frames == len(snapshots)
+        assert (reader.first_seq, reader.last_seq) == (0, len(snapshots) - 1)
+        assert (reader.first_time, reader.last_time) == (snapshots[0][0], snapshots[-1][0])
+        assert [seq for _, seq, _ in reader.keyframes] == [i for i, kind in enumerate(kinds) if kind == KEYFRAME]
+
+
+def test_snapshots_round_trip(capture):
+    path, snapshots, _ = capture
+    with CaptureReader(path) as reader:
+        restored = [(ts, list(index.values())) for ts, index in reader.snapshots()]
+    assert [ts for ts, _ in restored] == [ts for ts, _ in snapshots]
+    for (_, actual), (_, expected) in zip(restored, snapshots):
+        assert_same(actual, expected)
+    assert any(row.get("host") == "db1:9500" for row in restored[-1][1])
+
+
+def test_state_at(capture):
+    path, snapshots, _ = capture
+    with CaptureReader(path) as reader:
+        for ts, rows in snapshots:
+            for at in (ts, ts + 0.5):
+                found, actual = reader.state_at(at)
+                assert found == ts
+                assert_same(actual, rows)
+        # 早于录制开始时返回第一帧，晚于录制结束时停在最后一帧
+        assert reader.state_at(START - 10)[0] == snapshots[0][0]
+        found, actual = reader.state_at(START + 1000)
+        assert found == snapshots[-1][0]
+        assert_same(actual, snapshots[-1][1])
+
+
+def test_rebuilds_missing_index(capture):
+    path, _, _ = capture
+    with CaptureReader(path) as reader:
+        keyframes, frames = reader.keyframes, reader.frames
+    os.remove(index_path(path))
+    with CaptureReader(path) as reader:
+        assert reader.keyframes == keyframes
+        assert reader.frames == frames
+
+
+def test_truncated_tail_and_resume(capture):
+    path, snapshots, kinds = capture
+    # 最后一帧是关键帧时，索引中会留下一个指向不完整帧的条目
+    assert kinds[-1] == KEYFRAME
+    with CaptureReader(path) as reader:
+        last_start = reader.keyframes[-1][2]
+        end = reader.end
+    with open(path, "r+b") as f:
+        f.truncate(end - 3)
+    with open(index_path(path), "rb") as f:
+        stale_index = f.read()
+
+    with CaptureReader(path) as reader:
+        assert reader.frames == len(snapshots) - 1
+        assert reader.last_seq == len(snapshots) - 2
+        assert reader.end < end
+        assert all(offset < reader.end for _, _, offset in reader.keyframes)
+        assert_same(reader.state_at(START + 1000)[1], snapshots[-2][1])
+
+    # 续写：截掉不完整的帧，第一帧必须是关键帧，序号与时间接着之前的帧
+    kept = snapshots[:-1]
+    more = make_snapshots(8, first=len(snapshots))
+    kinds = record(path, more)
+    assert kinds[0] == KEYFRAME
+    with open(index_path(path), "rb") as f:
+        assert f.read() != stale_index
+    combined = kept + more
+    with CaptureReader(path) as reader:
+        assert reader.frames == len(combined)
+        assert (reader.first_seq, reader.last_seq) == (0, len(combined) - 1)
+        assert all(offset != last_start or seq == len(kept) for _, seq, offset in reader.keyframes)
+        restored = [(ts, list(index.values())) for ts, index in reader.snapshots()]
+        assert [ts for ts, _ in restored] == [ts for ts, _ in combined]
+        for (_, actual), (_, expected) in zip(restored, combined):
+            assert_same(actual, expected)
+        for ts, rows in combined:
+            found, actual = reader.state_at(ts)
+            assert found == ts
+            assert_same(actual, rows)
+
+
+def test_not_a_capture(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"X" * len(MAGIC))
+    with pytest.raises(CaptureError):
+        CaptureReader(str(path))
+
+
+def test_replay_frame_by_frame(capture):
+    path, snapshots, _ = capture
+    with CaptureReader(path) as reader:
+        replay = ReplayCollector(reader, speed=0)
+        for ts, rows in snapshots:
+            assert not replay.finished
+            assert replay.next_delay() == 0.0
+            assert_same(replay.collect(), rows)
+            assert replay.timestamp == ts
+        assert replay.finished
+        assert replay.next_delay() is None
+        assert_same(replay.collect(), snapshots[-1][1])  # 停在最后一帧
+
+        replay.seek(snapshots[4][0] + 0.5)
+        assert not replay.finished
+        assert_same(replay.collect(), snapshots[4][1])
+        assert_same(replay.collect(), snapshots[5][1])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 50.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_replay_at_speed(capture):
+    path, snapshots, _ = capture
+    clock = FakeClock()
+    with CaptureReader(path) as reader:
+        replay = ReplayCollector(reader, speed=2.0, clock=clock)
+        assert_same(replay.collect(), snapshots[0][1])
+        assert replay.timestamp == snapshots[0][0]
+        assert replay.next_delay() == pytest.approx(0.5)
+
+        # 未到下一帧的时刻：仍返回当前帧
+        clock.now += 0.25
+        assert_same(replay.collect(), snapshots[0][1])
+
+        # 2 倍速经过 1 秒到达第 2 帧，期间的第 1 帧被跳过
+        clock.now += 0.75
+        assert replay.position() == pytest.approx(snapshots[2][0])
+        assert_same(replay.collect(), snapshots[2][1])
+        assert replay.timestamp == snapshots[2][0]
+
+        clock.now += 2.6
+        assert_same(replay.collect(), snapshots[7][1])
+        assert replay.next_delay() == pytest.approx(0.4)
+
+        clock.now += 100
+        assert_same(replay.collect(), snapshots[-1][1])
+        assert replay.finished
+
+        # 跳转后以返回的帧为起点重新计时
+        replay.seek(snapshots[3][0])
+        assert replay.position() == snapshots[3][0]
+        assert_same(replay.collect(), snapshots[3][1])
+        clock.now += 0.5
+        assert_same(replay.collect(), snapshots[4][1])
+
+
+def test_parse_position():
+    assert parse_position("+90", START) == START + 90
+    assert parse_position("+5m", START) == START + 300
+    with pytest.raises(ValueError):
+        parse_position("+abc", START)
@@ -0,0 +1,45 @@
+"""无界面模式测试"""
+import io
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from port_cli import build_parser, run
+
+COMPONENT_THREADS = ("name-resolver", "metrics-server", "agent-server", "remote-aggregator")
+
+
+def component_threads():
+    return [thread for thread in threading.enumerate() if thread.name.startswith(COMPONENT_THREADS)]
+
+
+def run_cli(*argv):
+    err = io.StringIO()
+    code = run(build_parser().parse_args(list(argv)), io.StringIO(), err)
+    # 解析线程在 stop() 后自行退出，不被等待
+    for thread in component_threads():
+        thread.join(timeout=2.0)
+    return code, err.getvalue()
+
+
+def test_early_return_stops_started_components(tmp_path):
+    code, err = run_cli("--names", "--metrics-port", "0", "--serve-port", "0",
+                        "--record", str(tmp_path / "missing" / "capture.bin"))
+    assert code == 1
+    assert "无法打开录制文件" in err
+    assert component_threads() == []
+
+
+def test_remote_aggregator_stopped_on_exit(tmp_path):
+    code, _ = run_cli("--connect", "127.0.0.1:1", "--once", "--quiet",
+                      "--record", str(tmp_path / "missing" / "capture.bin"))
+    assert code == 1
+    assert component_threads() == []
+
+
+def test_once_stops_resolver():
+    code, _ = run_cli("--once", "--quiet", "--names")
+    assert code == 0
+    assert component_threads() == []
@@ -0,0 +1,83 @@
+"""连接快照差异测试"""
+import os
+import socket
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from port_collector import make_row
+from port_diff import SnapshotDelta, SnapshotDiffer, connection_key, diff_snapshots, index_rows
+
+TCP = (socket.AF_INET, socket.SOCK_STREAM)
+
+
+def conn(pid, port, status="ESTABLISHED", name="app"):
+    return make_row(pid, name, *TCP, ("127.0.0.1", port), ("10.0.0.1", 443), status)
+
+
+def listen(pid, port, name="app"):
+    return make_row(pid, name, *TCP, ("0.0.0.0", port), None, "LISTEN")
+
+
+def test_connection_key_includes_host():
+    row = conn(1, 40000)
+    assert connection_key(row) == (None, 1, *TCP, ("127.0.0.1", 40000), ("10.0.0.1", 443))
+    assert connection_key(dict(row, host="db1"))[0] == "db1"
+
+
+def test_index_counts_duplicate_sockets():
+    a, b = listen(1, 80), listen(1, 80)
+    index = index_rows([a, conn(1, 40000), b])
+    key = connection_key(a)
+    assert index[(key, 0)] is a
+    assert index[(key, 1)] is b
+    assert len(index) == 3
+
+
+def test_added_removed_changed():
+    differ = SnapshotDiffer()
+    first = differ.update([listen(1, 80), conn(2, 40000, "SYN_SENT")])
+    assert [row["pid"] for _, row in first.added] == [1, 2]
+    assert not first.removed and not first.changed
+
+    delta = differ.update([conn(2, 40000), conn(3, 40001)])
+    assert [row["pid"] for _, row in delta.added] == [3]
+    assert [row["pid"] for _, row in delta.removed] == [1]
+    assert [(old["status"], new["status"]) for _, old, new in delta.changed] == [("SYN_SENT", "ESTABLISHED")]
+    assert delta.summary() == "新增 1，关闭 1，变化 1"
+    assert len(delta) == 3
+
+
+def test_unchanged_snapshot_is_empty():
+    differ = SnapshotDiffer()
+    differ.update([listen(1, 80)])
+    delta = differ.update([listen(1, 80)])
+    assert not delta
+    assert len(delta) == 0
+
+
+def test_duplicate_socket_closing_removes_one():
+    differ = SnapshotDiffer()
+    differ.update([listen(1, 80), listen(1, 80)])
+    delta = differ.update([listen(1, 80)])
+    assert not delta.added and not delta.changed
+    assert [key[1] for key, _ in delta.removed] == [1]
+
+
+def test_transitions_only_report_status_changes():
+    old = {"a": conn(1, 40000, "SYN_SENT"), "b": conn(2, 40001, name="old")}
+    new = {"a": conn(1, 40000), "b": conn(2, 40001, name="new")}
+    delta = diff_snapshots(old, new)
+    assert len(delta.changed) == 2
+    assert delta.transitions() == [("SYN_SENT", "ESTABLISHED", new["a"])]
+
+
+def test_reset_reports_everything_again():
+    differ = SnapshotDiffer()
+    differ.update([listen(1, 80)])
+    differ.reset()
+    assert len(differ.update([listen(1, 80)]).added) == 1
+
+
+def test_empty_delta():
+    assert not SnapshotDelta()
@@ -0,0 +1,123 @@
+"""连接过滤测试"""
+import os
+import socket
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from port_collector import make_row
+from port_filter import AddressFilter, FilterError, FilterSpec, PortFilter, SnapshotIndex, ip_key
+
+
+def row(pid, laddr, raddr=None, status="ESTABLISHED", name="app", family=socket.AF_INET):
+    return make_row(pid, name, family, socket.SOCK_STREAM, laddr, raddr, status)
+
+
+ROWS = [
+    row(1, ("0.0.0.0", 80), status="LISTEN", name="nginx"),
+    row(1, ("::", 8080), status="LISTEN", name="nginx", family=socket.AF_INET6),
+    row(2, ("127.0.0.1", 40000), ("10.1.2.3", 443), name="curl"),
+    row(3, ("::1", 22), ("fe80::1%eth0", 50000), name="sshd", family=socket.AF_INET6),
+    row(4, ("::ffff:192.168.1.5", 8100), ("::ffff:10.0.0.9", 5432), "TIME_WAIT",
+        name="postgres", family=socket.AF_INET6),
+    row(5, ("192.168.1.5", 9000), ("192.168.1.20", 60000), "CLOSE_WAIT", name="python"),
+]
+
+
+class TestPortFilter:
+    def test_substring(self):
+        flt = PortFilter("80")
+        assert flt.matches_port(80) and flt.matches_port(8080)
+        assert not flt.matches_port(22)
+
+    def test_range_and_list(self):
+        flt = PortFilter("22, 8000-8100")
+        assert flt.matches_port(22) and flt.matches_port(8000) and flt.matches_port(8100)
+        assert not flt.matches_port(8101)
+        assert not flt.matches_port(7999)
+
+    def test_reversed_range_and_full_width_comma(self):
+        flt = PortFilter("9000-8000，443")
+        assert flt.ranges == [(8000, 9000)]
+        assert flt.substrings == ["443"]
+
+    def test_empty(self):
+        assert not PortFilter("")
+        assert not PortFilter(" , ")
+
+    @pytest.mark.parametrize("text", ["http", "80-x", "-1-5", "8000-"])
+    def test_invalid(self, text):
+        with pytest.raises(FilterError):
+            PortFilter(text)
+
+
+class TestAddressFilter:
+    def test_cidr(self):
+        flt = AddressFilter("10.0.0.0/8")
+        assert flt.matches_ip("10.255.0.1")
+        assert not flt.matches_ip("11.0.0.1")
+
+    def test_cidr_not_strict(self):
+        assert AddressFilter("192.168.1.77/24").matches_ip("192.168.1.1")
+
+    def test_ipv6_cidr_with_zone(self):
+        flt = AddressFilter("fe80::/10")
+        assert flt.matches_ip("fe80::1%eth0")
+        assert not flt.matches_ip("10.0.0.1")
+
+    def test_v4_mapped_matches_ipv4_network(self):
+        assert AddressFilter("10.0.0.0/8").matches_ip("::ffff:10.0.0.9")
+
+    def test_prefix_is_case_insensitive(self):
+        flt = AddressFilter("FE80:")
+        assert flt.matches_ip("fe80::1")
+        assert not flt.matches_ip("10.0.0.1")
+
+    def test_invalid_ip_does_not_match(self):
+        assert not AddressFilter("10.0.0.0/8").matches_ip("not-an-ip")
+
+    def test_invalid_network(self):
+        with pytest.raises(FilterError):
+            AddressFilter("10.0.0.0/33")
+
+
+def test_ip_key():
+    assert ip_key("::ffff:127.0.0.1") == ip_key("127.0.0.1") == (4, 0x7F000001)
+    assert ip_key("fe80::1%eth0") == (6, (0xFE80 << 112) | 1)
+    with pytest.raises(ValueError):
+        ip_key("fe80::zz")
+
+
+@pytest.mark.parametrize("kwargs, pids", [
+    ({"port": "80"}, [1, 1]),
+    ({"port": "22"}, [3]),
+    ({"port": "8000-8200"}, [1, 4]),
+    ({"process": "NGINX"}, [1, 1]),
+    ({"process": "3"}, [3]),
+    ({"remote": "10.0.0.0/8"}, [2, 4]),
+    ({"remote": "fe80::/10"}, [3]),
+    ({"remote": "192.168."}, [5]),
+    ({"state": "listen, time_wait"}, [1, 1, 4]),
+    ({"port": "8000-9000", "state": "CLOSE_WAIT"}, [5]),
+    ({}, [1, 1, 2, 3, 4, 5]),
+])
+def test_index_query_matches_row_filter(kwargs, pids):
+    spec = FilterSpec(**kwargs)
+    result = SnapshotIndex(ROWS).query(spec)
+    assert [r["pid"] for r in result] == pids
+    # 增量更新逐行判断，结果必须与索引查询一致
+    assert [r for r in ROWS if spec.matches(r)] == result
+
+
+def test_ipv6_laddr_port():
+    spec = FilterSpec(port="8080")
+    assert spec.matches(ROWS[1])
+    assert SnapshotIndex(ROWS).by_port[8080] == [1]
+
+
+def test_remote_filter_skips_unconnected_rows():
+    spec = FilterSpec(remote="0.0.0.0/0")
+    assert not spec.matches(ROWS[0])
+    assert [r["pid"] for r in SnapshotIndex(ROWS).query(spec)] == [2, 4, 5]
@@ -0,0 +1,86 @@
+"""连接分组树测试"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from port_collector import make_row
+from port_diff import SnapshotDiffer
+from port_groups import GROUP_MODES, GroupTree
+
+
+def conn(pid, port, status="ESTABLISHED", name=None, rip="10.0.0.1"):
+    return make_row(pid, name or f"proc{pid}", 2, 1, ("127.0.0.1", port), (rip, 443), status)
+
+
+def listen(pid, port, name=None):
+    return make_row(pid, name or f"proc{pid}", 2, 1, ("0.0.0.0", port), None, "LISTEN")
+
+
+def shape(node):
+    """分组树的结构和计数，用于比较增量更新与重建的结果"""
+    if node.row is not None:
+        return (node.key, node.row["status"])
+    return (node.key, node.total, dict(node.counts),
+            sorted((shape(child) for child in node.children.values()), key=repr))
+
+
+SNAPSHOTS = [
+    [listen(1, 80), listen(1, 80), conn(2, 40000, "SYN_SENT"), conn(3, 40001)],
+    [listen(1, 80), listen(1, 80), listen(1, 80), conn(2, 40000), conn(3, 40001, "TIME_WAIT")],
+    [listen(1, 80), conn(2, 40000, name="renamed"), conn(4, 40002, rip="10.0.0.2")],
+    [],
+]
+
+
+@pytest.mark.parametrize("mode", list(GROUP_MODES))
+def test_delta_matches_rebuild(mode):
+    tree = GroupTree(mode)
+    differ = SnapshotDiffer()
+    for rows in SNAPSHOTS:
+        tree.apply_delta(differ.update(rows))
+        expected = GroupTree(mode)
+        expected.rebuild(rows)
+        assert shape(tree.root) == shape(expected.root)
+        assert set(tree.leaves) == set(expected.leaves)
+
+
+def test_duplicate_sockets_are_separate_leaves():
+    tree = GroupTree("process")
+    tree.rebuild([listen(1, 80), listen(1, 80)])
+    process = next(iter(tree.root.children.values()))
+    assert process.total == 2
+    assert process.counts == {"LISTEN": 2}
+    assert len(tree.leaves) == 2
+
+    differ = SnapshotDiffer()
+    differ.update([listen(1, 80), listen(1, 80)])
+    tree.apply_delta(differ.update([listen(1, 80)]))
+    assert process.total == 1
+    assert len(tree.leaves) == 1
+
+
+def test_counts_follow_status_changes():
+    tree = GroupTree("port")
+    differ = SnapshotDiffer()
+    tree.apply_delta(differ.update([conn(2, 40000, "SYN_SENT"), conn(3, 40000)]))
+    port = tree.root.children[(None, "port", 40000)]
+    assert port.counts == {"SYN_SENT": 1, "ESTABLISHED": 1}
+    changes = tree.apply_delta(differ.update([conn(2, 40000), conn(3, 40000)]))
+    assert port.counts == {"ESTABLISHED": 2}
+    assert port in changes.touched
+    changes = tree.apply_delta(differ.update([]))
+    assert port in changes.removed
+    assert tree.root.children == {}
+
+
+def test_filter_on_delta():
+    tree = GroupTree("process")
+    differ = SnapshotDiffer()
+    listening = lambda row: row["status"] == "LISTEN"
+    tree.apply_delta(differ.update([listen(1, 80), conn(2, 40000)]), listening)
+    assert [row["pid"] for row in tree.root.rows()] == [1]
+    tree.apply_delta(differ.update([listen(1, 80), dict(conn(2, 40000), status="LISTEN")]), listening)
+    assert sorted(row["pid"] for row in tree.root.rows()) == [1, 2]
@@ -0,0 +1,68 @@
+"""连接快照历史测试"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from port_collector import make_row
+from port_diff import index_rows
+from port_history import ConnectionHistory
+
+
+def make_rows(tick, count=50, churn=0):
+    """count 行连接，其中 churn 行的进程名和远程地址每次都不同"""
+    rows = []
+    for i in range(count):
+        unique = i < churn
+        name = f"proc{tick}-{i}" if unique else f"proc{i % 7}"
+        rip = f"10.{tick % 256}.{tick // 256 % 256}.{i}" if unique else f"10.0.0.{i % 5}"
+        rows.append(make_row(1000 + i, name, 2, 1, ("127.0.0.1", 20000 + i), (rip, 443), "ESTABLISHED"))
+    rows.append(make_row(1, "sshd", 10, 1, ("::", 22), None, "LISTEN"))
+    rows.append(dict(make_row(2, "db", 2, 2, ("0.0.0.0", 53), None, "NONE"), host="db1:9500"))
+    return rows
+
+
+def test_round_trip():
+    history = ConnectionHistory()
+    snapshots = [make_rows(tick, churn=5) for tick in range(5)]
+    seqs = [history.append(rows, 1000.0 + i) for i, rows in enumerate(snapshots)]
+    assert (history.first_seq, history.last_seq) == (seqs[0], seqs[-1])
+    for seq, rows in zip(seqs, snapshots):
+        assert index_rows(history.rows(seq)) == index_rows(rows)
+    assert history.timestamp(seqs[2]) == 1002.0
+    assert history.rows(seqs[-1] + 1) is None
+
+
+def test_evicts_by_age():
+    history = ConnectionHistory(max_age=10)
+    for tick in range(20):
+        history.append(make_rows(tick), 1000.0 + tick)
+    assert history.first_seq == 9
+    assert history.rows(8) is None
+    assert history.timestamp(8) is None
+
+
+def test_evicts_by_size_and_releases_string_tables():
+    history = ConnectionHistory(max_bytes=2 * 1024 * 1024)
+    history.MIN_GENERATION_BYTES = 0
+    history.generation_bytes = 64 * 1024
+    last = []
+    for tick in range(400):
+        last = make_rows(tick, count=200, churn=100)
+        seq = history.append(last, 1000.0 + tick)
+        assert history.memory_usage() <= history.max_bytes
+    assert history.first_seq > 0
+    assert len(history._generations) > 1
+    # 保留的快照仍能还原，已淘汰快照的字符串表已释放
+    assert index_rows(history.rows(seq)) == index_rows(last)
+    oldest = history._snapshots[0]
+    assert history._generations[0] is oldest.tables
+    assert index_rows(history.rows(oldest.seq)) == index_rows(make_rows(oldest.seq, count=200, churn=100))
+
+
+def test_keeps_latest_snapshot():
+    history = ConnectionHistory(max_bytes=1)
+    history.append(make_rows(0), 1000.0)
+    seq = history.append(make_rows(1), 1001.0)
+    assert len(history) == 1
+    assert history.first_seq == seq
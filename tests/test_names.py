@@ -0,0 +1,168 @@
+"""名称解析缓存测试
+
+使用 StubLookup 代替反向DNS，注入的时钟控制缓存过期。
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from port_names import NameResolver, StubLookup
+
+NAMES = {"10.0.0.1": "alpha", "10.0.0.2": "beta", "10.0.0.3": "gamma", "10.0.0.4": "delta"}
+TIMEOUT = 5.0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def lookup():
+    return StubLookup(NAMES)
+
+
+def make_resolver(lookup, clock, **options):
+    options.setdefault("workers", 2)
+    return NameResolver(lookup, clock=clock, ttl=60.0, negative_ttl=10.0, **options)
+
+
+def resolve(resolver, *ips):
+    """提交解析并等待完成，返回解析结果"""
+    for ip in ips:
+        resolver.get(ip)
+    assert resolver.wait(TIMEOUT)
+    return [resolver.get(ip) for ip in ips]
+
+
+def test_resolves_in_background(lookup, clock):
+    resolver = make_resolver(lookup, clock).start()
+    try:
+        assert resolver.get("10.0.0.1") is None  # 首次查询只提交，不等待
+        assert resolver.wait(TIMEOUT)
+        assert resolver.take_resolved() == ["10.0.0.1"]
+        assert resolver.take_resolved() == []
+        assert resolver.get("10.0.0.1") == "alpha"
+        assert resolver.stats() == {"entries": 1, "pending": 0, "hits": 1, "misses": 1}
+    finally:
+        resolver.stop()
+
+
+def test_unresolvable_addresses_skipped(lookup, clock):
+    resolver = make_resolver(lookup, clock).start()
+    try:
+        for ip in ("0.0.0.0", "::", "*", ""):
+            assert resolver.get(ip) is None
+        assert resolver.wait(TIMEOUT)
+        assert lookup.calls == 0
+        assert resolver.stats()["misses"] == 0
+    finally:
+        resolver.stop()
+
+
+def test_ttl_expiry(lookup, clock):
+    resolver = make_resolver(lookup, clock).start()
+    try:
+        assert resolve(resolver, "10.0.0.1") == ["alpha"]
+        clock.now += 59
+        assert resolver.get("10.0.0.1") == "alpha"
+        assert lookup.calls == 1
+
+        # 过期后返回旧结果，同时重新提交解析
+        clock.now += 2
+        lookup.names["10.0.0.1"] = "alpha-renamed"
+        assert resolver.get("10.0.0.1") == "alpha"
+        assert resolver.wait(TIMEOUT)
+        assert lookup.calls == 2
+        assert resolver.get("10.0.0.1") == "alpha-renamed"
+    finally:
+        resolver.stop()
+
+
+def test_negative_ttl(lookup, clock):
+    resolver = make_resolver(lookup, clock).start()
+    try:
+        assert resolve(resolver, "192.0.2.1") == [None]
+        assert lookup.calls == 1
+        hits = resolver.stats()["hits"]
+
+        # 失败结果在 negative_ttl 内命中缓存，不再解析
+        clock.now += 9
+        assert resolver.get("192.0.2.1") is None
+        assert resolver.stats()["hits"] == hits + 1
+        assert resolver.wait(TIMEOUT)
+        assert lookup.calls == 1
+
+        # 失败结果比成功结果更早过期
+        clock.now += 2
+        lookup.names["192.0.2.1"] = "late"
+        assert resolve(resolver, "192.0.2.1") == ["late"]
+        assert lookup.calls == 2
+    finally:
+        resolver.stop()
+
+
+def test_lru_eviction(lookup, clock):
+    resolver = make_resolver(lookup, clock, workers=1, max_entries=3).start()
+    try:
+        assert resolve(resolver, "10.0.0.1", "10.0.0.2", "10.0.0.3") == ["alpha", "beta", "gamma"]
+        resolver.get("10.0.0.1")  # 最近使用，不被淘汰
+        assert resolve(resolver, "10.0.0.4") == ["delta"]
+        assert resolver.stats()["entries"] == 3
+
+        calls = lookup.calls
+        assert resolver.get("10.0.0.1") == "alpha"
+        assert resolver.get("10.0.0.3") == "gamma"
+        assert resolver.get("10.0.0.4") == "delta"
+        assert lookup.calls == calls
+        assert resolver.get("10.0.0.2") is None  # 最久未使用，已被淘汰
+        assert resolver.wait(TIMEOUT)
+        assert lookup.calls == calls + 1
+    finally:
+        resolver.stop()
+
+
+def test_in_flight_lookups_deduplicated(clock):
+    lookup = StubLookup(NAMES, delay=0.2)
+    resolver = make_resolver(lookup, clock, workers=4).start()
+    try:
+        for _ in range(20):
+            assert resolver.get("10.0.0.1") is None
+        assert resolver.stats()["pending"] == 1
+        assert resolver.wait(TIMEOUT)
+        assert lookup.calls == 1
+        assert resolver.get("10.0.0.1") == "alpha"
+    finally:
+        resolver.stop()
+
+
+def test_max_pending(lookup, clock):
+    # 未启动后台线程：提交的地址一直处于等待状态
+    resolver = make_resolver(lookup, clock, max_pending=2)
+    ips = ["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"]
+    for ip in ips:
+        assert resolver.get(ip) is None
+    assert resolver.stats()["pending"] == 2
+
+    resolver.start()
+    try:
+        assert resolver.wait(TIMEOUT)
+        assert lookup.calls == 2
+        assert resolver.get("10.0.0.1") == "alpha"
+        assert resolver.get("10.0.0.2") == "beta"
+        # 超出上限未提交的地址在下次查询时提交
+        assert resolve(resolver, "10.0.0.3", "10.0.0.4") == ["gamma", "delta"]
+        assert lookup.calls == 4
+    finally:
+        resolver.stop()
@@ -0,0 +1,148 @@
+"""代理与远程聚合测试
+
+在本机启动两个监听随机端口的 AgentServer，检查 RemoteAggregator 合并两台主机的快照、
+序号不连续时重新同步，以及代理重启后自动重连。
+"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from port_collector import make_row
+from port_diff import SnapshotDiffer
+from port_remote import AgentServer, RemoteAggregator
+
+TIMEOUT = 5.0
+
+
+def wait_until(predicate, timeout=TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def make_rows(base, count, status="ESTABLISHED"):
+    return [make_row(base + i, f"proc{base + i}", 2, 1, ("127.0.0.1", 10000 + i),
+                     ("10.0.0.1", 443), status) for i in range(count)]
+
+
+class Agent:
+    """AgentServer 与计算差异的 SnapshotDiffer，模拟代理的采集循环"""
+    def __init__(self, port=0):
+        self.server = AgentServer("127.0.0.1", port).start()
+        self.differ = SnapshotDiffer()
+
+    @property
+    def address(self):
+        return f"127.0.0.1:{self.server.port}"
+
+    def publish(self, rows):
+        self.server.publish(rows, self.differ.update(rows))
+
+    def stop(self):
+        self.server.stop()
+
+
+def host_rows(aggregator, address):
+    """聚合结果中某台主机的连接，转换为可比较的集合"""
+    return {(row["pid"], row["laddr"], row["raddr"], row["status"])
+            for row in aggregator.collect() if row["host"] == address}
+
+
+def expected(rows):
+    return {(row["pid"], row["laddr"], row["raddr"], row["status"]) for row in rows}
+
+
+@pytest.fixture
+def agents():
+    started = [Agent(), Agent()]
+    yield started
+    for agent in started:
+        agent.stop()
+
+
+@pytest.fixture
+def aggregator(agents):
+    result = RemoteAggregator([agent.address for agent in agents], timeout=TIMEOUT, retry=(0.05, 0.2))
+    yield result
+    result.stop()
+
+
+def test_merges_hosts(agents, aggregator):
+    first, second = agents
+    rows_a, rows_b = make_rows(100, 5), make_rows(200, 3)
+    first.publish(rows_a)
+    second.publish(rows_b)
+    assert not aggregator.ready()
+    aggregator.start()
+    assert aggregator.wait_ready(TIMEOUT)
+    assert aggregator.ready()
+    assert host_rows(aggregator, first.address) == expected(rows_a)
+    assert host_rows(aggregator, second.address) == expected(rows_b)
+    assert aggregator.connected_count() == 2
+    assert wait_until(lambda: first.server.client_count == 1 and second.server.client_count == 1)
+
+    # 差异帧：一个连接关闭、一个状态变化、一个新增
+    rows_a2 = rows_a[1:] + make_rows(150, 1)
+    rows_a2[0] = dict(rows_a2[0], status="CLOSE_WAIT")
+    first.publish(rows_a2)
+    assert wait_until(lambda: host_rows(aggregator, first.address) == expected(rows_a2))
+    assert host_rows(aggregator, second.address) == expected(rows_b)
+    assert len(aggregator.collect()) == len(rows_a2) + len(rows_b)
+
+
+def test_resync_after_sequence_gap(agents, aggregator):
+    first, second = agents
+    rows = make_rows(100, 4)
+    first.publish(rows)
+    second.publish(make_rows(200, 2))
+    aggregator.start()
+    assert aggregator.wait_ready(TIMEOUT)
+    state = aggregator.hosts[0]
+    synced_at = state.updated
+
+    # 跳过一个序号，客户端应丢弃该差异帧并请求完整快照
+    first.server._next_seq += 1
+    gapped = make_rows(100, 2) + make_rows(300, 3)
+    first.publish(gapped)
+    assert wait_until(lambda: host_rows(aggregator, first.address) == expected(gapped))
+    assert state.seq == first.server._next_seq
+    assert state.updated != synced_at
+
+    # 重新同步后差异帧继续正常应用
+    following = gapped[:-1]
+    first.publish(following)
+    assert wait_until(lambda: host_rows(aggregator, first.address) == expected(following))
+    assert state.seq == first.server._next_seq
+
+
+def test_reconnects_after_agent_restart(agents, aggregator):
+    first, second = agents
+    first.publish(make_rows(100, 4))
+    second.publish(make_rows(200, 2))
+    aggregator.start()
+    assert aggregator.wait_ready(TIMEOUT)
+
+    port = first.server.port
+    first.stop()
+    assert wait_until(lambda: not aggregator.status()[0]["connected"])
+    assert host_rows(aggregator, first.address) == set()
+    assert host_rows(aggregator, second.address) == expected(make_rows(200, 2))
+
+    restarted = Agent(port)
+    agents[0] = restarted
+    rows = make_rows(400, 6)
+    restarted.publish(rows)
+    assert wait_until(lambda: host_rows(aggregator, restarted.address) == expected(rows))
+    assert aggregator.status()[0]["connected"]
+    assert aggregator.connected_count() == 2
+
+    changed = rows[:3]
+    restarted.publish(changed)
+    assert wait_until(lambda: host_rows(aggregator, restarted.address) == expected(changed))
@@ -0,0 +1,95 @@
+"""监视规则引擎测试"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from port_collector import make_row
+from port_diff import SnapshotDiffer
+from port_rules import Rule, RuleEngine, RuleError
+
+
+def listen(pid, port, name="java"):
+    return make_row(pid, name, 2, 1, ("0.0.0.0", port), None, "LISTEN")
+
+
+class Feed:
+    """把快照序列转换为差异交给规则引擎"""
+    def __init__(self, *specs):
+        self.engine = RuleEngine([Rule(spec) for spec in specs])
+        self.differ = SnapshotDiffer()
+
+    def __call__(self, rows, timestamp):
+        return self.engine.process(self.differ.update(rows), timestamp)
+
+
+def test_event_rule_enter_and_leave():
+    feed = Feed({"name": "监听", "match": {"status": "LISTEN", "port": "8000-8100"}},
+                {"name": "关闭", "match": {"port": "8080"}, "on": "leave"})
+    alerts = feed([listen(1, 8080), listen(2, 9000)], 0)
+    assert [(alert.rule, alert.row["pid"]) for alert in alerts] == [("监听", 1)]
+    alerts = feed([listen(2, 9000)], 1)
+    assert [(alert.rule, alert.row["pid"]) for alert in alerts] == [("关闭", 1)]
+
+
+def test_initial_false_skips_existing_connections():
+    feed = Feed({"name": "新监听", "match": {"status": "LISTEN"}, "initial": False})
+    assert feed([listen(1, 80)], 0) == []
+    alerts = feed([listen(1, 80), listen(2, 81)], 1)
+    assert [alert.row["pid"] for alert in alerts] == [2]
+
+
+def test_status_change_enters_rule():
+    feed = Feed({"name": "建立", "match": {"status": "ESTABLISHED"}})
+    syn = make_row(1, "curl", 2, 1, ("127.0.0.1", 40000), ("10.0.0.1", 443), "SYN_SENT")
+    assert feed([syn], 0) == []
+    alerts = feed([dict(syn, status="ESTABLISHED")], 1)
+    assert len(alerts) == 1
+
+
+def test_count_rule_fires_once_until_below():
+    feed = Feed({"name": "过多", "match": {"status": "LISTEN"}, "group": "pid", "above": 2, "dedup": 0})
+    assert feed([listen(1, 80), listen(1, 81)], 0) == []
+    alerts = feed([listen(1, 80), listen(1, 81), listen(1, 82)], 1)
+    assert [alert.count for alert in alerts] == [3]
+    assert feed([listen(1, 80), listen(1, 81), listen(1, 82), listen(1, 83)], 2) == []
+    assert feed([listen(1, 80)], 3) == []
+    alerts = feed([listen(1, 80), listen(1, 81), listen(1, 82)], 4)
+    assert [alert.count for alert in alerts] == [3]
+
+
+def test_dedup():
+    feed = Feed({"name": "监听", "match": {"status": "LISTEN"}, "dedup": 100})
+    assert len(feed([listen(1, 80)], 0)) == 1
+    feed([], 10)
+    assert feed([listen(1, 80)], 20) == []  # 同一连接在 dedup 秒内只告警一次
+    feed([], 30)
+    assert len(feed([listen(1, 80)], 120)) == 1
+
+
+def test_rate_limited_alert_does_not_start_dedup():
+    feed = Feed({"name": "监听", "match": {"status": "LISTEN"}, "rate": 2, "dedup": 300})
+    alerts = feed([listen(1, 80), listen(2, 81), listen(3, 82)], 0)
+    assert [alert.row["pid"] for alert in alerts] == [1, 2]
+    assert feed.engine.rules[0].suppressed == 1
+
+    # 限流窗口过去后第三个连接重新出现：它此前没有被报告过，不应被去重
+    feed([listen(1, 80), listen(2, 81)], 30)
+    alerts = feed([listen(1, 80), listen(2, 81), listen(3, 82)], 61)
+    assert [alert.row["pid"] for alert in alerts] == [3]
+    assert alerts[0].suppressed == 1
+
+    # 已报告的连接仍按 dedup 去重
+    feed([listen(3, 82)], 62)
+    assert feed([listen(1, 80), listen(2, 81), listen(3, 82)], 63) == []
+
+
+def test_invalid_rules():
+    with pytest.raises(RuleError):
+        Rule({"match": {}})
+    with pytest.raises(RuleError):
+        Rule({"name": "x", "group": "pid"})
+    with pytest.raises(RuleError):
+        Rule({"name": "x", "on": "sometimes"})
@@ -0,0 +1,37 @@
+"""自适应刷新调度测试"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from port_scheduler import RefreshScheduler
+
+
+def test_hidden_window_uses_ceiling():
+    scheduler = RefreshScheduler(base=5.0, floor=1.0, ceiling=60.0)
+    assert scheduler.next_interval(0.1, visible=False) == 60.0
+
+
+def test_churn_adjusts_interval():
+    scheduler = RefreshScheduler(base=5.0, floor=1.0, ceiling=60.0)
+    scheduler.record_churn(500, 1000)
+    assert scheduler.next_interval(0.1) == pytest.approx(2.5)
+    scheduler.churn = 0.0
+    assert scheduler.next_interval(0.1) == pytest.approx(2.5 * 1.25)
+
+
+def test_cost_guard():
+    scheduler = RefreshScheduler(base=5.0, floor=1.0, ceiling=60.0)
+    assert scheduler.next_interval(4.0) == 4.0 * RefreshScheduler.COST_FACTOR
+
+
+def test_active_interval_keeps_cost_guard():
+    scheduler = RefreshScheduler(base=5.0, floor=1.0, ceiling=60.0)
+    scheduler.next_interval(0.1)
+    interval = scheduler.interval
+    assert scheduler.active_interval(0.1) == interval
+    # 上一次采集很慢时，恢复可见也不能早于耗时保护间隔
+    assert scheduler.active_interval(10.0) == 10.0 * RefreshScheduler.COST_FACTOR
+    assert scheduler.interval == interval
@@ -0,0 +1,93 @@
+"""表格排序测试"""
+import os
+import socket
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from port_collector import make_row
+from port_diff import SnapshotDiffer
+from port_sort import (FIELD_INDEX, AddressKeyCache, SortKeyCache, address_key, insert_position,
+                       row_sort_key, sort_order)
+
+PID, NAME, LOCAL, REMOTE, STATUS = (FIELD_INDEX[f] for f in ("pid", "name", "local_address",
+                                                             "remote_address", "status"))
+
+
+def row(pid, name, lport, raddr=None, status="ESTABLISHED"):
+    return make_row(pid, name, socket.AF_INET, socket.SOCK_STREAM, ("127.0.0.1", lport), raddr, status)
+
+
+def test_address_key_orders_numerically():
+    addresses = [("10.0.0.10", 1), ("10.0.0.9", 1), ("::1", 1), None, ("::ffff:10.0.0.9", 0)]
+    ordered = sorted(addresses, key=address_key)
+    assert ordered == [None, ("::ffff:10.0.0.9", 0), ("10.0.0.9", 1), ("10.0.0.10", 1), ("::1", 1)]
+    assert address_key(("bogus", 5)) == (9, 0, 5)
+
+
+def test_address_key_cache_matches_and_is_bounded(monkeypatch):
+    monkeypatch.setattr(AddressKeyCache, "MAX_SIZE", 3)
+    cache = AddressKeyCache()
+    for i in range(10):
+        address = (f"10.0.0.{i}", 80)
+        assert cache(address) == address_key(address)
+        assert len(cache._keys) <= 3
+    assert cache(None) == address_key(None)
+    assert cache(("bogus", 5)) == address_key(("bogus", 5))
+
+
+def test_sort_key_cache_follows_delta():
+    differ = SnapshotDiffer()
+    cache = SortKeyCache()
+    a, b = row(1, "a", 80, status="SYN_SENT"), row(2, "b", 81)
+    delta = differ.update([a, b])
+    cache.update(delta)
+    (key_a, _), (key_b, _) = delta.added
+    assert cache._keys[key_a][0] is a
+    assert cache.get(key_a, a) == row_sort_key(a)
+
+    a2 = row(1, "a", 80)
+    cache.update(differ.update([a2]))
+    assert cache._keys[key_a][0] is a2
+    assert key_b not in cache._keys
+    # 行对象不一致（如历史快照）时当场计算
+    assert cache.get(key_a, a) == row_sort_key(a)
+    assert cache.get(key_b, b) == row_sort_key(b)
+
+    cache.clear()
+    assert cache._keys == {}
+
+
+def test_multi_key_sort_is_stable():
+    rows = [row(3, "b", 80), row(1, "a", 443), row(2, "b", 22), row(4, "a", 8080), row(5, "b", 22)]
+    keys = [row_sort_key(r) for r in rows]
+    # 名称降序，其次本地端口升序；名称和端口都相同的行保持原有顺序
+    order = sort_order(keys, [(NAME, True), (LOCAL, False)])
+    assert [rows[i]["pid"] for i in order] == [2, 5, 3, 1, 4]
+    assert sort_order(keys, [(NAME, False)]) == [1, 3, 0, 2, 4]
+
+
+def test_status_sorts_by_lifecycle():
+    statuses = ["TIME_WAIT", "ESTABLISHED", "LISTEN", "未知", "SYN_SENT"]
+    keys = [row_sort_key(row(i, "x", 80, status=s)) for i, s in enumerate(statuses)]
+    order = sort_order(keys, [(STATUS, False)])
+    assert [statuses[i] for i in order] == ["LISTEN", "SYN_SENT", "ESTABLISHED", "TIME_WAIT", "未知"]
+
+
+@pytest.mark.parametrize("spec", [
+    [(PID, False)],
+    [(NAME, True), (LOCAL, False)],
+    [(REMOTE, False), (PID, True)],
+])
+def test_insert_position_matches_full_sort(spec):
+    rows = [row(i % 4, "ab"[i % 2], 1000 + i % 3, ("10.0.0.%d" % (i % 5), 443) if i % 3 else None)
+            for i in range(20)]
+    keys = [row_sort_key(r) for r in rows]
+    for n in range(len(keys)):
+        existing = [keys[i] for i in sort_order(keys[:n], spec)]
+        position = insert_position(existing, keys[n], spec)
+        # 插入到相等的行之后，结果与整体稳定排序相同
+        existing.insert(position, keys[n])
+        assert existing == [keys[i] for i in sort_order(keys[:n + 1], spec)]
@@ -0,0 +1,143 @@
+"""连接事件存储测试"""
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from port_collector import make_row
+from port_diff import SnapshotDiffer, index_rows
+from port_filter import FilterSpec
+from port_store import EventStore, parse_time
+
+START = time.time() - 3600  # 在保留时间之内
+
+
+def listen(pid, port, name="nginx"):
+    return make_row(pid, name, 2, 1, ("0.0.0.0", port), None, "LISTEN")
+
+
+def connection(pid, port, status="ESTABLISHED", name="curl"):
+    return make_row(pid, name, 2, 1, ("127.0.0.1", port), ("10.0.0.1", 443), status)
+
+
+def state_rows(store, timestamp, spec=None):
+    """state_at 的结果转换为与采集结果相同的行"""
+    rows = []
+    for record in store.state_at(timestamp, spec):
+        raddr = (record["raddr"], record["rport"]) if record["raddr"] is not None else None
+        rows.append(make_row(record["pid"], record["name"], 2, 1, (record["laddr"], record["lport"]),
+                             raddr, record["status"]))
+    return rows
+
+
+@pytest.fixture
+def store(tmp_path):
+    started = []
+
+    def open_store(**options):
+        result = EventStore(str(tmp_path / "events.db"), **options).start()
+        started.append(result)
+        return result
+    yield open_store
+    for result in started:
+        result.stop()
+
+
+def record_all(store, snapshots):
+    """按 START 之后的秒数记录各次采集"""
+    differ = SnapshotDiffer()
+    for ts, rows in snapshots:
+        store.record(rows, differ.update(rows), START + ts)
+    store.stop()
+
+
+def at(store, offset, spec=None):
+    return state_rows(store, START + offset, spec)
+
+
+def test_state_at_replays_events(store):
+    events = store(snapshot_interval=100)
+    snapshots = [
+        (0.0, [listen(1, 80), connection(2, 40000, "SYN_SENT")]),
+        (10.0, [listen(1, 80), connection(2, 40000)]),
+        (20.0, [listen(1, 80), connection(3, 40001)]),
+    ]
+    record_all(events, snapshots)
+    for ts, rows in snapshots:
+        assert index_rows(at(events, ts + 1)) == index_rows(rows)
+    assert at(events, -1) == []
+
+
+def test_state_at_after_rename(store):
+    events = store(snapshot_interval=100)
+    snapshots = [
+        (0.0, [listen(1, 80, "python")]),
+        (10.0, [listen(1, 80, "gunicorn")]),  # 同一进程 exec 后改名
+        (20.0, []),
+    ]
+    record_all(events, snapshots)
+    assert [row["name"] for row in at(events, 15)] == ["gunicorn"]
+    assert at(events, 25) == []
+
+
+def test_state_at_keeps_duplicate_connections(store):
+    events = store(snapshot_interval=100)
+    # 同一进程以 SO_REUSEPORT 重复监听同一端口
+    snapshots = [
+        (0.0, [listen(1, 80), listen(1, 80)]),
+        (10.0, [listen(1, 80), listen(1, 80), listen(1, 80)]),
+        (20.0, [listen(1, 80)]),
+    ]
+    record_all(events, snapshots)
+    assert len(at(events, 5)) == 2
+    assert len(at(events, 15)) == 3
+    assert len(at(events, 25)) == 1
+
+
+def test_state_at_with_filter(store):
+    events = store(snapshot_interval=100)
+    record_all(events, [(0.0, [listen(1, 80), listen(2, 443)]), (10.0, [listen(2, 443)])])
+    assert at(events, 5, FilterSpec(port="443"))[0]["pid"] == 2
+    assert len(at(events, 5, FilterSpec(port="443"))) == 1
+    assert at(events, 15, FilterSpec(port="80")) == []
+
+
+def test_query_events(store):
+    events = store(snapshot_interval=100)
+    record_all(events, [
+        (0.0, [connection(2, 40000, "SYN_SENT")]),
+        (10.0, [connection(2, 40000)]),
+        (20.0, []),
+    ])
+    records = list(events.query())
+    assert [(record["event"], record["status"], record.get("old_status")) for record in records] == [
+        ("change", "ESTABLISHED", "SYN_SENT"), ("close", "ESTABLISHED", None)]
+    assert [record["ts"] - START for record in events.query(start=START + 15)] == [pytest.approx(20.0)]
+
+
+def test_migrates_database_without_counter(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE events (ts REAL NOT NULL, event TEXT NOT NULL, host TEXT, pid INTEGER, "
+                 "name TEXT, family INTEGER, type INTEGER, laddr TEXT, lport INTEGER, raddr TEXT, "
+                 "rport INTEGER, status TEXT, old_status TEXT)")
+    conn.execute("CREATE TABLE snapshots (ts REAL PRIMARY KEY)")
+    conn.execute("INSERT INTO events VALUES (0, 'snapshot', NULL, 1, 'nginx', 2, 1, '0.0.0.0', 80, "
+                 "NULL, NULL, 'LISTEN', NULL)")
+    conn.execute("INSERT INTO snapshots VALUES (0)")
+    conn.commit()
+    conn.close()
+    events = EventStore(path)
+    assert [record["pid"] for record in events.state_at(5)] == [1]
+
+
+def test_parse_time():
+    assert parse_time("90", now=1000) == 90
+    assert parse_time("2h", now=10000) == 10000 - 7200
+    assert parse_time("30m", now=10000) == 10000 - 1800
+    with pytest.raises(ValueError):
+        parse_time("soon")